@@ -0,0 +1 @@
+# Author: 4sushi
@@ -0,0 +1,141 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import Callable, Dict, List, Tuple
+import itertools
+import random
+from solitaire_game.game import GameSolitaire, GameCards, InitialStacks, Move, MOVE_DECK_TO_FINAL, \
+    MOVE_DECK_TO_INITIAL, MOVE_FINAL_TO_INITIAL, MOVE_INITIAL_TO_INITIAL, MOVE_INITIAL_TO_FINAL
+from benchmarks.harness import benchmark
+
+MOVE_BENCHMARKS: Dict[int, str] = {
+    MOVE_DECK_TO_FINAL: 'move.deck_to_final',
+    MOVE_DECK_TO_INITIAL: 'move.deck_to_initial',
+    MOVE_FINAL_TO_INITIAL: 'move.final_to_initial',
+    MOVE_INITIAL_TO_INITIAL: 'move.initial_to_initial',
+    MOVE_INITIAL_TO_FINAL: 'move.initial_to_final',
+}
+
+
+def find_position(kind: int, max_seeds: int = 1000, max_moves: int = 300) -> Tuple[GameSolitaire, Move]:
+    # Random walks on seeded deals until a move of the kind is legal, the position is the same on every run
+    for seed in range(max_seeds):
+        game: GameSolitaire = GameSolitaire(seed=seed)
+        rng: random.Random = random.Random(seed)
+        for _ in range(max_moves):
+            moves: List[Move] = game.legal_moves()
+            for move in moves:
+                if move.kind == kind:
+                    return game, move
+            if not moves:
+                break
+            game.apply(rng.choice(moves))
+    raise RuntimeError(f'No position found for the move kind {kind}')
+
+
+def deal_cards(game_cards: GameCards):
+    # Same withdrawals as Deck and InitialStacks
+    game_cards.withdraw_cards(24)
+    for i_stack in range(InitialStacks.NB_STACKS):
+        game_cards.withdraw_cards(i_stack)
+        game_cards.withdraw_cards(1)
+
+
+@benchmark('deal.game_solitaire')
+def bench_game_solitaire() -> Callable[[], object]:
+    seeds = itertools.count()
+    return lambda: GameSolitaire(seed=next(seeds))
+
+
+@benchmark('deal.mix_cards')
+def bench_mix_cards() -> Callable[[], object]:
+    game_cards: GameCards = GameCards()
+    rng: random.Random = random.Random(0)
+    return lambda: game_cards.mix_cards(rng)
+
+
+@benchmark('deal.withdraw_cards')
+def bench_withdraw_cards() -> Callable[[], object]:
+    # The construction of the cards is included, withdraw_cards empties them
+    return lambda: deal_cards(GameCards())
+
+
+def make_move_benchmark(kind: int) -> Callable[[], Callable[[], object]]:
+    def factory() -> Callable[[], object]:
+        # The move is played with the action of the UI and undone, to time the same position on each call
+        game, move = find_position(kind)
+        src_area_id, dest_area_id = game.get_move_areas(move)
+        handle_action_move_cards = game.handle_action_move_cards
+        undo = game.undo
+
+        def op():
+            handle_action_move_cards(src_area_id, dest_area_id, move.quantity)
+            undo()
+        return op
+    return factory
+
+
+for _kind, _name in MOVE_BENCHMARKS.items():
+    benchmark(_name)(make_move_benchmark(_kind))
+
+
+@benchmark('move.switch_deck')
+def bench_switch_deck() -> Callable[[], object]:
+    game: GameSolitaire = GameSolitaire(seed=0)
+    action_switch_deck_cards = game.action_switch_deck_cards
+    undo = game.undo
+
+    def op():
+        action_switch_deck_cards()
+        undo()
+    return op
+
+
+@benchmark('move.illegal')
+def bench_illegal_move() -> Callable[[], object]:
+    # The most frequent action of the UI: a selection refused by the rules
+    game: GameSolitaire = GameSolitaire(seed=0)
+    src_area_id, dest_area_id = next((src, dest) for src in range(2, 13) for dest in range(2, 13)
+                                     if src != dest and game.get_move(src, dest)
+                                     and not game.is_legal(game.get_move(src, dest)))
+    return lambda: game.handle_action_move_cards(src_area_id, dest_area_id, 1)
+
+
+@benchmark('is_game_won')
+def bench_is_game_won() -> Callable[[], object]:
+    game, _ = find_position(MOVE_INITIAL_TO_FINAL)
+    return game.is_game_won
+
+
+@benchmark('legal_moves')
+def bench_legal_moves() -> Callable[[], object]:
+    game, _ = find_position(MOVE_INITIAL_TO_INITIAL)
+    return game.legal_moves
+
+
+@benchmark('auto_complete_moves')
+def bench_auto_complete_moves() -> Callable[[], object]:
+    # First position of the random walks where the game is decided, draw 1 gets there sooner
+    for seed in range(1000):
+        game: GameSolitaire = GameSolitaire(seed=seed, draw_count=1)
+        rng: random.Random = random.Random(seed)
+        for _ in range(2000):
+            if game.get_auto_complete_moves():
+                return game.get_auto_complete_moves
+            moves: List[Move] = game.legal_moves()
+            if not moves:
+                break
+            game.apply(rng.choice(moves))
+    raise RuntimeError('No position found for the auto-complete')
+
+
+@benchmark('clone.game')
+def bench_clone() -> Callable[[], object]:
+    game, _ = find_position(MOVE_INITIAL_TO_INITIAL)
+    return game.clone
+
+
+@benchmark('clone.fork_and_move')
+def bench_fork_and_move() -> Callable[[], object]:
+    # A fork of a search or a preview: clone, then a move copies the two stacks it changes
+    game, move = find_position(MOVE_INITIAL_TO_INITIAL)
+    return lambda: game.clone(with_journal=False).apply(move)
@@ -0,0 +1,64 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import Callable
+import itertools
+from solitaire_game.simulation import simulate_deal, RandomPolicy, GreedyPolicy
+from solitaire_game.solver import Solver
+from solitaire_game.autoplay import RolloutPlayer
+from solitaire_game.game import GameSolitaire
+from benchmarks.harness import benchmark
+
+try:
+    import numpy as np
+    from solitaire_game.batch import BatchGames, playouts
+except ImportError:  # numpy is not installed (pip install solitaire-game[batch])
+    BatchGames = None
+
+# Deals played by each call of the batch benchmarks. The deals per second are lower than with full chunks of
+# batch.CHUNK_SIZE deals, but a call lasts a fraction of a second.
+BATCH_SIZE: int = 4096
+
+
+@benchmark('playout.random')
+def bench_random_playout() -> Callable[[], object]:
+    seeds = itertools.count()
+    policy: RandomPolicy = RandomPolicy()
+    return lambda: simulate_deal(next(seeds), policy, max_moves=1000)
+
+
+@benchmark('playout.greedy')
+def bench_greedy_playout() -> Callable[[], object]:
+    seeds = itertools.count()
+    policy: GreedyPolicy = GreedyPolicy()
+    return lambda: simulate_deal(next(seeds), policy, max_moves=1000)
+
+
+def register_batch(policy: str, max_moves: int):
+    # Same deals on each call, the playouts are played on a copy of the batch
+    @benchmark(f'playout.batch_{policy}')
+    def bench_batch_playouts() -> Callable[[], object]:
+        batch: BatchGames = BatchGames.from_seeds(range(BATCH_SIZE))
+        games = np.arange(BATCH_SIZE)
+        return lambda: playouts(batch.take(games), policy=policy, max_moves=max_moves, rng=np.random.default_rng(0))
+
+
+if BatchGames is not None:
+    # The random games rarely end before max_moves, they are cut at 100 moves
+    register_batch('greedy', 1000)
+    register_batch('random', 100)
+
+
+@benchmark('solver.5k_nodes')
+def bench_solver() -> Callable[[], object]:
+    # Seeds cycle on a small set so the mix of solved and unsolved deals is stable between runs
+    seeds = itertools.cycle(range(20))
+    return lambda: Solver(GameSolitaire(seed=next(seeds)), max_nodes=5000).solve()
+
+
+@benchmark('autoplay.move')
+def bench_autoplay_move() -> Callable[[], object]:
+    # A move of the Monte Carlo player in this process, with a fixed number of rollouts instead of a time budget:
+    # sampling of the unseen cards, forks and greedy playouts, the load of a bot move end to end
+    player: RolloutPlayer = RolloutPlayer(move_seconds=None, rollouts=8, workers=1, seed=0)
+    game: GameSolitaire = GameSolitaire(seed=0)
+    return lambda: player.search(game)
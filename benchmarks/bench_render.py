@@ -0,0 +1,68 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import Callable
+import curses
+from solitaire_game.game import GameSolitaire, AREA_DECK, MOVE_INITIAL_TO_INITIAL
+from solitaire_game.headless import HeadlessGameUI
+from solitaire_game.replay import Replayer
+from solitaire_game.savefile import GameRecord
+from benchmarks.bench_engine import find_position
+from benchmarks.harness import benchmark
+
+
+def make_ui() -> HeadlessGameUI:
+    # A position in the middle of a game, with face up cards in several stacks
+    game: GameSolitaire = find_position(MOVE_INITIAL_TO_INITIAL)[0]
+    ui: HeadlessGameUI = HeadlessGameUI(height=50, width=100, game=game)
+    ui.refresh_screen()
+    return ui
+
+
+@benchmark('render.full_frame')
+def bench_full_frame() -> Callable[[], object]:
+    ui: HeadlessGameUI = make_ui()
+
+    def op():
+        ui.mark_all_dirty()
+        ui.refresh_screen()
+    return op
+
+
+@benchmark('render.cursor_key')
+def bench_cursor_key() -> Callable[[], object]:
+    # A key moving the cursor, only the two areas under the old and new cursor are redrawn
+    ui: HeadlessGameUI = make_ui()
+    return lambda: ui.handle_key(curses.KEY_RIGHT)
+
+
+@benchmark('render.key_burst')
+def bench_key_burst() -> Callable[[], object]:
+    # Ten keys read in the same frame, applied to the state and drawn once
+    ui: HeadlessGameUI = make_ui()
+    keys = [curses.KEY_RIGHT] * 10
+    return lambda: ui.handle_keys(keys)
+
+
+@benchmark('render.click')
+def bench_click() -> Callable[[], object]:
+    # A click on the stock: hit map lookup, deck switch and redraw of the deck, undone to keep the same position
+    ui: HeadlessGameUI = make_ui()
+    rect = ui.layout.area_rects[AREA_DECK]
+
+    def op():
+        ui.controller_click(rect.y, rect.x)
+        ui.handle_keys([ui.KEY_UNDO])
+    return op
+
+
+@benchmark('render.replay_game')
+def bench_replay_game() -> Callable[[], object]:
+    # All the frames of a recorded game, as text
+    game: GameSolitaire = find_position(MOVE_INITIAL_TO_INITIAL)[0]
+    record: GameRecord = GameRecord.from_game(game)
+    replayer: Replayer = Replayer(50, 100)
+
+    def op():
+        for frame in replayer.render_frames(record):
+            frame.get_text()
+    return op
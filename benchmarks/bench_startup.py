@@ -0,0 +1,40 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import Callable, List
+import subprocess
+import sys
+from benchmarks.harness import benchmark
+
+# Commands that do not load the UI, see tests/test_startup.py
+HEADLESS_COMMANDS: List[str] = ['sim', 'solve', 'rate', 'server', 'stats', 'autoplay']
+
+
+def run_process(args: List[str]) -> Callable[[], object]:
+    return lambda: subprocess.run([sys.executable] + args, check=True, stdout=subprocess.DEVNULL)
+
+
+@benchmark('startup.python')
+def bench_python() -> Callable[[], object]:
+    # Interpreter startup alone, the floor of the other startup benchmarks
+    return run_process(['-c', 'pass'])
+
+
+@benchmark('startup.play_help')
+def bench_play_help() -> Callable[[], object]:
+    return run_process(['-m', 'solitaire_game', '-h'])
+
+
+def register_headless(command: str):
+    @benchmark(f'startup.{command}_help')
+    def bench_command_help() -> Callable[[], object]:
+        return run_process(['-m', 'solitaire_game', command, '-h'])
+
+
+for headless_command in HEADLESS_COMMANDS:
+    register_headless(headless_command)
+
+
+@benchmark('startup.solve_deal')
+def bench_solve_deal() -> Callable[[], object]:
+    # A short run launched from a script: startup, imports and a small search
+    return run_process(['-m', 'solitaire_game', 'solve', '0', '--max-nodes', '1000'])
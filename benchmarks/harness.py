@@ -0,0 +1,106 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import Callable, Dict, List, Optional
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Benchmark name => factory. The factory prepares the data and returns the operation to time, so the setup is never
+# measured.
+BENCHMARKS: Dict[str, Callable[[], Callable[[], object]]] = {}
+
+
+def benchmark(name: str):
+    def register(factory: Callable[[], Callable[[], object]]):
+        BENCHMARKS[name] = factory
+        return factory
+    return register
+
+
+def get_peak_rss_kb() -> Optional[int]:
+    if resource is None:
+        return None
+    peak_rss: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on Mac OS, in kilobytes elsewhere
+    return peak_rss // 1024 if sys.platform == 'darwin' else peak_rss
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    index: int = min(int(round(q / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def calibrate(op: Callable[[], object], sample_time: float) -> int:
+    # Number of calls per sample, so that a sample lasts at least sample_time and the timer overhead is negligible
+    inner: int = 1
+    while True:
+        t_start: float = time.perf_counter()
+        for _ in range(inner):
+            op()
+        elapsed: float = time.perf_counter() - t_start
+        if elapsed >= sample_time or inner >= 1 << 20:
+            return inner
+        inner *= 2 if elapsed == 0 else max(2, min(10, int(sample_time / elapsed) + 1))
+
+
+def measure(name: str, op: Callable[[], object], min_time: float = 1.0, min_samples: int = 20,
+            sample_time: float = 0.001) -> Dict:
+    """
+    Time op until min_time is spent and min_samples are taken. Percentiles are computed on the per-call time of each
+    sample, a sample being a batch of calls for fast operations.
+    """
+    perf_counter = time.perf_counter
+    inner: int = calibrate(op, sample_time)
+    loop: range = range(inner)
+    samples: List[float] = []
+    t_end: float = perf_counter() + min_time
+    while len(samples) < min_samples or perf_counter() < t_end:
+        t_start: float = perf_counter()
+        for _ in loop:
+            op()
+        samples.append((perf_counter() - t_start) / inner)
+    total: float = sum(samples)
+    samples.sort()
+    return {
+        'name': name,
+        'ops_per_sec': round(len(samples) / total, 1),
+        'p50_us': round(percentile(samples, 50) * 1e6, 3),
+        'p99_us': round(percentile(samples, 99) * 1e6, 3),
+        'samples': len(samples),
+        'calls_per_sample': inner,
+        'peak_rss_kb': get_peak_rss_kb(),
+    }
+
+
+def compare(baseline: Dict, results: Dict, threshold: float) -> List[Dict]:
+    """
+    Compare the ops/sec of each benchmark with the baseline. A benchmark regresses when its ops/sec is lower than the
+    baseline by more than threshold (a ratio, 0.1 for 10%).
+    """
+    baseline_results: Dict[str, Dict] = {result['name']: result for result in baseline['results']}
+    rows: List[Dict] = []
+    for result in results['results']:
+        old: Optional[Dict] = baseline_results.get(result['name'])
+        if old is None:
+            continue
+        ratio: float = result['ops_per_sec'] / old['ops_per_sec'] if old['ops_per_sec'] else float('inf')
+        rows.append({'name': result['name'], 'baseline_ops_per_sec': old['ops_per_sec'],
+                     'ops_per_sec': result['ops_per_sec'], 'ratio': round(ratio, 3),
+                     'baseline_p99_us': old['p99_us'], 'p99_us': result['p99_us'],
+                     'regression': ratio < 1 - threshold})
+    return rows
+
+
+def format_comparison(rows: List[Dict]) -> str:
+    lines: List[str] = [f'{"benchmark":<32} {"baseline ops/s":>15} {"ops/s":>15} {"change":>8}  {"p99 µs":>21}']
+    for row in rows:
+        change: str = f'{(row["ratio"] - 1) * 100:+.1f}%'
+        p99: str = f'{row["baseline_p99_us"]:.1f} → {row["p99_us"]:.1f}'
+        flag: str = '  REGRESSION' if row['regression'] else ''
+        lines.append(f'{row["name"]:<32} {row["baseline_ops_per_sec"]:>15,.1f} {row["ops_per_sec"]:>15,.1f} '
+                     f'{change:>8}  {p99:>21}{flag}')
+    return '\n'.join(lines)
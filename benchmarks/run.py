@@ -0,0 +1,80 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import Dict, List, Optional
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from benchmarks.harness import BENCHMARKS, measure, compare, format_comparison
+# Register the benchmarks
+from benchmarks import bench_engine, bench_render, bench_playouts, bench_startup  # noqa: F401
+
+
+def run_benchmark(name: str, min_time: float) -> Dict:
+    op = BENCHMARKS[name]()
+    return measure(name, op, min_time=min_time)
+
+
+def run_isolated(name: str, min_time: float) -> Dict:
+    # One process per benchmark, so the peak RSS is the one of the benchmark and not of all the previous ones
+    output: str = subprocess.run([sys.executable, '-m', 'benchmarks', '--child', name, '--min-time', str(min_time)],
+                                 check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(output)
+
+
+def select_benchmarks(patterns: List[str]) -> List[str]:
+    return [name for name in BENCHMARKS if not patterns or any(pattern in name for pattern in patterns)]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Time the hot paths of the game.')
+    parser.add_argument('-k', '--filter', action='append', default=[],
+                        help='run only the benchmarks containing this text (repeatable)')
+    parser.add_argument('--min-time', type=float, default=1.0, help='seconds spent on each benchmark')
+    parser.add_argument('--quick', action='store_true', help='shortcut for --min-time 0.2')
+    parser.add_argument('--no-isolate', action='store_true',
+                        help='run all the benchmarks in this process (faster, peak RSS is cumulative)')
+    parser.add_argument('-o', '--output', default=None, help='write the results as JSON, e.g. to save a baseline')
+    parser.add_argument('--compare', default=None, help='baseline JSON file to compare the results with')
+    parser.add_argument('--input', default=None, help='compare the results of this JSON file instead of running')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='slowdown ratio considered a regression by --compare (default: 0.1)')
+    parser.add_argument('--list', action='store_true', help='list the benchmarks')
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    min_time: float = 0.2 if args.quick else args.min_time
+
+    if args.child:
+        print(json.dumps(run_benchmark(args.child, min_time)))
+        return
+    if args.list:
+        print('\n'.join(BENCHMARKS))
+        return
+
+    if args.input:
+        with open(args.input) as f:
+            results: Dict = json.load(f)
+    else:
+        results = {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+                   'platform': platform.platform(), 'min_time': min_time, 'results': []}
+        for name in select_benchmarks(args.filter):
+            result: Dict = run_benchmark(name, min_time) if args.no_isolate else run_isolated(name, min_time)
+            results['results'].append(result)
+            print(f'{name:<32} {result["ops_per_sec"]:>15,.1f} ops/s  p50 {result["p50_us"]:>12,.2f} µs  '
+                  f'p99 {result["p99_us"]:>12,.2f} µs  rss {result["peak_rss_kb"] or 0:>8,} kB', file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+    elif not args.compare:
+        print(json.dumps(results, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline: Dict = json.load(f)
+        rows: List[Dict] = compare(baseline, results, args.threshold)
+        print(format_comparison(rows))
+        if any(row['regression'] for row in rows):
+            sys.exit(1)
@@ -1,69 +1,12 @@
-from sys import platform
-
-BACK_CARD = """\
-╭───────╮
-│///////│
-│///4///│
-│/sushi/│
-│///////│
-╰───────╯\
-"""
-
-TOP_PART_CARD = """\
-╭───────╮\
-"""
-
-CARD_TEMPLATE_LINUX = """\
-╭───────╮
-│S xx   │
-│       │
-│       │
-│    yyS│
-╰───────╯\
-"""
-
-PART_CARD_TEMPLATE_LINUX = """\
-╭────
-│S xx
-│   
-│   
-│   
-╰────\
-"""
-
-TOP_PART_CARD_TEMPLATE_LINUX = """\
-╭───────╮
-│S xx   │\
-"""
-
-CARD_TEMPLATE_OSX = """\
-╭───────╮
-│Sxx    │
-│       │
-│       │
-│    yyS│
-╰───────╯\
-"""
-
-PART_CARD_TEMPLATE_OSX = """\
-╭───
-│Sxx
-│   
-│   
-│   
-╰───\
-"""
-
-TOP_PART_CARD_TEMPLATE_OSX = """\
-╭───────╮
-│Sxx    │\
-"""
-
-if 'linux' in platform:
-    CARD_TEMPLATE = CARD_TEMPLATE_LINUX
-    PART_CARD_TEMPLATE = PART_CARD_TEMPLATE_LINUX
-    TOP_PART_CARD_TEMPLATE = TOP_PART_CARD_TEMPLATE_LINUX
-else:
-    CARD_TEMPLATE = CARD_TEMPLATE_OSX
-    PART_CARD_TEMPLATE = PART_CARD_TEMPLATE_OSX
-    TOP_PART_CARD_TEMPLATE = TOP_PART_CARD_TEMPLATE_OSX
\ No newline at end of file
+# Author: 4sushi
+# The card templates are loaded on first access: the headless modules (engine, solver, simulations) do not need them
+TEMPLATE_NAMES = ('BACK_CARD', 'TOP_PART_CARD', 'CARD_TEMPLATE', 'PART_CARD_TEMPLATE', 'TOP_PART_CARD_TEMPLATE',
+                  'CARD_TEMPLATE_LINUX', 'PART_CARD_TEMPLATE_LINUX', 'TOP_PART_CARD_TEMPLATE_LINUX',
+                  'CARD_TEMPLATE_OSX', 'PART_CARD_TEMPLATE_OSX', 'TOP_PART_CARD_TEMPLATE_OSX')
+
+
+def __getattr__(name: str):
+    if name in TEMPLATE_NAMES:
+        from solitaire_game import templates
+        return getattr(templates, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,3 @@
+from solitaire_game.main import main
+
+main()
@@ -0,0 +1,308 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import Dict, List, Optional, Set, Tuple
+from concurrent.futures import Future
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+from solitaire_game.game import GameSolitaire, Move, Deck, MOVE_INITIAL_TO_INITIAL
+from solitaire_game.simulation import Policy, RandomPolicy, GreedyPolicy
+from solitaire_game.state import pack_game, unpack_game
+
+MOVE_SECONDS: float = 0.5  # search budget of a move
+MAX_ROLLOUT_MOVES: int = 300
+ROLLOUT_POLICIES: Dict[str, type] = {policy.name: policy for policy in (RandomPolicy, GreedyPolicy)}
+
+stop_event = None  # in the worker processes, set by RolloutPlayer.close to stop the rollouts running
+
+
+def init_worker(event):
+    global stop_event
+    stop_event = event
+
+
+def determinize(game: GameSolitaire, rng: random.Random) -> GameSolitaire:
+    """
+    Copy of the game where the cards the player has not seen are shuffled: the hidden cards of the initial stacks,
+    and the stock until the waste has been turned over once. The rollouts do not know more than the player.
+    """
+    sample: GameSolitaire = game.clone(with_journal=False)
+    hidden_stacks: List[int] = [i_stack for i_stack, stack in enumerate(sample.initial_stacks.stacks)
+                                if stack.hidden_cards]
+    cards: List = [card for i_stack in hidden_stacks for card in sample.initial_stacks.stacks[i_stack].hidden_cards]
+    is_stock_unseen: bool = sample.deck.nb_recycles == 0 and sample.deck.count_stock_cards() > 0
+    if is_stock_unseen:
+        cards += sample.deck.get_stock_cards()
+    if len(cards) < 2:
+        return sample
+    rng.shuffle(cards)
+    i_card: int = 0
+    for i_stack in hidden_stacks:
+        stack = sample.own_initial_stack(i_stack)
+        nb_hidden: int = len(stack.hidden_cards)
+        stack.hidden_cards = cards[i_card:i_card + nb_hidden]
+        stack.zobrist = stack.compute_zobrist()
+        i_card += nb_hidden
+    if is_stock_unseen:
+        sample.own_deck().set_stock_cards(cards[i_card:])
+    sample.init_hashes()
+    return sample
+
+
+def get_score(game: GameSolitaire) -> float:
+    # Share of the cards put on the final stacks, 1 for a won game: most random playouts are lost, the score tells
+    # the good ones from the bad ones
+    return game.final_stacks.count_cards() / game.NB_CARDS
+
+
+def run_rollouts(state: bytes, moves: List[Move], policy_name: str, max_seconds: Optional[float],
+                 max_rounds: Optional[int], max_moves: int, seed: int) -> Tuple[List[float], int]:
+    """
+    Rounds of rollouts until the budget is spent: each round samples the unseen cards, then plays each move followed
+    by a playout of the policy. The moves are compared on the same samples. Return the total score of each move and
+    the number of rounds.
+    """
+    game: GameSolitaire = unpack_game(state)
+    rng: random.Random = random.Random(seed)
+    policy: Policy = ROLLOUT_POLICIES[policy_name]()
+    scores: List[float] = [0.0] * len(moves)
+    nb_rounds: int = 0
+    t_end: Optional[float] = time.perf_counter() + max_seconds if max_seconds is not None else None
+    while True:
+        sample: GameSolitaire = determinize(game, rng)
+        for i_move, move in enumerate(moves):
+            rollout: GameSolitaire = sample.clone(with_journal=False)
+            rollout.apply(move)
+            policy.play(rollout, rng, max_moves)
+            scores[i_move] += get_score(rollout)
+        nb_rounds += 1
+        if (max_rounds is not None and nb_rounds >= max_rounds) or (t_end is not None and time.perf_counter() >= t_end):
+            return scores, nb_rounds
+        if stop_event is not None and stop_event.is_set():
+            return scores, nb_rounds
+
+
+def is_useful_move(game: GameSolitaire, move: Move) -> bool:
+    # A move between initial stacks helps if it turns a card face up, empties a stack or frees a card for the final
+    # stacks. The other ones only move the sequences around, and would fill the ties between the moves.
+    if move.kind != MOVE_INITIAL_TO_INITIAL:
+        return True
+    src_stack = game.initial_stacks.stacks[move.src_i_stack]
+    if move.quantity == src_stack.count_visible_cards():
+        return src_stack.count_hidden_cards() > 0 or game.initial_stacks.stacks[move.dest_i_stack].count_cards() > 0
+    card = src_stack.visible_cards[-move.quantity - 1]
+    return any(final_stack.can_put_card(card) for final_stack in game.final_stacks.stacks)
+
+
+def get_visited_hashes(game: GameSolitaire) -> Set[int]:
+    # Positions of the game so far, from its journal. Read once per game, see RolloutPlayer.reset
+    history: GameSolitaire = game.clone()
+    hashes: Set[int] = {history.zobrist_hash}
+    while history.undo():
+        hashes.add(history.zobrist_hash)
+    return hashes
+
+
+class RolloutResult:
+
+    def __init__(self, move: Optional[Move], scores: Dict[Move, float], rounds: int, elapsed: float):
+        self.move: Optional[Move] = move  # best move, None if the game can not progress anymore
+        self.scores: Dict[Move, float] = scores  # move => mean score of its rollouts
+        self.rounds: int = rounds  # rollouts of each move
+        self.elapsed: float = elapsed
+
+    def __repr__(self) -> str:
+        return f'RolloutResult(move={self.move}, moves={len(self.scores)}, rounds={self.rounds}, ' \
+               f'elapsed={self.elapsed:.3f}s)'
+
+
+class RolloutSearch:
+    """
+    Search of a move in progress, see RolloutPlayer.start. The rollouts run in the worker processes, result() waits
+    for them.
+    """
+
+    def __init__(self, zobrist_hash: int, moves: List[Move], priorities: List[int], futures: List[Future],
+                 t_start: float, move: Optional[Move] = None):
+        self.zobrist_hash: int = zobrist_hash  # position searched
+        self.moves: List[Move] = moves
+        self.priorities: List[int] = priorities  # score of the moves for the greedy policy, breaks the ties
+        self.futures: List[Future] = futures
+        self.t_start: float = t_start
+        self.move: Optional[Move] = move  # move found without rollout
+
+    def done(self) -> bool:
+        return all(future.done() for future in self.futures)
+
+    def result(self) -> RolloutResult:
+        if not self.futures:
+            return RolloutResult(self.move, {}, 0, time.perf_counter() - self.t_start)
+        scores: List[float] = [0.0] * len(self.moves)
+        nb_rounds: int = 0
+        for future in self.futures:
+            worker_scores, worker_rounds = future.result()
+            scores = [score + worker_score for score, worker_score in zip(scores, worker_scores)]
+            nb_rounds += worker_rounds
+        mean_scores: Dict[Move, float] = {move: score / nb_rounds for move, score in zip(self.moves, scores)}
+        i_move: int = max(range(len(self.moves)), key=lambda i: (round(scores[i] / nb_rounds, 9), self.priorities[i]))
+        move: Move = self.moves[i_move]
+        return RolloutResult(move, mean_scores, nb_rounds, time.perf_counter() - self.t_start)
+
+
+class RolloutPlayer:
+    """
+    Monte Carlo player: each legal move is followed by playouts of a simple policy from samples of the unseen cards,
+    the move with the best mean score is played. The playouts are spread across worker processes, for a time
+    budget (move_seconds) or a number of rollouts per move (rollouts, deterministic for a seed and a number of
+    workers). Moves leading back to a position of the game are not played, so the player can not loop.
+    """
+
+    name: str = 'rollout'
+
+    def __init__(self, policy: str = 'greedy', move_seconds: Optional[float] = MOVE_SECONDS,
+                 rollouts: Optional[int] = None, workers: Optional[int] = None,
+                 max_rollout_moves: int = MAX_ROLLOUT_MOVES, seed: Optional[int] = None):
+        if policy not in ROLLOUT_POLICIES:
+            raise ValueError(f'Error rollout player - Unknown policy {policy}')
+        if move_seconds is None and rollouts is None:
+            raise ValueError('Error rollout player - No budget, set move_seconds or rollouts')
+        self.policy: str = policy
+        self.move_seconds: Optional[float] = move_seconds
+        self.rollouts: Optional[int] = rollouts
+        self.workers: int = workers or os.cpu_count() or 1
+        self.max_rollout_moves: int = max_rollout_moves
+        self.rng: random.Random = random.Random(seed)
+        self.executor = None  # process pool, started by the first search in background
+        self.stop_event = None  # stops the rollouts of the workers, see close
+        self.futures: List[Future] = []  # rollouts of the last search started
+        self.visited_hashes: Set[int] = set()  # positions of the game played, see reset
+
+    def get_player_name(self) -> str:
+        # Player of the statistics and of the results, e.g. rollout-greedy
+        return f'{self.name}-{self.policy}'
+
+    def reset(self, game: GameSolitaire):
+        # Start playing a game: its positions so far are read from its journal, then each position searched is added
+        self.visited_hashes = get_visited_hashes(game)
+
+    def get_candidate_moves(self, game: GameSolitaire) -> List[Move]:
+        self.visited_hashes.add(game.zobrist_hash)
+        moves: List[Move] = []
+        for move in game.legal_moves():
+            if not is_useful_move(game, move):
+                continue
+            child: GameSolitaire = game.clone(with_journal=False)
+            child.apply(move)
+            if child.zobrist_hash not in self.visited_hashes:
+                moves.append(move)
+        return moves
+
+    def start(self, game: GameSolitaire, wait: bool = False) -> RolloutSearch:
+        # Start the search of the move of the position, without waiting for it: the rollouts run in the process pool,
+        # even with a single worker. With wait, a single worker runs them in this process instead.
+        t_start: float = time.perf_counter()
+        auto_moves: Optional[List[Move]] = game.get_auto_complete_moves()
+        if auto_moves:
+            # The game is decided
+            return RolloutSearch(game.zobrist_hash, [], [], [], t_start, auto_moves[0])
+        moves: List[Move] = self.get_candidate_moves(game)
+        if len(moves) <= 1:
+            return RolloutSearch(game.zobrist_hash, moves, [], [], t_start, moves[0] if moves else None)
+        state: bytes = pack_game(game)
+        max_rounds: Optional[int] = math.ceil(self.rollouts / self.workers) if self.rollouts else None
+        futures: List[Future] = []
+        for _ in range(self.workers):
+            args: Tuple = (state, moves, self.policy, self.move_seconds, max_rounds, self.max_rollout_moves,
+                           self.rng.getrandbits(64))
+            if wait and self.workers == 1:
+                future: Future = Future()
+                future.set_result(run_rollouts(*args))
+            else:
+                future = self.get_executor().submit(run_rollouts, *args)
+            futures.append(future)
+        self.futures = futures
+        greedy_policy: GreedyPolicy = GreedyPolicy()
+        priorities: List[int] = [greedy_policy.get_move_score(game, move) for move in moves]
+        return RolloutSearch(game.zobrist_hash, moves, priorities, futures, t_start)
+
+    def get_executor(self):
+        if self.executor is None:
+            # Imported here, the headless player with a single worker plays in this process. Spawned, so the workers
+            # do not inherit the state of curses and the threads of the game.
+            from concurrent.futures import ProcessPoolExecutor
+            context = multiprocessing.get_context('spawn')
+            self.stop_event = context.Event()
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=context, initializer=init_worker,
+                                                initargs=(self.stop_event,))
+        return self.executor
+
+    def search(self, game: GameSolitaire) -> RolloutResult:
+        return self.start(game, wait=True).result()
+
+    def choose_move(self, game: GameSolitaire) -> Optional[Move]:
+        return self.search(game).move
+
+    def play(self, game: GameSolitaire, max_moves: int = 1000) -> Tuple[bool, int]:
+        # Play the game until it is won, no move is left or max_moves is reached. Return if it is won and the number
+        # of moves played.
+        self.reset(game)
+        nb_moves: int = 0
+        while nb_moves < max_moves and not game.is_game_won():
+            move: Optional[Move] = self.choose_move(game)
+            if move is None:
+                break
+            game.apply(move)
+            nb_moves += 1
+        return game.is_game_won(), nb_moves
+
+    def close(self):
+        if self.executor is not None:
+            # The rollouts not started are cancelled, the running ones stop after their current round, so leaving the
+            # game does not wait for the budget of the move
+            for future in self.futures:
+                future.cancel()
+            self.stop_event.set()
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog='solitaire autoplay',
+                                     description='Play seeded deals with the Monte Carlo rollout player, without UI. '
+                                                 'One JSON line per deal.')
+    parser.add_argument('seeds', type=int, nargs='*', help='seeds of the deals (default: --count deals)')
+    parser.add_argument('-n', '--count', type=int, default=10, help='number of deals, from --start-seed')
+    parser.add_argument('--start-seed', type=int, default=0, help='seed of the first deal')
+    parser.add_argument('--draw', type=int, choices=[1, 3], default=Deck.DRAW_COUNT, help='cards drawn from the stock')
+    parser.add_argument('--max-passes', type=int, default=None, help='max passes through the stock (default: no limit)')
+    parser.add_argument('-p', '--policy', choices=sorted(ROLLOUT_POLICIES), default='greedy',
+                        help='policy of the playouts')
+    parser.add_argument('--move-seconds', type=float, default=None,
+                        help=f'search budget of a move (default: {MOVE_SECONDS}, unless --rollouts is set)')
+    parser.add_argument('--rollouts', type=int, default=None,
+                        help='rollouts of each move, split between the workers: the games only depend on the seed '
+                             'and the number of workers')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='number of processes (default: cpu count)')
+    parser.add_argument('--max-moves', type=int, default=1000)
+    args = parser.parse_args(argv)
+    move_seconds: Optional[float] = args.move_seconds if args.move_seconds or args.rollouts else MOVE_SECONDS
+    player: RolloutPlayer = RolloutPlayer(args.policy, move_seconds, args.rollouts, args.workers)
+    seeds: List[int] = args.seeds or list(range(args.start_seed, args.start_seed + args.count))
+    try:
+        for seed in seeds:
+            t_start: float = time.perf_counter()
+            player.rng.seed(seed)
+            game: GameSolitaire = GameSolitaire(seed=seed, draw_count=args.draw, max_passes=args.max_passes)
+            won, nb_moves = player.play(game, args.max_moves)
+            print(json.dumps({'seed': seed, 'policy': player.get_player_name(), 'won': won, 'moves': nb_moves,
+                              'time': round(time.perf_counter() - t_start, 6)}), flush=True)
+    finally:
+        player.close()
+
+
+if __name__ == '__main__':
+    main()
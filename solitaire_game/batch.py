@@ -0,0 +1,450 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import Optional, List, Tuple
+import random
+from solitaire_game.game import GameSolitaire, GameCards, Card, Move, Deck, InitialStack, InitialStacks, FinalStacks, \
+    MOVE_SWITCH_DECK, MOVE_DECK_TO_FINAL, MOVE_DECK_TO_INITIAL, MOVE_FINAL_TO_INITIAL, MOVE_INITIAL_TO_INITIAL, \
+    MOVE_INITIAL_TO_FINAL
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError('The batch engine requires numpy, install it with: pip install solitaire-game[batch]') from e
+
+NB_INITIAL_STACKS: int = InitialStacks.NB_STACKS
+NB_FINAL_STACKS: int = FinalStacks.NB_STACKS
+NB_DECK_CARDS: int = 24
+MAX_STACK_CARDS: int = NB_INITIAL_STACKS - 1 + GameCards.NB_VALUES  # hidden cards + a full sequence
+EMPTY: int = -1
+
+ACE: int = 1
+KING: int = GameCards.NB_VALUES
+
+# The cards are sorted by symbol, then by value (see GameCards.get_card_id), the red symbols first
+NB_RED_CARDS: int = sum(card.color == 'red' for card in GameCards.CARDS)
+
+
+def get_values(cards):
+    # Values of the cards, 0 for EMPTY. Computed with comparisons: a take() of a table is several times slower.
+    values = cards + 1
+    for first_id in range(KING, len(GameCards.CARDS), KING):
+        values -= np.int8(KING) * (cards >= first_id)
+    return values
+
+
+def get_phases(cards, values):
+    # Parity of value + color: the colors of a sequence of an initial stack alternate, all its cards have the same
+    # phase. EMPTY (255 as unsigned) is not red.
+    return (values + (cards.view(np.uint8) < NB_RED_CARDS)) & 1
+
+
+# Rules of InitialStack.can_put_cards and FinalStack.can_put_card (MoveRules of the 52 cards game), computed from the
+# card ids (EMPTY for an empty stack) and their values and phases, for all the games at once.
+
+def can_put_initial(cards, values, phases, bottoms, bottom_values, bottom_phases):
+    # On a card of the next value and of the other color, so of the same phase. The value of an empty stack is 0,
+    # only the kings go on it.
+    return (cards != EMPTY) & (((bottom_values == values + 1) & (bottom_phases == phases)) |
+                               ((bottoms == EMPTY) & (values == KING)))
+
+
+def can_put_final(cards, values, tops):
+    # A final stack is a sequence of the same symbol, the next card has the next id (EMPTY + 1 is the first ace)
+    return ((tops == EMPTY) & (values == ACE)) | ((cards == tops + 1) & (values != ACE))
+
+
+# Action space, every game of the batch has the same actions:
+#   switch deck, deck => final stack, deck => initial stack, final stack => initial stack,
+#   initial stack => final stack, initial stack => initial stack (the quantity is implied by the destination)
+ACTION_SWITCH_DECK: int = 0
+ACTION_DECK_TO_FINAL: int = 1
+ACTION_DECK_TO_INITIAL: int = ACTION_DECK_TO_FINAL + NB_FINAL_STACKS
+ACTION_FINAL_TO_INITIAL: int = ACTION_DECK_TO_INITIAL + NB_INITIAL_STACKS
+ACTION_INITIAL_TO_FINAL: int = ACTION_FINAL_TO_INITIAL + NB_FINAL_STACKS * NB_INITIAL_STACKS
+ACTION_INITIAL_TO_INITIAL: int = ACTION_INITIAL_TO_FINAL + NB_INITIAL_STACKS * NB_FINAL_STACKS
+NB_ACTIONS: int = ACTION_INITIAL_TO_INITIAL + NB_INITIAL_STACKS * NB_INITIAL_STACKS
+NO_ACTION: int = -1
+CHUNK_SIZE: int = 16384  # games played at once by playouts
+
+
+class BatchGames:
+    """
+    K games stored in numpy arrays, legal moves are computed and applied for all the games at once.
+    The rules are the ones of InitialStack.can_put_cards, FinalStack.can_put_card and Deck.switch_cards, all the games
+    have the same deck options (draw count, max passes).
+    The game is the last axis of the arrays (e.g. stacks_len[i_stack, k]): the operations on the stacks or the actions
+    of all the games run on contiguous rows of K values.
+    """
+
+    def __init__(self, nb_games: int, draw_count: int = Deck.DRAW_COUNT, max_passes: Optional[int] = None):
+        self.nb_games: int = nb_games
+        self.draw_count: int = draw_count
+        self.max_passes: Optional[int] = max_passes
+        # Cards of the deck: the waste (pickable card last) in deck[:nb_waste], the stock (next card first) in
+        # deck[stock_start:stock_end]. The cards picked from the waste leave a gap before the stock, a draw copies the
+        # cards from the stock to the end of the waste.
+        self.deck = np.full((NB_DECK_CARDS, nb_games), EMPTY, dtype=np.int8)
+        self.nb_waste = np.zeros(nb_games, dtype=np.int8)
+        self.stock_start = np.zeros(nb_games, dtype=np.int8)
+        self.stock_end = np.zeros(nb_games, dtype=np.int8)
+        self.nb_visible = np.zeros(nb_games, dtype=np.int8)
+        self.nb_recycles = np.zeros(nb_games, dtype=np.int16)
+        self.stacks = np.full((NB_INITIAL_STACKS, MAX_STACK_CARDS, nb_games), EMPTY, dtype=np.int8)
+        self.stacks_len = np.zeros((NB_INITIAL_STACKS, nb_games), dtype=np.int8)
+        self.stacks_hidden = np.zeros((NB_INITIAL_STACKS, nb_games), dtype=np.int8)
+        # Last card of each initial stack (the card on which cards are put), EMPTY if the stack is empty
+        self.bottoms = np.full((NB_INITIAL_STACKS, nb_games), EMPTY, dtype=np.int8)
+        self.final_tops = np.full((NB_FINAL_STACKS, nb_games), EMPTY, dtype=np.int8)
+        self.final_len = np.zeros((NB_FINAL_STACKS, nb_games), dtype=np.int8)
+        self.index = np.arange(nb_games)
+
+    ARRAYS: Tuple[str, ...] = ('deck', 'nb_waste', 'stock_start', 'stock_end', 'nb_visible', 'nb_recycles', 'stacks',
+                               'stacks_len', 'stacks_hidden', 'bottoms', 'final_tops', 'final_len')
+
+    @classmethod
+    def from_games(cls, games: List[GameSolitaire]) -> BatchGames:
+        # All the games must have the same deck options (draw count, max passes)
+        batch: BatchGames = cls(len(games), games[0].deck.draw_count, games[0].deck.max_passes)
+        for k, game in enumerate(games):
+            batch.set_game(k, game)
+        return batch
+
+    @classmethod
+    def from_seeds(cls, seeds: List[int], draw_count: int = Deck.DRAW_COUNT,
+                   max_passes: Optional[int] = None) -> BatchGames:
+        # Same deals as GameSolitaire(seed=seed), without building the objects: the shuffled cards are dealt to the
+        # deck first, then to the initial stacks (i hidden cards and 1 visible card for the stack i)
+        cards = np.empty((len(GameCards.CARDS), len(seeds)), dtype=np.int8)
+        for k, seed in enumerate(seeds):
+            card_ids: List[int] = list(range(len(GameCards.CARDS)))
+            random.Random(seed).shuffle(card_ids)
+            cards[:, k] = card_ids
+        batch: BatchGames = cls(len(seeds), draw_count, max_passes)
+        batch.deck[:] = cards[:NB_DECK_CARDS]
+        batch.stock_end[:] = NB_DECK_CARDS
+        i_card: int = NB_DECK_CARDS
+        for i_stack in range(NB_INITIAL_STACKS):
+            batch.stacks[i_stack, :i_stack + 1] = cards[i_card:i_card + i_stack + 1]
+            batch.stacks_len[i_stack] = i_stack + 1
+            batch.stacks_hidden[i_stack] = i_stack
+            batch.bottoms[i_stack] = cards[i_card + i_stack]
+            i_card += i_stack + 1
+        return batch
+
+    def set_game(self, k: int, game: GameSolitaire):
+        deck: Deck = game.deck
+        cards: List[Card] = deck.waste + deck.get_stock_cards()
+        self.deck[:, k] = EMPTY
+        self.deck[:len(cards), k] = [card.id for card in cards]
+        self.nb_waste[k] = self.stock_start[k] = len(deck.waste)
+        self.stock_end[k] = len(cards)
+        self.nb_visible[k] = deck.nb_visible
+        self.nb_recycles[k] = deck.nb_recycles
+        self.stacks[:, :, k] = EMPTY
+        for i_stack, stack in enumerate(game.initial_stacks.stacks):
+            cards = stack.hidden_cards + stack.visible_cards
+            self.stacks[i_stack, :len(cards), k] = [card.id for card in cards]
+            self.stacks_len[i_stack, k] = len(cards)
+            self.stacks_hidden[i_stack, k] = len(stack.hidden_cards)
+            self.bottoms[i_stack, k] = cards[-1].id if cards else EMPTY
+        for i_stack, stack in enumerate(game.final_stacks.stacks):
+            self.final_tops[i_stack, k] = stack.cards[-1].id if stack.cards else EMPTY
+            self.final_len[i_stack, k] = len(stack.cards)
+
+    def get_game(self, k: int) -> GameSolitaire:
+        cards: List[Card] = GameCards.CARDS
+        waste_cards: List[Card] = [cards[card_id] for card_id in self.deck[:self.nb_waste[k], k]]
+        stock_cards: List[Card] = [cards[card_id] for card_id in self.deck[self.stock_start[k]:self.stock_end[k], k]]
+        deck: Deck = Deck.from_cards(stock_cards, waste_cards, int(self.nb_visible[k]),
+                                     int(self.nb_recycles[k]) + 1, self.draw_count, self.max_passes)
+        stacks: List[InitialStack] = []
+        for i_stack in range(NB_INITIAL_STACKS):
+            stack_len: int = int(self.stacks_len[i_stack, k])
+            stack_cards: List[Card] = [cards[card_id] for card_id in self.stacks[i_stack, :stack_len, k]]
+            nb_hidden: int = int(self.stacks_hidden[i_stack, k])
+            stacks.append(InitialStack(stack_cards[:nb_hidden], stack_cards[nb_hidden:], i_stack))
+        final_stacks: FinalStacks = FinalStacks()
+        for i_stack, stack in enumerate(final_stacks.stacks):
+            top: int = int(self.final_tops[i_stack, k])
+            # A final stack is a sequence of the same suit, from the ace to the top card
+            stack.set_cards([cards[card_id] for card_id in range(top - self.final_len[i_stack, k] + 1, top + 1)])
+        return GameSolitaire.from_stacks(deck, InitialStacks.from_stacks(stacks), final_stacks, len(cards))
+
+    def take(self, games) -> BatchGames:
+        # Copy of a subset of the games, see put to write them back. take() returns C-contiguous arrays, unlike the
+        # fancy indexing of the last axis: apply writes the stacks through a flat view.
+        batch: BatchGames = BatchGames(len(games), self.draw_count, self.max_passes)
+        for name in self.ARRAYS:
+            setattr(batch, name, getattr(self, name).take(games, axis=-1))
+        return batch
+
+    def put(self, games, batch: BatchGames):
+        for name in self.ARRAYS:
+            getattr(self, name)[..., games] = getattr(batch, name)
+
+    def is_game_won(self):
+        return self.final_len.sum(axis=0) == len(GameCards.CARDS)
+
+    def get_deck_cards(self):
+        # Pickable card of the deck of each game (top card of the waste), EMPTY if there is none
+        cards = self.deck[np.maximum(self.nb_waste - 1, 0), self.index]
+        return np.where(self.nb_waste > 0, cards, EMPTY)
+
+    def can_switch_deck(self):
+        can_recycle = self.nb_waste > 0
+        if self.max_passes is not None:
+            can_recycle &= self.nb_recycles < self.max_passes - 1
+        return (self.stock_start < self.stock_end) | can_recycle
+
+    def get_deck_len(self):
+        return self.nb_waste + self.stock_end - self.stock_start
+
+    def get_initial_moves(self, values, phases):
+        """
+        Moves between initial stacks, from the values and phases of the bottom cards. Return (src, dest, K) arrays:
+        the moves on a card, the moves on an empty stack, and the number of cards moved after the first one for the
+        moves on a card.
+        """
+        nb_visible = self.stacks_len - self.stacks_hidden
+        # On a card, the first card moved has the value below it: it is one of the visible cards if the number of
+        # cards after it is in [0, nb_visible[ (negative numbers are above 127 as unsigned)
+        nb_after = values[None, :, :] - (values + 1)[:, None, :]
+        on_card = (nb_after.view(np.uint8) < nb_visible[:, None, :]) & (phases[:, None, :] == phases[None, :, :])
+        # On an empty stack, all the visible cards if the first one is a king
+        king_first = (nb_visible > 0) & (values + nb_visible - 1 == KING)
+        on_empty = (self.bottoms == EMPTY)[None, :, :] & king_first[:, None, :]
+        return on_card, on_empty, nb_after
+
+    def get_legal_actions(self, greedy: bool = False):
+        """
+        Legal actions of the games: (NB_ACTIONS, K). With greedy, only the actions of the best priority of each game
+        are kept: final stacks first, then the moves between initial stacks turning a hidden card face up, then the
+        deck to the initial stacks, then the deck switch. Moves from the final stacks are never played.
+        """
+        legal = np.empty((NB_ACTIONS, self.nb_games), dtype=bool)
+        switch_deck = legal[ACTION_SWITCH_DECK]
+        deck_to_final = legal[ACTION_DECK_TO_FINAL:ACTION_DECK_TO_INITIAL]
+        deck_to_initial = legal[ACTION_DECK_TO_INITIAL:ACTION_FINAL_TO_INITIAL]
+        final_to_initial = legal[ACTION_FINAL_TO_INITIAL:ACTION_INITIAL_TO_FINAL]
+        initial_to_final = legal[ACTION_INITIAL_TO_FINAL:ACTION_INITIAL_TO_INITIAL]
+        initial_to_initial = legal[ACTION_INITIAL_TO_INITIAL:]
+
+        deck_cards = self.get_deck_cards()
+        deck_values = get_values(deck_cards)
+        bottoms, tops = self.bottoms, self.final_tops
+        values = get_values(bottoms)
+        phases = get_phases(bottoms, values)
+        switch_deck[:] = self.can_switch_deck()
+        deck_to_final[:] = can_put_final(deck_cards, deck_values, tops)
+        deck_to_initial[:] = can_put_initial(deck_cards, deck_values, get_phases(deck_cards, deck_values), bottoms,
+                                             values, phases)
+        initial_to_final[:] = can_put_final(bottoms[:, None, :], values[:, None, :], tops[None, :, :]) \
+            .reshape(-1, self.nb_games)
+        on_card, on_empty, nb_after = self.get_initial_moves(values, phases)
+        if not greedy:
+            top_values = get_values(tops)
+            final_to_initial[:] = can_put_initial(tops[:, None, :], top_values[:, None, :],
+                                                  get_phases(tops, top_values)[:, None, :], bottoms[None, :, :],
+                                                  values[None, :, :], phases[None, :, :]).reshape(-1, self.nb_games)
+            initial_to_initial[:] = (on_card | on_empty).reshape(-1, self.nb_games)
+            return legal
+        final_to_initial[:] = False
+        nb_visible = self.stacks_len - self.stacks_hidden
+        reveal = on_empty | (on_card & (nb_after == (nb_visible - 1)[:, None, :]))
+        initial_to_initial[:] = (reveal & (self.stacks_hidden > 0)[:, None, :]).reshape(-1, self.nb_games)
+        # Priorities: the actions of a lower priority are dropped when a game has a legal action of a higher one
+        better = deck_to_final.any(axis=0) | initial_to_final.any(axis=0)
+        initial_to_initial &= ~better
+        better |= initial_to_initial.any(axis=0)
+        deck_to_initial &= ~better
+        better |= deck_to_initial.any(axis=0)
+        switch_deck &= ~better
+        return legal
+
+    def legal_mask(self):
+        # Legal actions of each game: (K, NB_ACTIONS)
+        return self.get_legal_actions().T
+
+    def apply(self, actions):
+        # actions: (K,) action of each game, NO_ACTION to skip a game. Actions are not validated, see legal_mask.
+        actions = np.asarray(actions, dtype=np.intp)
+
+        games = np.nonzero(actions == ACTION_SWITCH_DECK)[0]
+        if len(games):
+            self.switch_deck(games)
+
+        games = np.nonzero((actions >= ACTION_DECK_TO_FINAL) & (actions < ACTION_FINAL_TO_INITIAL))[0]
+        if len(games):
+            cards = self.deck[self.nb_waste[games] - 1, games]
+            self.pick_deck_cards(games)
+            to_final = actions[games] < ACTION_DECK_TO_INITIAL
+            self.put_final_cards(games[to_final], actions[games[to_final]] - ACTION_DECK_TO_FINAL, cards[to_final])
+            self.put_stack_cards(games[~to_final], actions[games[~to_final]] - ACTION_DECK_TO_INITIAL, cards[~to_final])
+
+        games = np.nonzero((actions >= ACTION_FINAL_TO_INITIAL) & (actions < ACTION_INITIAL_TO_FINAL))[0]
+        if len(games):
+            src, dest = np.divmod(actions[games] - ACTION_FINAL_TO_INITIAL, NB_INITIAL_STACKS)
+            cards = self.final_tops[src, games]
+            self.final_len[src, games] -= 1
+            self.final_tops[src, games] = np.where(self.final_len[src, games] > 0, cards - 1, EMPTY)
+            self.put_stack_cards(games, dest, cards)
+
+        games = np.nonzero((actions >= ACTION_INITIAL_TO_FINAL) & (actions < ACTION_INITIAL_TO_INITIAL))[0]
+        if len(games):
+            src, dest = np.divmod(actions[games] - ACTION_INITIAL_TO_FINAL, NB_FINAL_STACKS)
+            cards = self.bottoms[src, games]
+            self.pick_stack_cards(games, src, np.ones(len(games), dtype=np.int8))
+            self.put_final_cards(games, dest, cards)
+
+        games = np.nonzero(actions >= ACTION_INITIAL_TO_INITIAL)[0]
+        if len(games):
+            src, dest = np.divmod(actions[games] - ACTION_INITIAL_TO_INITIAL, NB_INITIAL_STACKS)
+            quantities = self.get_move_quantity(games, src, dest)
+            # All the cards moved at once: the j-th card moved, in the flat stacks array
+            moved = np.arange(GameCards.NB_VALUES)[None, :] < quantities[:, None]
+            j = np.nonzero(moved)[1] * self.nb_games
+            src_cards = np.repeat(((src * MAX_STACK_CARDS + self.stacks_len[src, games] - quantities) * self.nb_games +
+                                   games), quantities) + j
+            dest_cards = np.repeat(((dest * MAX_STACK_CARDS + self.stacks_len[dest, games]) * self.nb_games + games),
+                                   quantities) + j
+            stacks = self.stacks.reshape(-1)
+            stacks[dest_cards] = stacks[src_cards]
+            self.stacks_len[dest, games] += quantities
+            self.bottoms[dest, games] = self.bottoms[src, games]
+            self.pick_stack_cards(games, src, quantities)
+
+    def get_move_quantity(self, games, src, dest):
+        # Quantity of cards of a legal move between initial stacks, for one move of each given game
+        src_bottoms, dest_bottoms = self.bottoms[src, games], self.bottoms[dest, games]
+        return np.where(dest_bottoms == EMPTY, self.stacks_len[src, games] - self.stacks_hidden[src, games],
+                        get_values(dest_bottoms) - get_values(src_bottoms))
+
+    def switch_deck(self, games):
+        # Draw cards from the stock, or turn the waste over as the new stock when the stock is empty
+        nb_waste, stock_start, stock_end = self.nb_waste[games], self.stock_start[games], self.stock_end[games]
+        is_recycle = stock_start == stock_end
+        nb_drawn = np.minimum(self.draw_count, stock_end - stock_start)
+        # draw_count cards are copied for all the games: the slots past the cards drawn are never read, they are between
+        # the waste and the stock, or past the stock. The waste ends before the stock starts, so an index past the end
+        # of the deck on the waste side is also past it on the stock side: both are clipped to the last slot, which is
+        # copied on itself.
+        last: int = NB_DECK_CARDS - 1
+        for i_card in range(self.draw_count):
+            self.deck[np.minimum(nb_waste + i_card, last), games] = \
+                self.deck[np.minimum(stock_start + i_card, last), games]
+        # Turned over, the waste is the new stock: its first card is the next one drawn
+        self.stock_start[games] = np.where(is_recycle, 0, stock_start + nb_drawn)
+        self.stock_end[games] = np.where(is_recycle, nb_waste, stock_end)
+        self.nb_waste[games] = np.where(is_recycle, 0, nb_waste + nb_drawn)
+        self.nb_visible[games] = np.where(is_recycle, 0, nb_drawn)
+        self.nb_recycles[games] += is_recycle
+
+    def pick_deck_cards(self, games):
+        # Remove the top card of the waste
+        self.nb_waste[games] -= 1
+        # Once the cards of the last draw are picked, the top card of the waste is shown
+        self.nb_visible[games] = np.minimum(np.maximum(self.nb_visible[games] - 1, 1), self.nb_waste[games])
+
+    def put_final_cards(self, games, i_stacks, cards):
+        self.final_tops[i_stacks, games] = cards
+        self.final_len[i_stacks, games] += 1
+
+    def put_stack_cards(self, games, i_stacks, cards):
+        self.stacks[i_stacks, self.stacks_len[i_stacks, games], games] = cards
+        self.stacks_len[i_stacks, games] += 1
+        self.bottoms[i_stacks, games] = cards
+
+    def pick_stack_cards(self, games, i_stacks, quantities):
+        # The cards past the length of a stack are never read, they are left in the array
+        lengths = self.stacks_len[i_stacks, games] - quantities
+        self.stacks_len[i_stacks, games] = lengths
+        self.bottoms[i_stacks, games] = np.where(lengths > 0, self.stacks[i_stacks, np.maximum(lengths - 1, 0), games],
+                                                 EMPTY)
+        # Turn the last hidden card face up
+        hidden = self.stacks_hidden[i_stacks, games]
+        self.stacks_hidden[i_stacks, games] = np.where((lengths == hidden) & (hidden > 0), hidden - 1, hidden)
+
+    def move_to_action(self, move: Move) -> int:
+        if move.kind == MOVE_SWITCH_DECK:
+            return ACTION_SWITCH_DECK
+        if move.kind == MOVE_DECK_TO_FINAL:
+            return ACTION_DECK_TO_FINAL + move.dest_i_stack
+        if move.kind == MOVE_DECK_TO_INITIAL:
+            return ACTION_DECK_TO_INITIAL + move.dest_i_stack
+        if move.kind == MOVE_FINAL_TO_INITIAL:
+            return ACTION_FINAL_TO_INITIAL + move.src_i_stack * NB_INITIAL_STACKS + move.dest_i_stack
+        if move.kind == MOVE_INITIAL_TO_FINAL:
+            return ACTION_INITIAL_TO_FINAL + move.src_i_stack * NB_FINAL_STACKS + move.dest_i_stack
+        return ACTION_INITIAL_TO_INITIAL + move.src_i_stack * NB_INITIAL_STACKS + move.dest_i_stack
+
+    def action_to_move(self, k: int, action: int) -> Move:
+        if action == ACTION_SWITCH_DECK:
+            return Move(MOVE_SWITCH_DECK, 0, 0, 0)
+        if action < ACTION_DECK_TO_INITIAL:
+            return Move(MOVE_DECK_TO_FINAL, 0, action - ACTION_DECK_TO_FINAL, 1)
+        if action < ACTION_FINAL_TO_INITIAL:
+            return Move(MOVE_DECK_TO_INITIAL, 0, action - ACTION_DECK_TO_INITIAL, 1)
+        if action < ACTION_INITIAL_TO_FINAL:
+            src, dest = divmod(action - ACTION_FINAL_TO_INITIAL, NB_INITIAL_STACKS)
+            return Move(MOVE_FINAL_TO_INITIAL, src, dest, 1)
+        if action < ACTION_INITIAL_TO_INITIAL:
+            src, dest = divmod(action - ACTION_INITIAL_TO_FINAL, NB_FINAL_STACKS)
+            return Move(MOVE_INITIAL_TO_FINAL, src, dest, 1)
+        src, dest = divmod(action - ACTION_INITIAL_TO_INITIAL, NB_INITIAL_STACKS)
+        quantity = self.get_move_quantity(np.array([k]), np.array([src]), np.array([dest]))
+        return Move(MOVE_INITIAL_TO_INITIAL, src, dest, int(quantity[0]))
+
+
+def choose_actions(legal, rng: np.random.Generator):
+    # One legal action of each game drawn uniformly: the r-th legal action is the number of actions before which
+    # there are at most r legal ones. NB_ACTIONS (no action) for the games without legal action.
+    legal = legal.view(np.uint8)
+    counts = np.empty(legal.shape, dtype=np.uint8)
+    counts[0] = legal[0]
+    for action in range(1, NB_ACTIONS):
+        np.add(counts[action - 1], legal[action], out=counts[action])
+    r = (rng.random(legal.shape[1]) * counts[-1]).astype(np.uint8)
+    return np.add.reduce(counts <= r, axis=0, dtype=np.uint8).astype(np.int16)
+
+
+def playouts(batch: BatchGames, policy: str = 'random', max_moves: int = 1000,
+             rng: Optional[np.random.Generator] = None, chunk_size: int = CHUNK_SIZE) -> Tuple:
+    """
+    Play all the games of the batch until they are won, stuck or max_moves is reached, same policies as the
+    simulation module. With the greedy policy, a move between initial stacks is only played if it turns a hidden card
+    face up. The games are played by chunks of chunk_size games, whose arrays stay in the CPU caches.
+    Return the won games (K,) and the number of moves played by each game (K,).
+    """
+    rng = rng or np.random.default_rng()
+    nb_moves = np.zeros(batch.nb_games, dtype=np.int32)
+    games = np.nonzero(~batch.is_game_won())[0]
+    for i_game in range(0, len(games), chunk_size):
+        play_games(batch, games[i_game:i_game + chunk_size], policy, max_moves, rng, nb_moves)
+    return batch.is_game_won(), nb_moves
+
+
+def play_games(batch: BatchGames, games, policy: str, max_moves: int, rng: np.random.Generator, nb_moves):
+    # Playouts of the given games of the batch, see playouts. Finished games are regularly removed from the arrays, so
+    # the cost of a step follows the games still played.
+    played: BatchGames = batch.take(games)
+    nb_switches = np.zeros(len(games), dtype=np.int32)
+    active = np.ones(len(games), dtype=bool)
+    for _ in range(max_moves):
+        nb_active: int = int(active.sum())
+        if nb_active == 0:
+            break
+        if nb_active < len(games) // 2:
+            batch.put(games, played)
+            games, nb_switches = games[active], nb_switches[active]
+            played = batch.take(games)
+            active = np.ones(len(games), dtype=bool)
+
+        actions = choose_actions(played.get_legal_actions(greedy=policy == 'greedy'), rng)
+        # A full cycle of the deck without any other move, the game is stuck
+        nb_switches = np.where(actions == ACTION_SWITCH_DECK, nb_switches + 1, 0)
+        stuck = nb_switches > played.get_deck_len() // played.draw_count + 2
+        active &= (actions < NB_ACTIONS) & ~stuck
+        played.apply(np.where(active, actions, NO_ACTION))
+        nb_moves[games] += active
+        active &= ~played.is_game_won()
+    batch.put(games, played)
@@ -0,0 +1,248 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+from collections import deque
+import argparse
+import math
+import mmap
+import os
+import random
+import struct
+import sys
+from solitaire_game.game import GameSolitaire, Deck
+from solitaire_game.solver import Solver, SolverResult, STATUS_SOLVED, STATUS_UNSOLVABLE, STATUS_UNKNOWN
+
+# Ratings of the deals, appended by the rating runs: fixed size records, so a truncated record (interrupted run) is
+# found from the size of the file. The first record is the header.
+#   header: magic, draw count (u8), max passes (u8, 0 if not limited), padding
+#   deals:  seed (u32), status (u8), nodes (u32), moves (u16), passes (u8)
+RATING_STRUCT: struct.Struct = struct.Struct('<IBIHB')
+RATINGS_MAGIC: bytes = b'SOLR'
+RATINGS_HEADER_STRUCT: struct.Struct = struct.Struct('<4sBB6x')
+STATUSES: List[str] = [STATUS_SOLVED, STATUS_UNSOLVABLE, STATUS_UNKNOWN]
+
+# Index of the winnable deals of a variant, sorted by difficulty, the easiest first:
+#   header: magic, draw count (u8), max passes (u8, 0 if not limited), number of deals (u32)
+#   deals:  seed (u32), nodes (u32), moves (u16), passes (u8), padding
+INDEX_MAGIC: bytes = b'SOLD\x01'
+INDEX_HEADER_STRUCT: struct.Struct = struct.Struct('<5sBBI')
+INDEX_DEAL_STRUCT: struct.Struct = struct.Struct('<IIHBx')
+
+# Difficulty bands, as ranges of the deals of the index sorted by difficulty
+BANDS: Dict[str, Tuple[float, float]] = {'easy': (0.0, 1 / 3), 'medium': (1 / 3, 2 / 3), 'hard': (2 / 3, 1.0)}
+MAX_NODES: int = 100_000
+
+
+class DealRating(NamedTuple):
+    seed: int
+    status: str
+    nodes: int  # nodes expanded by the solver
+    moves: int  # length of the winning line found, 0 if none. Not a minimum: it depends on the move ordering
+    passes: int  # passes through the stock of the winning line, 0 if none
+
+    def get_difficulty(self) -> float:
+        # Heuristic: the search effort, then the passes through the stock. The length of the line found is not used,
+        # a longer line only means the search took another branch first.
+        return math.log2(self.nodes + 1) + 2 * max(self.passes - 1, 0)
+
+
+def rate_deal(seed: int, draw_count: int = Deck.DRAW_COUNT, max_passes: Optional[int] = None,
+              max_nodes: int = MAX_NODES) -> DealRating:
+    # Only a node budget is used, a time budget would make the ratings depend on the machine
+    game: GameSolitaire = GameSolitaire(seed=seed, draw_count=draw_count, max_passes=max_passes)
+    result: SolverResult = Solver(game, max_nodes=max_nodes).solve()
+    if result.status != STATUS_SOLVED:
+        return DealRating(seed, result.status, result.nodes, 0, 0)
+    for move in result.moves:
+        game.apply(move)
+    return DealRating(seed, result.status, result.nodes, len(result.moves), game.deck.nb_recycles + 1)
+
+
+def rate_deals(seeds: List[int], draw_count: int, max_passes: Optional[int], max_nodes: int) -> List[DealRating]:
+    return [rate_deal(seed, draw_count, max_passes, max_nodes) for seed in seeds]
+
+
+def run_rating(seeds: Iterable[int], draw_count: int = Deck.DRAW_COUNT, max_passes: Optional[int] = None,
+               max_nodes: int = MAX_NODES, workers: Optional[int] = None,
+               chunk_size: int = 16) -> Iterator[DealRating]:
+    # Ratings are yielded in the order of the seeds, with a bounded number of chunks in flight (see run_simulation).
+    # Imported here, the game only reads the index.
+    from concurrent.futures import ProcessPoolExecutor, Future
+    from solitaire_game.simulation import chunk_seeds
+    workers = workers or os.cpu_count() or 1
+    chunks: Iterator[List[int]] = chunk_seeds(seeds, chunk_size)
+    if workers == 1:
+        for chunk in chunks:
+            yield from rate_deals(chunk, draw_count, max_passes, max_nodes)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures: deque = deque()
+        for chunk in chunks:
+            futures.append(executor.submit(rate_deals, chunk, draw_count, max_passes, max_nodes))
+            if len(futures) >= workers * 2:
+                future: Future = futures.popleft()
+                yield from future.result()
+        while futures:
+            yield from futures.popleft().result()
+
+
+def pack_rating(rating: DealRating) -> bytes:
+    return RATING_STRUCT.pack(rating.seed, STATUSES.index(rating.status), min(rating.nodes, 0xFFFFFFFF),
+                              rating.moves, rating.passes)
+
+
+def pack_ratings_header(draw_count: int, max_passes: Optional[int]) -> bytes:
+    return RATINGS_HEADER_STRUCT.pack(RATINGS_MAGIC, draw_count, max_passes or 0)
+
+
+def read_ratings(path: str) -> Tuple[Tuple[int, Optional[int]], List[DealRating]]:
+    # Return the variant (draw count, max passes) and the ratings. A truncated record at the end of the file is
+    # ignored.
+    with open(path, 'rb') as f:
+        data: bytes = f.read()
+    if len(data) < RATINGS_HEADER_STRUCT.size or not data.startswith(RATINGS_MAGIC):
+        raise ValueError(f'Error ratings - Invalid file {path}')
+    _, draw_count, max_passes = RATINGS_HEADER_STRUCT.unpack_from(data, 0)
+    end: int = len(data) - len(data) % RATING_STRUCT.size
+    ratings: List[DealRating] = [DealRating(seed, STATUSES[status], nodes, moves, passes)
+                                 for seed, status, nodes, moves, passes
+                                 in RATING_STRUCT.iter_unpack(data[RATINGS_HEADER_STRUCT.size:end])]
+    return (draw_count, max_passes or None), ratings
+
+
+def open_ratings(path: str, draw_count: int, max_passes: Optional[int], resume: bool) -> Tuple[BinaryIO, Set[int]]:
+    """
+    Open the ratings file to append the ratings of a run, return the file and the seeds already rated by a previous
+    run (resume). The truncated record of an interrupted run is removed.
+    """
+    if not resume or not os.path.exists(path):
+        f: BinaryIO = open(path, 'wb')
+        f.write(pack_ratings_header(draw_count, max_passes))
+        return f, set()
+    variant, ratings = read_ratings(path)
+    if variant != (draw_count, max_passes):
+        raise ValueError(f'Error ratings - {path} has the ratings of another variant')
+    f = open(path, 'r+b')
+    f.truncate(RATINGS_HEADER_STRUCT.size + len(ratings) * RATING_STRUCT.size)
+    f.seek(0, os.SEEK_END)
+    return f, {rating.seed for rating in ratings}
+
+
+def build_index(rating_paths: List[str], index_path: Optional[str] = None) -> Tuple[str, int]:
+    """
+    Write the index of the winnable deals of the ratings files, sorted by difficulty. The ratings files must be the
+    ones of the same variant, the index is written to index_path or the index of the variant (get_index_path).
+    Return the path and the number of deals of the index.
+    """
+    ratings: Dict[int, DealRating] = {}
+    variants: Set[Tuple[int, Optional[int]]] = set()
+    for path in rating_paths:
+        variant, file_ratings = read_ratings(path)
+        variants.add(variant)
+        for rating in file_ratings:
+            if rating.status == STATUS_SOLVED:
+                ratings[rating.seed] = rating
+    if len(variants) != 1:
+        raise ValueError('Error ratings - The ratings files are not of the same variant')
+    draw_count, max_passes = variants.pop()
+    index_path = index_path or get_index_path(draw_count, max_passes)
+    deals: List[DealRating] = sorted(ratings.values(), key=lambda rating: (rating.get_difficulty(), rating.seed))
+    os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+    tmp_path: str = index_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(INDEX_HEADER_STRUCT.pack(INDEX_MAGIC, draw_count, max_passes or 0, len(deals)))
+        for rating in deals:
+            f.write(INDEX_DEAL_STRUCT.pack(rating.seed, min(rating.nodes, 0xFFFFFFFF), rating.moves, rating.passes))
+    os.replace(tmp_path, index_path)
+    return index_path, len(deals)
+
+
+class DifficultyIndex:
+    """
+    Index of winnable deals sorted by difficulty, memory-mapped: a deal of a band is picked in O(1), without reading
+    the file.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self.data: mmap.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.data) < INDEX_HEADER_STRUCT.size:
+            raise ValueError(f'Error difficulty index - Invalid file {path}')
+        magic, self.draw_count, max_passes, self.count = INDEX_HEADER_STRUCT.unpack_from(self.data, 0)
+        if magic != INDEX_MAGIC or len(self.data) < INDEX_HEADER_STRUCT.size + self.count * INDEX_DEAL_STRUCT.size:
+            raise ValueError(f'Error difficulty index - Invalid file {path}')
+        self.max_passes: Optional[int] = max_passes or None
+
+    def get_deal(self, i: int) -> DealRating:
+        # i-th deal by difficulty
+        seed, nodes, moves, passes = INDEX_DEAL_STRUCT.unpack_from(
+            self.data, INDEX_HEADER_STRUCT.size + i * INDEX_DEAL_STRUCT.size)
+        return DealRating(seed, STATUS_SOLVED, nodes, moves, passes)
+
+    def get_band_range(self, band: str) -> Tuple[int, int]:
+        start, end = BANDS[band]
+        return int(start * self.count), int(end * self.count)
+
+    def pick_seed(self, band: str, rng: Optional[random.Random] = None) -> int:
+        # Seed of a random deal of the band, raise ValueError if the band is empty
+        i_start, i_end = self.get_band_range(band)
+        if i_start >= i_end:
+            raise ValueError(f'Error difficulty index - No deal in the band {band}')
+        return self.get_deal((rng or random).randrange(i_start, i_end)).seed
+
+    def close(self):
+        self.data.close()
+
+
+def get_index_path(draw_count: int, max_passes: Optional[int]) -> str:
+    # Per user data directory, one index per variant
+    if os.name == 'nt':
+        base: str = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    name: str = f'difficulty-draw{draw_count}' + (f'-passes{max_passes}' if max_passes else '') + '.idx'
+    return os.path.join(base, 'solitaire-game', name)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog='solitaire-rate', description='Rate seeded deals with the solver, and index '
+                                                                        'the winnable ones by difficulty.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    parser_rate = subparsers.add_parser('rate', help='rate deals, the ratings are appended to a file')
+    parser_rate.add_argument('-n', '--count', type=int, default=1000, help='number of deals')
+    parser_rate.add_argument('--start-seed', type=int, default=0, help='seed of the first deal')
+    parser_rate.add_argument('--shard', default='0/1', help='rate only the seeds of the shard K/N (seed %% N == K)')
+    parser_rate.add_argument('-w', '--workers', type=int, default=None,
+                             help='number of processes (default: cpu count)')
+    parser_rate.add_argument('--max-nodes', type=int, default=MAX_NODES, help='node budget of the solver per deal')
+    parser_rate.add_argument('--draw', type=int, choices=[1, 3], default=Deck.DRAW_COUNT,
+                             help='cards drawn from the stock')
+    parser_rate.add_argument('--max-passes', type=int, default=None,
+                             help='max passes through the stock (default: no limit)')
+    parser_rate.add_argument('-o', '--output', required=True, help='ratings file')
+    parser_rate.add_argument('--resume', action='store_true', help='skip the seeds already in the ratings file')
+    parser_index = subparsers.add_parser('index', help='build the difficulty index from ratings files')
+    parser_index.add_argument('ratings', nargs='+', help='ratings files, of the same variant')
+    parser_index.add_argument('-o', '--output', default=None,
+                              help='index file (default: the index of the variant read by solitaire --difficulty)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'index':
+        index_path, count = build_index(args.ratings, args.output)
+        print(f'{count} winnable deals indexed in {index_path}', file=sys.stderr)
+        return
+
+    shard_index, shard_count = (int(value) for value in args.shard.split('/'))
+    f, done_seeds = open_ratings(args.output, args.draw, args.max_passes, args.resume)
+    seeds: Iterator[int] = (seed for seed in range(args.start_seed, args.start_seed + args.count)
+                            if seed % shard_count == shard_index and seed not in done_seeds)
+    try:
+        for rating in run_rating(seeds, args.draw, args.max_passes, args.max_nodes, args.workers):
+            f.write(pack_rating(rating))
+            f.flush()
+    finally:
+        f.close()
+
+
+if __name__ == '__main__':
+    main()
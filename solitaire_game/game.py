@@ -1,23 +1,77 @@
 # Author: 4sushi
 from __future__ import annotations
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple, NamedTuple
 import random
 
+# Area ids, used by the UI to identify the areas of the game
+AREA_DECK: int = 1
+AREA_FINAL_STACKS: List[int] = [2, 3, 4, 5]
+AREA_INITIAL_STACKS: List[int] = [6, 7, 8, 9, 10, 11, 12]
+NB_AREAS: int = 13
+
+# Area kinds
+KIND_DECK: int = 0
+KIND_FINAL_STACKS: int = 1
+KIND_INITIAL_STACKS: int = 2
+
+# Number of cards drawn from the stock by default
+DRAW_COUNT: int = 3
+
+# Move kinds
+MOVE_SWITCH_DECK: int = 0
+MOVE_DECK_TO_FINAL: int = 1
+MOVE_DECK_TO_INITIAL: int = 2
+MOVE_FINAL_TO_INITIAL: int = 3
+MOVE_INITIAL_TO_INITIAL: int = 4
+MOVE_INITIAL_TO_FINAL: int = 5
+
+# Precomputed tables: area id => area kind, area id => stack index, (src kind, dest kind) => move kind
+AREA_NAMES: List[str] = ['deck', 'final_stacks', 'initial_stacks']
+AREA_KINDS: List[Optional[int]] = [None, KIND_DECK] + [KIND_FINAL_STACKS] * 4 + [KIND_INITIAL_STACKS] * 7
+AREA_I_STACKS: List[int] = [0, 0, 0, 1, 2, 3, 0, 1, 2, 3, 4, 5, 6]
+MOVE_KINDS: List[List[Optional[int]]] = [
+    [None, MOVE_DECK_TO_FINAL, MOVE_DECK_TO_INITIAL],
+    [None, None, MOVE_FINAL_TO_INITIAL],
+    [None, MOVE_INITIAL_TO_FINAL, MOVE_INITIAL_TO_INITIAL],
+]
+# Area kind => area ids by stack index, move kind => (src area kind, dest area kind)
+AREA_IDS: List[List[int]] = [[AREA_DECK], AREA_FINAL_STACKS, AREA_INITIAL_STACKS]
+MOVE_AREA_KINDS: List[Tuple[int, int]] = [
+    (KIND_DECK, KIND_DECK),
+    (KIND_DECK, KIND_FINAL_STACKS),
+    (KIND_DECK, KIND_INITIAL_STACKS),
+    (KIND_FINAL_STACKS, KIND_INITIAL_STACKS),
+    (KIND_INITIAL_STACKS, KIND_INITIAL_STACKS),
+    (KIND_INITIAL_STACKS, KIND_FINAL_STACKS),
+]
+
+
+class Move(NamedTuple):
+    kind: int
+    src_i_stack: int
+    dest_i_stack: int
+    quantity: int = 1
+
+
+SWITCH_DECK_MOVE: Move = Move(MOVE_SWITCH_DECK, 0, 0, 0)
+
 
 class Card:
 
-    def __init__(self, value: int, symbol: str, color: str, icon: str):
-        self.value = value
+    __slots__ = ('id', 'value', 'symbol', 'color', 'icon', 'str_value')
+
+    MAPPING_VALUES: Dict[int, str] = {1: 'A', 11: 'J', 12: 'Q', 13: 'K'}
+
+    def __init__(self, value: int, symbol: str, color: str, icon: str, id: int = -1):
+        self.id: int = id  # Integer encoding of the card (0-51), see GameCards.get_card_id
+        self.value: int = value
         self.symbol: str = symbol
         self.color: str = color
         self.icon: str = icon
+        self.str_value: str = self.MAPPING_VALUES.get(value, str(value))
 
     def get_str_value(self) -> str:
-        mapping_values: Dict = {1: 'A', 11: 'J', 12: 'Q', 13: 'K'}
-        if self.value in mapping_values:
-            return mapping_values[self.value]
-        else:
-            return str(self.value)
+        return self.str_value
 
     def __repr__(self) -> str:
         return f'{self.get_str_value()}{self.icon}'
@@ -32,16 +86,29 @@ class GameCards:
         'clubs': {'name': 'clubs', 'color': 'black', 'icon': '♣'},
     }
 
+    NB_VALUES = 13
+
+    # Flyweight cards, indexed by card id. Cards are immutable and shared by all games.
+    CARDS: List[Card] = []
+
     def __init__(self, min_value: int = 1, max_value: int = 13):
         self.cards: List[Card] = []
         for symbol in self.SYMBOLS.values():
             for value in range(min_value, max_value+1):
-                card = Card(value=value, symbol=symbol['name'], color=symbol['color'], icon=symbol['icon'])
-                self.cards.append(card)
+                self.cards.append(self.get_card(self.get_card_id(symbol['name'], value)))
         self.NB_CARDS = len(self.cards)
+        self.rules: MoveRules = MoveRules.get_rules(min_value, max_value)
+
+    @classmethod
+    def get_card_id(cls, symbol: str, value: int) -> int:
+        return list(cls.SYMBOLS).index(symbol) * cls.NB_VALUES + value - 1
 
-    def mix_cards(self):
-        random.shuffle(self.cards)
+    @classmethod
+    def get_card(cls, card_id: int) -> Card:
+        return cls.CARDS[card_id]
+
+    def mix_cards(self, rng: Optional[random.Random] = None):
+        (rng or random).shuffle(self.cards)
 
     def withdraw_cards(self, quantity: int = 1) -> List[Card]:
         if quantity > len(self.cards):
@@ -49,159 +116,663 @@ class GameCards:
         cards: List[Card] = self.cards[0:quantity]
         self.cards = self.cards[quantity:]
         return cards
-    
+
+
+for _symbol in GameCards.SYMBOLS.values():
+    for _value in range(1, GameCards.NB_VALUES+1):
+        GameCards.CARDS.append(Card(value=_value, symbol=_symbol['name'], color=_symbol['color'], icon=_symbol['icon'],
+                                    id=len(GameCards.CARDS)))
+
+
+class MoveRules:
+    """
+    Rules of the initial stacks and final stacks, compiled once per range of card values in lookup tables indexed by
+    card ids: initial[bottom card id][card id] and final[top card id][card id]. The last entry (index -1) is the
+    one of an empty stack.
+    """
+
+    CACHE: Dict[Tuple[int, int], MoveRules] = {}
+
+    def __init__(self, min_value: int = 1, max_value: int = 13):
+        self.min_value: int = min_value
+        self.max_value: int = max_value
+        nb_cards: int = len(GameCards.CARDS)
+        self.initial: List[List[bool]] = [[False] * nb_cards for _ in range(nb_cards + 1)]
+        self.final: List[List[bool]] = [[False] * nb_cards for _ in range(nb_cards + 1)]
+        for symbol in GameCards.SYMBOLS.values():
+            for value in range(min_value, max_value + 1):
+                card_id: int = GameCards.get_card_id(symbol['name'], value)
+                # An empty initial stack only accepts the highest card, an empty final stack the lowest one
+                self.initial[-1][card_id] = value == max_value
+                self.final[-1][card_id] = value == min_value
+                for other_symbol in GameCards.SYMBOLS.values():
+                    if value < max_value and other_symbol['color'] != symbol['color']:
+                        self.initial[GameCards.get_card_id(other_symbol['name'], value + 1)][card_id] = True
+                if value > min_value:
+                    self.final[GameCards.get_card_id(symbol['name'], value - 1)][card_id] = True
+
+    @classmethod
+    def get_rules(cls, min_value: int = 1, max_value: int = 13) -> MoveRules:
+        rules: Optional[MoveRules] = cls.CACHE.get((min_value, max_value))
+        if rules is None:
+            rules = cls.CACHE[(min_value, max_value)] = cls(min_value, max_value)
+        return rules
+
 
 class GameSolitaire:
 
-    def __init__(self):
+    def __init__(self, seed: Optional[int] = None, draw_count: int = DRAW_COUNT, max_passes: Optional[int] = None):
+        # With a seed, the deal only depends on the seed and can be reproduced
         game_cards = GameCards()
-        game_cards.mix_cards()
-        self.NB_CARDS = game_cards.NB_CARDS
-
-        self.deck: Deck = Deck(game_cards)
-
-        self.initial_stacks: InitialStacks = InitialStacks(game_cards)
-
-        self.final_stacks: FinalStacks = FinalStacks()
-
-        self.areas = {  # area id => area params
-            '1': {'name': 'deck'},
-            '2': {'name': 'final_stacks', 'i_stack': 0},
-            '3': {'name': 'final_stacks', 'i_stack': 1},
-            '4': {'name': 'final_stacks', 'i_stack': 2},
-            '5': {'name': 'final_stacks', 'i_stack': 3},
-            '6': {'name': 'initial_stacks', 'i_stack': 0},
-            '7': {'name': 'initial_stacks', 'i_stack': 1},
-            '8': {'name': 'initial_stacks', 'i_stack': 2},
-            '9': {'name': 'initial_stacks', 'i_stack': 3},
-            '10': {'name': 'initial_stacks', 'i_stack': 4},
-            '11': {'name': 'initial_stacks', 'i_stack': 5},
-            '12': {'name': 'initial_stacks', 'i_stack': 6},
+        game_cards.mix_cards(random.Random(seed) if seed is not None else None)
+        self.init_stacks(Deck(game_cards, draw_count, max_passes), InitialStacks(game_cards),
+                         FinalStacks(game_cards.rules), game_cards.NB_CARDS)
+        self.seed: Optional[int] = seed
+
+    @classmethod
+    def from_stacks(cls, deck: Deck, initial_stacks: InitialStacks, final_stacks: FinalStacks,
+                    nb_cards: int) -> GameSolitaire:
+        game: GameSolitaire = cls.__new__(cls)
+        game.init_stacks(deck, initial_stacks, final_stacks, nb_cards)
+        game.seed = None
+        return game
+
+    def redeal(self, seed: Optional[int] = None, draw_count: int = DRAW_COUNT, max_passes: Optional[int] = None):
+        # Deal a new game in place, the same as GameSolitaire(seed, draw_count, max_passes), reusing the stacks
+        cards: List[Card] = list(GameCards.CARDS)
+        (random.Random(seed) if seed is not None else random).shuffle(cards)
+        self.own_deck().init_cards(cards[:Deck.NB_CARDS], [], 0, 0, draw_count, max_passes)
+        self.rules = MoveRules.get_rules()
+        i_card: int = Deck.NB_CARDS
+        for i_stack in range(InitialStacks.NB_STACKS):
+            stack: InitialStack = self.own_initial_stack(i_stack)
+            stack.hidden_cards = cards[i_card:i_card + i_stack]
+            stack.visible_cards = [cards[i_card + i_stack]]
+            stack.rules = self.rules
+            stack.zobrist = stack.compute_zobrist()
+            i_card += i_stack + 1
+        self.initial_stacks.rules = self.rules
+        for i_stack in range(FinalStacks.NB_STACKS):
+            final_stack: FinalStack = self.own_final_stack(i_stack)
+            final_stack.set_cards([])
+            final_stack.rules = self.rules
+        self.NB_CARDS = len(cards)
+        self.journal = []
+        self.redo_journal = []
+        self.seed = seed
+        self.init_hashes()
+
+    def init_stacks(self, deck: Deck, initial_stacks: InitialStacks, final_stacks: FinalStacks, nb_cards: int):
+        self.NB_CARDS = nb_cards
+
+        # The deck and the stacks whose owner is this token are only used by this game, and are changed in place. The
+        # other ones are shared with clones, and copied by the first move changing them (see clone).
+        self.owner: object = object()
+        deck.owner = self.owner
+        for stack in initial_stacks.stacks:
+            stack.owner = self.owner
+        for final_stack in final_stacks.stacks:
+            final_stack.owner = self.owner
+
+        self.deck: Deck = deck
+
+        self.initial_stacks: InitialStacks = initial_stacks
+
+        self.final_stacks: FinalStacks = final_stacks
+
+        self.rules: MoveRules = initial_stacks.rules
+
+        self.areas: Dict[int, Dict] = {  # area id => area params
+            area_id: {'name': AREA_NAMES[AREA_KINDS[area_id]], 'i_stack': AREA_I_STACKS[area_id]}
+            for area_id in range(AREA_DECK, NB_AREAS)
         }
-
-    def action_switch_deck_cards(self):
-        self.deck.switch_cards()
-
-    def handle_action_move_cards(self, src_area_id: str,  dest_area_id: str,  quantity: int = 1):
-        src_params: Dict = self.areas[src_area_id]
-        dest_params: Dict = self.areas[dest_area_id]
-
-        id_deck = [k for k, v in self.areas.items() if v['name'] == 'deck']
-        id_final_stacks = [k for k, v in self.areas.items() if v['name'] == 'final_stacks']
-        id_initial_stacks = [k for k, v in self.areas.items() if v['name'] == 'initial_stacks']
-
-        if src_area_id in id_deck and dest_area_id in id_final_stacks:
-            self.action_deck_to_finalstacks(dest_params['i_stack'])
-        elif src_area_id in id_deck and dest_area_id in id_initial_stacks:
-            self.action_deck_to_initialstacks(dest_params['i_stack'])
-        elif src_area_id in id_final_stacks and dest_area_id in id_initial_stacks:
-            self.action_finalstacks_to_initialstacks(src_params['i_stack'], dest_params['i_stack'])
-        elif src_area_id in id_initial_stacks and dest_area_id in id_initial_stacks:
-            self.action_initialstacks_to_initialstacks(src_params['i_stack'], dest_params['i_stack'], quantity)
-        elif src_area_id in id_initial_stacks and dest_area_id in id_final_stacks:
-            self.action_initialstacks_to_finalstacks(src_params['i_stack'], dest_params['i_stack'], quantity)
+        del self.areas[AREA_DECK]['i_stack']
+
+        # Journal of the moves played (move, undo info), and of the moves undone
+        self.journal: List[Tuple[Move, object]] = []
+        self.redo_journal: List[Move] = []
+
+        # 64 bits Zobrist hashes of the position, updated by each move. The canonical hash ignores the order of the
+        # final stacks, positions only differing by the final stack used for a symbol have the same canonical hash.
+        self.zobrist_hash: int = 0
+        self.canonical_hash: int = 0
+        self.init_hashes()
+
+    def clone(self, with_journal: bool = True) -> GameSolitaire:
+        """
+        Copy of the game, in O(1) without the journal: the deck and the stacks are shared by the two games, and copied
+        by the first move changing them in either game. The cards are never copied.
+        """
+        game: GameSolitaire = self.__class__.__new__(self.__class__)
+        # Neither game owns the stacks anymore
+        self.owner = object()
+        game.owner = object()
+        game.NB_CARDS = self.NB_CARDS
+        game.deck = self.deck
+        game.initial_stacks = self.initial_stacks.clone()
+        game.final_stacks = self.final_stacks.clone()
+        game.rules = self.rules
+        game.areas = self.areas
+        game.journal = list(self.journal) if with_journal else []
+        game.redo_journal = list(self.redo_journal) if with_journal else []
+        game.zobrist_hash = self.zobrist_hash
+        game.canonical_hash = self.canonical_hash
+        game.seed = self.seed
+        return game
+
+    def own_deck(self) -> Deck:
+        # The deck, to be changed in place: copied first if it is shared with a clone
+        deck: Deck = self.deck
+        if deck.owner is not self.owner:
+            deck = self.deck = deck.copy(self.owner)
+        return deck
+
+    def own_initial_stack(self, i_stack: int) -> InitialStack:
+        stack: InitialStack = self.initial_stacks.stacks[i_stack]
+        if stack.owner is not self.owner:
+            stack = self.initial_stacks.stacks[i_stack] = stack.copy(self.owner)
+        return stack
+
+    def own_final_stack(self, i_stack: int) -> FinalStack:
+        final_stack: FinalStack = self.final_stacks.stacks[i_stack]
+        if final_stack.owner is not self.owner:
+            final_stack = self.final_stacks.stacks[i_stack] = final_stack.copy(self.owner, self.final_stacks)
+        return final_stack
+
+    def init_hashes(self):
+        self.zobrist_hash = self.deck.zobrist
+        for stack in self.initial_stacks.stacks:
+            self.zobrist_hash ^= stack.zobrist
+        self.canonical_hash = self.zobrist_hash
+        for i_stack, stack in enumerate(self.final_stacks.stacks):
+            top_card_id: int = stack.cards[-1].id if stack.cards else -1
+            self.zobrist_hash ^= FINAL_STACK_KEYS[i_stack][top_card_id]
+            self.canonical_hash ^= FINAL_CARD_KEYS[top_card_id]
+
+    def get_move_hashes(self, move: Move) -> Tuple[int, int]:
+        # Hashes (zobrist, canonical) of the parts of the game changed by the move
+        kind: int = move.kind
+        if kind == MOVE_SWITCH_DECK:
+            return self.deck.zobrist, self.deck.zobrist
+        zobrist_hash: int = 0
+        canonical_hash: int = 0
+        src_kind, dest_kind = MOVE_AREA_KINDS[kind]
+        for area_kind, i_stack in ((src_kind, move.src_i_stack), (dest_kind, move.dest_i_stack)):
+            if area_kind == KIND_DECK:
+                zobrist_hash ^= self.deck.zobrist
+                canonical_hash ^= self.deck.zobrist
+            elif area_kind == KIND_INITIAL_STACKS:
+                zobrist_hash ^= self.initial_stacks.stacks[i_stack].zobrist
+                canonical_hash ^= self.initial_stacks.stacks[i_stack].zobrist
+            else:
+                # A final stack is a sequence of the same symbol, it is identified by its top card
+                cards: List[Card] = self.final_stacks.stacks[i_stack].cards
+                top_card_id: int = cards[-1].id if cards else -1
+                zobrist_hash ^= FINAL_STACK_KEYS[i_stack][top_card_id]
+                canonical_hash ^= FINAL_CARD_KEYS[top_card_id]
+        return zobrist_hash, canonical_hash
+
+    def can_undo(self) -> bool:
+        return len(self.journal) > 0
+
+    def can_redo(self) -> bool:
+        return len(self.redo_journal) > 0
+
+    def action_switch_deck_cards(self) -> bool:
+        return self.play(SWITCH_DECK_MOVE)
+
+    def get_move(self, src_area_id: int, dest_area_id: int, quantity: int = 1) -> Optional[Move]:
+        kind: Optional[int] = MOVE_KINDS[AREA_KINDS[src_area_id]][AREA_KINDS[dest_area_id]]
+        if kind is None:
+            return None
+        return Move(kind, AREA_I_STACKS[src_area_id], AREA_I_STACKS[dest_area_id], quantity)
+
+    def get_move_areas(self, move: Move) -> Tuple[int, int]:
+        src_kind, dest_kind = MOVE_AREA_KINDS[move.kind]
+        return AREA_IDS[src_kind][move.src_i_stack], AREA_IDS[dest_kind][move.dest_i_stack]
+
+    def handle_action_move_cards(self, src_area_id: int, dest_area_id: int, quantity: int = 1) -> bool:
+        move: Optional[Move] = self.get_move(src_area_id, dest_area_id, quantity)
+        if move is None:
+            return False
+        return self.play(move)
+
+    def action_deck_to_finalstacks(self, dest_i_stack: int) -> bool:
+        return self.play(Move(MOVE_DECK_TO_FINAL, 0, dest_i_stack, 1))
+
+    def action_deck_to_initialstacks(self, dest_i_stack: int) -> bool:
+        return self.play(Move(MOVE_DECK_TO_INITIAL, 0, dest_i_stack, 1))
+
+    def action_finalstacks_to_initialstacks(self, src_i_stack: int, dest_i_stack: int) -> bool:
+        return self.play(Move(MOVE_FINAL_TO_INITIAL, src_i_stack, dest_i_stack, 1))
+
+    def action_initialstacks_to_initialstacks(self, src_i_stack: int, dest_i_stack: int, quantity: int) -> bool:
+        return self.play(Move(MOVE_INITIAL_TO_INITIAL, src_i_stack, dest_i_stack, quantity))
+
+    def action_initialstacks_to_finalstacks(self, src_i_stack: int, dest_i_stack: int, quantity: int) -> bool:
+        return self.play(Move(MOVE_INITIAL_TO_FINAL, src_i_stack, dest_i_stack, quantity))
+
+    def play(self, move: Move) -> bool:
+        if not self.is_legal(move):
+            return False
+        self.apply(move)
+        return True
+
+    def is_legal(self, move: Move) -> bool:
+        kind: int = move.kind
+        if kind == MOVE_SWITCH_DECK:
+            return self.deck.can_switch_cards()
+        if kind == MOVE_DECK_TO_FINAL or kind == MOVE_DECK_TO_INITIAL:
+            if not self.deck.can_pick_card():
+                return False
+            source_card: Card = self.deck.get_pickable_card()
+        elif kind == MOVE_FINAL_TO_INITIAL:
+            final_stack: FinalStack = self.final_stacks.get_stack(move.src_i_stack)
+            if not final_stack.can_pick_card():
+                return False
+            source_card = final_stack.get_pickable_card()
         else:
-            return
-
-    def action_deck_to_finalstacks(self, dest_i_stack: int):
-        if not self.deck.can_pick_card():
-            return
-        source_card: Card = self.deck.get_pickable_card()
-        final_stack: FinalStack = self.final_stacks.get_stack(dest_i_stack)
-        if not final_stack.can_put_card(source_card):
-            return
-        final_stack.put_card(source_card)
-        self.deck.pick_card()
-
-    def action_deck_to_initialstacks(self, dest_i_stack: int):
-        if not self.deck.can_pick_card():
-            return
-        source_card: Card = self.deck.get_pickable_card()
-        initial_stack: InitialStack = self.initial_stacks.get_stack(dest_i_stack)
-        if not initial_stack.can_put_cards([source_card]):
-            return
-        initial_stack.put_cards([source_card])
-        self.deck.pick_card()
-
-    def action_finalstacks_to_initialstacks(self, src_i_stack: int, dest_i_stack: int):
-        final_stack: FinalStack = self.final_stacks.get_stack(src_i_stack)
-        if not final_stack.can_pick_card():
-            return
-        source_card: Card = final_stack.get_pickable_card()
-        initial_stack: InitialStack = self.initial_stacks.get_stack(dest_i_stack)
-        if not initial_stack.can_put_cards([source_card]):
-            return
-        initial_stack.put_cards([source_card])
-        final_stack.pick_card()
-
-    def action_initialstacks_to_initialstacks(self, src_i_stack: int, dest_i_stack: int, quantity: int):
-        initial_stack_src: InitialStack = self.initial_stacks.get_stack(src_i_stack)
-        if not initial_stack_src.can_pick_cards(quantity):
-            return
-        source_cards: List[Card] = initial_stack_src.get_pickable_cards(quantity)
-        initial_stack_dest: InitialStack = self.initial_stacks.get_stack(dest_i_stack)
-        if not initial_stack_dest.can_put_cards(source_cards):
-            return
-        initial_stack_dest.put_cards(source_cards)
-        initial_stack_src.pick_cards(quantity)
-
-    def action_initialstacks_to_finalstacks(self, src_i_stack: int, dest_i_stack: int, quantity: int):
-        initial_stack: InitialStack = self.initial_stacks.get_stack(src_i_stack)
-        if not initial_stack.can_pick_cards(quantity):
-            return
-        source_cards: List[Card] = initial_stack.get_pickable_cards(quantity)
-        if len(source_cards) != 1:
-            return
-        final_stack: FinalStack = self.final_stacks.get_stack(dest_i_stack)
-        if not final_stack.can_put_card(source_cards[0]):
-            return
-        final_stack.put_card(source_cards[0])
-        initial_stack.pick_cards(quantity)
-    
+            initial_stack: InitialStack = self.initial_stacks.get_stack(move.src_i_stack)
+            if move.quantity < 1 or not initial_stack.can_pick_cards(move.quantity):
+                return False
+            if kind == MOVE_INITIAL_TO_INITIAL:
+                return self.initial_stacks.get_stack(move.dest_i_stack).can_put_cards(
+                    initial_stack.get_pickable_cards(move.quantity))
+            if move.quantity != 1:
+                return False
+            source_card = initial_stack.get_pickable_cards(1)[0]
+        if kind == MOVE_DECK_TO_FINAL or kind == MOVE_INITIAL_TO_FINAL:
+            return self.final_stacks.get_stack(move.dest_i_stack).can_put_card(source_card)
+        return self.initial_stacks.get_stack(move.dest_i_stack).can_put_cards([source_card])
+
+    def apply(self, move: Move):
+        # The move is not validated, see is_legal
+        self.journal.append((move, self.do_move(move)))
+        if self.redo_journal:
+            self.redo_journal.clear()
+
+    def undo(self) -> Optional[Move]:
+        if not self.journal:
+            return None
+        move, undo_info = self.journal.pop()
+        self.undo_move(move, undo_info)
+        self.redo_journal.append(move)
+        return move
+
+    def redo(self) -> Optional[Move]:
+        if not self.redo_journal:
+            return None
+        move: Move = self.redo_journal.pop()
+        self.journal.append((move, self.do_move(move)))
+        return move
+
+    def do_move(self, move: Move):
+        zobrist_hash, canonical_hash = self.get_move_hashes(move)
+        undo_info = self.do_move_cards(move)
+        new_zobrist_hash, new_canonical_hash = self.get_move_hashes(move)
+        self.zobrist_hash ^= zobrist_hash ^ new_zobrist_hash
+        self.canonical_hash ^= canonical_hash ^ new_canonical_hash
+        return undo_info
+
+    def undo_move(self, move: Move, undo_info):
+        zobrist_hash, canonical_hash = self.get_move_hashes(move)
+        self.undo_move_cards(move, undo_info)
+        new_zobrist_hash, new_canonical_hash = self.get_move_hashes(move)
+        self.zobrist_hash ^= zobrist_hash ^ new_zobrist_hash
+        self.canonical_hash ^= canonical_hash ^ new_canonical_hash
+
+    def do_move_cards(self, move: Move):
+        # Return the information needed to undo the move: the previous deck state for a deck switch, the previous number
+        # of visible deck cards for a move from the deck, if a hidden card has been turned face up for a move from an
+        # initial stack
+        kind: int = move.kind
+        if kind == MOVE_SWITCH_DECK:
+            return self.own_deck().switch_cards()
+        elif kind == MOVE_DECK_TO_FINAL:
+            deck: Deck = self.own_deck()
+            self.own_final_stack(move.dest_i_stack).put_card(deck.get_pickable_card())
+            return deck.pick_card()
+        elif kind == MOVE_DECK_TO_INITIAL:
+            deck = self.own_deck()
+            self.own_initial_stack(move.dest_i_stack).put_cards([deck.get_pickable_card()])
+            return deck.pick_card()
+        elif kind == MOVE_FINAL_TO_INITIAL:
+            final_stack: FinalStack = self.own_final_stack(move.src_i_stack)
+            self.own_initial_stack(move.dest_i_stack).put_cards([final_stack.get_pickable_card()])
+            final_stack.pick_card()
+        elif kind == MOVE_INITIAL_TO_INITIAL:
+            initial_stack: InitialStack = self.own_initial_stack(move.src_i_stack)
+            self.own_initial_stack(move.dest_i_stack).put_cards(initial_stack.get_pickable_cards(move.quantity))
+            return initial_stack.pick_cards(move.quantity)
+        elif kind == MOVE_INITIAL_TO_FINAL:
+            initial_stack = self.own_initial_stack(move.src_i_stack)
+            self.own_final_stack(move.dest_i_stack).put_card(initial_stack.get_pickable_cards(1)[0])
+            return initial_stack.pick_cards(1)
+        return None
+
+    def undo_move_cards(self, move: Move, undo_info):
+        kind: int = move.kind
+        if kind == MOVE_SWITCH_DECK:
+            self.own_deck().unswitch_cards(undo_info)
+        elif kind == MOVE_DECK_TO_FINAL:
+            final_stack: FinalStack = self.own_final_stack(move.dest_i_stack)
+            self.own_deck().unpick_card(final_stack.get_pickable_card(), undo_info)
+            final_stack.pick_card()
+        elif kind == MOVE_DECK_TO_INITIAL:
+            initial_stack: InitialStack = self.own_initial_stack(move.dest_i_stack)
+            self.own_deck().unpick_card(initial_stack.get_pickable_cards(1)[0], undo_info)
+            initial_stack.pick_cards(1, can_turn_hidden_card=False)
+        elif kind == MOVE_FINAL_TO_INITIAL:
+            initial_stack = self.own_initial_stack(move.dest_i_stack)
+            self.own_final_stack(move.src_i_stack).put_card(initial_stack.get_pickable_cards(1)[0])
+            initial_stack.pick_cards(1, can_turn_hidden_card=False)
+        elif kind == MOVE_INITIAL_TO_INITIAL:
+            initial_stack = self.own_initial_stack(move.src_i_stack)
+            if undo_info:
+                initial_stack.turn_visible_card_face_down()
+            dest_stack: InitialStack = self.own_initial_stack(move.dest_i_stack)
+            initial_stack.put_cards(dest_stack.get_pickable_cards(move.quantity))
+            dest_stack.pick_cards(move.quantity, can_turn_hidden_card=False)
+        elif kind == MOVE_INITIAL_TO_FINAL:
+            initial_stack = self.own_initial_stack(move.src_i_stack)
+            if undo_info:
+                initial_stack.turn_visible_card_face_down()
+            final_stack = self.own_final_stack(move.dest_i_stack)
+            initial_stack.put_cards([final_stack.get_pickable_card()])
+            final_stack.pick_card()
+
+    def legal_moves(self) -> List[Move]:
+        moves: List[Move] = []
+        initial_stacks: List[InitialStack] = self.initial_stacks.stacks
+        final_stacks: List[FinalStack] = self.final_stacks.stacks
+        initial_rules: List[List[bool]] = self.rules.initial
+        final_rules: List[List[bool]] = self.rules.final
+        # Rules of the last card of each stack (-1 for an empty stack), indexed by the card put on it
+        bottom_rules: List[List[bool]] = [initial_rules[stack.visible_cards[-1].id if stack.visible_cards else -1]
+                                          for stack in initial_stacks]
+        top_rules: List[List[bool]] = [final_rules[stack.cards[-1].id if stack.cards else -1] for stack in final_stacks]
+
+        if self.deck.can_pick_card():
+            card_id: int = self.deck.get_pickable_card().id
+            for i_dest, rules in enumerate(top_rules):
+                if rules[card_id]:
+                    moves.append(Move(MOVE_DECK_TO_FINAL, 0, i_dest, 1))
+            for i_dest, rules in enumerate(bottom_rules):
+                if rules[card_id]:
+                    moves.append(Move(MOVE_DECK_TO_INITIAL, 0, i_dest, 1))
+
+        for i_src, src_stack in enumerate(initial_stacks):
+            visible_cards: List[Card] = src_stack.visible_cards
+            if not visible_cards:
+                continue
+            card: Card = visible_cards[-1]
+            for i_dest, rules in enumerate(top_rules):
+                if rules[card.id]:
+                    moves.append(Move(MOVE_INITIAL_TO_FINAL, i_src, i_dest, 1))
+            for i_dest, dest_stack in enumerate(initial_stacks):
+                if i_dest == i_src:
+                    continue
+                # Visible cards are a descending sequence, so only one quantity can fit on the destination stack
+                if dest_stack.visible_cards:
+                    quantity: int = dest_stack.visible_cards[-1].value - card.value
+                else:
+                    quantity = len(visible_cards)
+                if 0 < quantity <= len(visible_cards) and bottom_rules[i_dest][visible_cards[-quantity].id]:
+                    moves.append(Move(MOVE_INITIAL_TO_INITIAL, i_src, i_dest, quantity))
+
+        for i_src, final_stack in enumerate(final_stacks):
+            if not final_stack.cards:
+                continue
+            card_id = final_stack.cards[-1].id
+            for i_dest, rules in enumerate(bottom_rules):
+                if rules[card_id]:
+                    moves.append(Move(MOVE_FINAL_TO_INITIAL, i_src, i_dest, 1))
+
+        if self.deck.can_switch_cards():
+            moves.append(SWITCH_DECK_MOVE)
+        return moves
+
     def is_game_won(self) -> bool:
-        return sum([len(stack.cards) for stack in self.final_stacks.stacks]) == self.NB_CARDS
+        return self.final_stacks.nb_cards == self.NB_CARDS
+
+    def get_auto_complete_moves(self) -> Optional[List[Move]]:
+        """
+        Once the stock is empty and all the cards of the initial stacks are face up, the game is decided: return the
+        moves putting all the cards on the final stacks, or None if the game can not be completed this way.
+        """
+        if self.deck.count_stock_cards() > 0:
+            return None
+        stacks: List[InitialStack] = self.initial_stacks.stacks
+        for stack in stacks:
+            if stack.hidden_cards:
+                return None
+        final_rules: List[List[bool]] = self.rules.final
+        final_tops: List[int] = [stack.cards[-1].id if stack.cards else -1 for stack in self.final_stacks.stacks]
+        # Cards are only moved to the final stacks, from the sources: the waste, then the initial stacks
+        sources: List[List[Card]] = [self.deck.waste] + [stack.visible_cards for stack in stacks]
+        heights: List[int] = [len(cards) for cards in sources]
+        nb_cards: int = sum(heights)
+        moves: List[Move] = []
+        while len(moves) < nb_cards:
+            for i_source, cards in enumerate(sources):
+                if heights[i_source] == 0:
+                    continue
+                card_id: int = cards[heights[i_source] - 1].id
+                i_final: int = next((i_final for i_final, top_id in enumerate(final_tops)
+                                     if final_rules[top_id][card_id]), -1)
+                if i_final >= 0:
+                    break
+            else:
+                return None
+            heights[i_source] -= 1
+            final_tops[i_final] = card_id
+            moves.append(Move(MOVE_DECK_TO_FINAL, 0, i_final, 1) if i_source == 0
+                         else Move(MOVE_INITIAL_TO_FINAL, i_source - 1, i_final, 1))
+        return moves
     
 
 class Deck:
+    """
+    Stock and waste of the game. The stock is a list read from the index i_stock (its next card), the waste a stack
+    whose last card is the pickable one. Drawing, picking a card and turning the waste over as the new stock are O(1).
+    Cards are drawn by 1 or by 3 (draw_count), the number of passes through the stock can be limited (max_passes).
+    """
+
+    DRAW_COUNT: int = DRAW_COUNT
+    NB_CARDS: int = 24
+
+    def __init__(self, game_cards: GameCards, draw_count: int = DRAW_COUNT, max_passes: Optional[int] = None):
+        self.init_cards(game_cards.withdraw_cards(quantity=self.NB_CARDS), [], 0, 0, draw_count, max_passes)
+
+    @classmethod
+    def from_cards(cls, stock_cards: List[Card], waste_cards: List[Card], nb_visible: int = 0, nb_passes: int = 1,
+                   draw_count: int = DRAW_COUNT, max_passes: Optional[int] = None) -> Deck:
+        deck: Deck = cls.__new__(cls)
+        deck.init_cards(stock_cards, waste_cards, nb_visible, nb_passes - 1, draw_count, max_passes)
+        return deck
+
+    def init_cards(self, stock_cards: List[Card], waste_cards: List[Card], nb_visible: int, nb_recycles: int,
+                   draw_count: int, max_passes: Optional[int]):
+        if not 1 <= draw_count <= self.NB_CARDS or (max_passes is not None and not 1 <= max_passes <= 255):
+            raise ValueError('Error deck - Invalid draw count or max passes')
+        self.waste: List[Card] = []
+        self.nb_visible: int = nb_visible  # Waste cards shown, the ones of the last draw still on the waste
+        self.nb_recycles: int = nb_recycles  # Number of times the waste has been turned over
+        self.draw_count: int = draw_count
+        self.max_passes: Optional[int] = max_passes
+        self.owner: object = None  # see GameSolitaire.clone
+        # The stock and the waste are hashed by pairs of consecutive cards, so the hash does not depend on the
+        # indexes of the cards in the lists. recycled_zobrist is the hash of the stock once the waste is turned over.
+        self.set_stock_cards(stock_cards)
+        self.waste_zobrist: int = 0
+        self.recycled_zobrist: int = 0
+        for card in waste_cards:
+            self.push_waste(card)
+
+    def set_stock_cards(self, stock_cards: List[Card]):
+        # Replace the cards left in the stock, e.g. by a sample of the cards not seen yet
+        self.stock: List[Card] = stock_cards
+        self.i_stock: int = 0
+        self.stock_zobrist: int = 0
+        previous_card_id: int = -1
+        for card in reversed(stock_cards):
+            self.stock_zobrist ^= STOCK_PAIR_KEYS[card.id][previous_card_id]
+            previous_card_id = card.id
+
+    def copy(self, owner: object) -> Deck:
+        # The stock list is never changed in place and stays shared, the waste is copied
+        deck: Deck = Deck.__new__(Deck)
+        deck.__dict__.update(self.__dict__)
+        deck.waste = list(self.waste)
+        deck.owner = owner
+        return deck
+
+    @property
+    def zobrist(self) -> int:
+        zobrist: int = self.stock_zobrist ^ self.waste_zobrist ^ DECK_DRAW_KEYS[self.draw_count]
+        if self.max_passes is not None:
+            zobrist ^= DECK_RECYCLE_KEYS[self.nb_recycles]
+        return zobrist
 
-    NB_VISIBLE_CARDS: int = 3
+    def count_cards(self) -> int:
+        return self.count_stock_cards() + len(self.waste)
 
-    def __init__(self, game_cards: GameCards):
-        self.cards: List[Card] = game_cards.withdraw_cards(quantity=24)
-        self.i_deck_min: int = 0
-        self.i_deck_max: int = 0
+    def count_stock_cards(self) -> int:
+        return len(self.stock) - self.i_stock
+
+    def get_stock_cards(self) -> List[Card]:
+        return self.stock[self.i_stock:]
 
     def get_visible_cards(self) -> List[Card]:
-        return self.cards[self.i_deck_min:self.i_deck_max]
-    
+        return self.waste[len(self.waste)-self.nb_visible:]
+
     def can_pick_card(self) -> bool:
-        return len(self.get_visible_cards()) > 0
-    
-    def get_pickable_card(self) -> Card:
-        cards: List[Card] = self.get_visible_cards()
-        return cards[-1]
-        
-    def pick_card(self):
-        self.cards.pop(self.i_deck_max-1)
-        self.i_deck_max -= 1
+        return len(self.waste) > 0
 
-    def switch_cards(self):
-        if self.i_deck_max == 0:
-            self.i_deck_max = min(self.NB_VISIBLE_CARDS, len(self.cards))
+    def get_pickable_card(self) -> Card:
+        return self.waste[-1]
+
+    def push_waste(self, card: Card):
+        card_id: int = card.id
+        if self.waste:
+            top_card_id: int = self.waste[-1].id
+            self.waste_zobrist ^= WASTE_PAIR_KEYS[top_card_id][card_id]
+            self.recycled_zobrist ^= STOCK_PAIR_KEYS[top_card_id][-1] ^ STOCK_PAIR_KEYS[top_card_id][card_id]
         else:
-            if self.i_deck_max == len(self.cards):
-                self.i_deck_min = 0
-                self.i_deck_max = 0
-            else:
-                self.i_deck_min = self.i_deck_max
-                self.i_deck_max = min(len(self.cards), self.i_deck_max+self.NB_VISIBLE_CARDS)
+            self.waste_zobrist ^= WASTE_PAIR_KEYS[-1][card_id]
+        self.recycled_zobrist ^= STOCK_PAIR_KEYS[card_id][-1]
+        self.waste.append(card)
+
+    def pop_waste(self) -> Card:
+        card: Card = self.waste.pop()
+        card_id: int = card.id
+        if self.waste:
+            top_card_id: int = self.waste[-1].id
+            self.waste_zobrist ^= WASTE_PAIR_KEYS[top_card_id][card_id]
+            self.recycled_zobrist ^= STOCK_PAIR_KEYS[top_card_id][-1] ^ STOCK_PAIR_KEYS[top_card_id][card_id]
+        else:
+            self.waste_zobrist ^= WASTE_PAIR_KEYS[-1][card_id]
+        self.recycled_zobrist ^= STOCK_PAIR_KEYS[card_id][-1]
+        return card
+
+    def pick_card(self) -> int:
+        # Return the previous number of visible cards, to unpick the card
+        nb_visible: int = self.nb_visible
+        self.pop_waste()
+        # Once the cards of the last draw are picked, the top card of the waste is shown
+        self.nb_visible = min(max(nb_visible - 1, 1), len(self.waste))
+        return nb_visible
+
+    def unpick_card(self, card: Card, nb_visible: int):
+        self.push_waste(card)
+        self.nb_visible = nb_visible
+
+    def can_switch_cards(self) -> bool:
+        if self.i_stock < len(self.stock):
+            return True
+        return len(self.waste) > 0 and (self.max_passes is None or self.nb_recycles < self.max_passes - 1)
+
+    def switch_cards(self) -> Tuple:
+        # Draw cards from the stock, or turn the waste over as the new stock when the stock is empty.
+        # Return the information needed to undo it, see unswitch_cards.
+        undo_info: Tuple = (self.stock, self.i_stock, self.nb_visible, self.stock_zobrist, self.waste_zobrist,
+                            self.recycled_zobrist)
+        if self.i_stock == len(self.stock):
+            self.stock = self.waste
+            self.i_stock = 0
+            self.waste = []
+            self.stock_zobrist = self.recycled_zobrist
+            self.waste_zobrist = 0
+            self.recycled_zobrist = 0
+            self.nb_visible = 0
+            self.nb_recycles += 1
+            return undo_info
+        stock: List[Card] = self.stock
+        nb_cards: int = min(self.draw_count, len(stock) - self.i_stock)
+        for i_card in range(self.i_stock, self.i_stock + nb_cards):
+            card: Card = stock[i_card]
+            next_card_id: int = stock[i_card+1].id if i_card + 1 < len(stock) else -1
+            self.stock_zobrist ^= STOCK_PAIR_KEYS[card.id][next_card_id]
+            self.push_waste(card)
+        self.i_stock += nb_cards
+        self.nb_visible = nb_cards
+        return undo_info
+
+    def unswitch_cards(self, undo_info: Tuple):
+        stock, i_stock, self.nb_visible, self.stock_zobrist, self.waste_zobrist, self.recycled_zobrist = undo_info
+        if stock is self.stock:
+            del self.waste[len(self.waste)-(self.i_stock-i_stock):]
+        else:
+            # Nothing has been drawn from the turned over waste, see GameSolitaire.undo. The stock can be shared with a
+            # clone, the waste is changed in place.
+            self.waste = list(self.stock)
+            self.stock = stock
+            self.nb_recycles -= 1
+        self.i_stock = i_stock
 
     
 class InitialStack:
 
-    def __init__(self, hidden_cards: List[Card], visible_cards: List[Card]):
+    def __init__(self, hidden_cards: List[Card], visible_cards: List[Card], i_stack: int = 0,
+                 rules: Optional[MoveRules] = None):
         self.hidden_cards: List[Card] = hidden_cards
         self.visible_cards: List[Card] = visible_cards
+        self.i_stack: int = i_stack
+        self.rules: MoveRules = rules or MoveRules.get_rules()
+        self.zobrist: int = self.compute_zobrist()
+        self.owner: object = None  # see GameSolitaire.clone
+
+    def copy(self, owner: object) -> InitialStack:
+        stack: InitialStack = InitialStack.__new__(InitialStack)
+        stack.hidden_cards = list(self.hidden_cards)
+        stack.visible_cards = list(self.visible_cards)
+        stack.i_stack = self.i_stack
+        stack.rules = self.rules
+        stack.zobrist = self.zobrist
+        stack.owner = owner
+        return stack
+
+    def set_i_stack(self, i_stack: int):
+        # The hash keys depend on the position of the stack in the game
+        self.i_stack = i_stack
+        self.zobrist = self.compute_zobrist()
+
+    def compute_zobrist(self) -> int:
+        keys: List[List[int]] = STACK_HIDDEN_KEYS[self.i_stack]
+        zobrist: int = 0
+        for i_card, card in enumerate(self.hidden_cards):
+            zobrist ^= keys[i_card][card.id]
+        keys = STACK_VISIBLE_KEYS[self.i_stack]
+        for i_card, card in enumerate(self.visible_cards, len(self.hidden_cards)):
+            zobrist ^= keys[i_card][card.id]
+        return zobrist
+
+    def hash_visible_cards(self, cards: List[Card], i_start: int) -> int:
+        keys: List[List[int]] = STACK_VISIBLE_KEYS[self.i_stack]
+        zobrist: int = 0
+        for i_card, card in enumerate(cards, i_start):
+            zobrist ^= keys[i_card][card.id]
+        return zobrist
 
     def can_pick_cards(self, quantity) -> bool:
         return len(self.visible_cards) >= quantity
@@ -219,24 +790,35 @@ class InitialStack:
         return self.count_visible_cards() + self.count_hidden_cards()
 
     def can_put_cards(self, cards: List[Card]) -> bool:
-        top_card: Card = cards[0]
-        if self.count_visible_cards() == 0:
-            return top_card.get_str_value() == 'K'
-        else:
-            bottom_card: Card = self.get_pickable_cards(quantity=1)[0]
-            return bottom_card.color != top_card.color and bottom_card.value == (top_card.value+1)
+        bottom_card_id: int = self.visible_cards[-1].id if self.visible_cards else -1
+        return self.rules.initial[bottom_card_id][cards[0].id]
 
     def put_cards(self, cards: List[Card]):
-        self.visible_cards += cards
-
-    def pick_cards(self, quantity: int):
-        self.visible_cards = self.visible_cards[:-quantity]
-        if self.count_visible_cards() == 0 and self.count_hidden_cards() > 0:
+        self.zobrist ^= self.hash_visible_cards(cards, self.count_cards())
+        self.visible_cards.extend(cards)
+
+    def pick_cards(self, quantity: int, can_turn_hidden_card: bool = True) -> bool:
+        # Return True if a hidden card has been turned face up
+        self.zobrist ^= self.hash_visible_cards(self.visible_cards[-quantity:], self.count_cards() - quantity)
+        del self.visible_cards[-quantity:]
+        if can_turn_hidden_card and self.count_visible_cards() == 0 and self.count_hidden_cards() > 0:
             self.turn_hidden_card_face_up()
+            return True
+        return False
 
     def turn_hidden_card_face_up(self):
         card: Card = self.hidden_cards.pop()
-        self.visible_cards = [card]
+        i_card: int = len(self.hidden_cards)
+        self.zobrist ^= STACK_HIDDEN_KEYS[self.i_stack][i_card][card.id] ^ \
+            STACK_VISIBLE_KEYS[self.i_stack][i_card][card.id]
+        self.visible_cards.append(card)
+
+    def turn_visible_card_face_down(self):
+        card: Card = self.visible_cards.pop()
+        i_card: int = len(self.hidden_cards)
+        self.zobrist ^= STACK_HIDDEN_KEYS[self.i_stack][i_card][card.id] ^ \
+            STACK_VISIBLE_KEYS[self.i_stack][i_card][card.id]
+        self.hidden_cards.append(card)
 
 
 class InitialStacks:
@@ -248,9 +830,29 @@ class InitialStacks:
         for i in range(0, self.NB_STACKS):
             stack: InitialStack = InitialStack(
                 hidden_cards=game_cards.withdraw_cards(quantity=i), 
-                visible_cards=game_cards.withdraw_cards(quantity=1)
+                visible_cards=game_cards.withdraw_cards(quantity=1),
+                i_stack=i,
+                rules=game_cards.rules
             )
             self.stacks.append(stack)
+        self.rules: MoveRules = game_cards.rules
+
+    @classmethod
+    def from_stacks(cls, stacks: List[InitialStack]) -> InitialStacks:
+        initial_stacks: InitialStacks = cls.__new__(cls)
+        initial_stacks.stacks = stacks
+        initial_stacks.rules = stacks[0].rules
+        for i_stack, stack in enumerate(stacks):
+            if stack.i_stack != i_stack:
+                stack.set_i_stack(i_stack)
+        return initial_stacks
+
+    def clone(self) -> InitialStacks:
+        # The stacks are shared, see GameSolitaire.clone
+        initial_stacks: InitialStacks = InitialStacks.__new__(InitialStacks)
+        initial_stacks.stacks = list(self.stacks)
+        initial_stacks.rules = self.rules
+        return initial_stacks
 
     def get_stack(self, i_stack: int) -> InitialStack:
         return self.stacks[i_stack]
@@ -258,8 +860,19 @@ class InitialStacks:
 
 class FinalStack:
 
-    def __init__(self):
+    def __init__(self, rules: Optional[MoveRules] = None, final_stacks: Optional[FinalStacks] = None):
         self.cards: List[Card] = []
+        self.rules: MoveRules = rules or MoveRules.get_rules()
+        self.final_stacks: Optional[FinalStacks] = final_stacks  # counts the cards of all the final stacks
+        self.owner: object = None  # see GameSolitaire.clone
+
+    def copy(self, owner: object, final_stacks: Optional[FinalStacks]) -> FinalStack:
+        final_stack: FinalStack = FinalStack.__new__(FinalStack)
+        final_stack.cards = list(self.cards)
+        final_stack.rules = self.rules
+        final_stack.final_stacks = final_stacks
+        final_stack.owner = owner
+        return final_stack
 
     def count_cards(self) -> int:
         return len(self.cards)
@@ -271,28 +884,69 @@ class FinalStack:
         return self.cards[-1]
 
     def can_put_card(self, card: Card) -> bool:
-        if self.count_cards() == 0:
-            return card.get_str_value() == 'A'
-        else:
-            top_card: Optional[Card] = self.get_pickable_card()
-            return top_card.value == (card.value-1) and top_card.symbol == card.symbol
+        top_card_id: int = self.cards[-1].id if self.cards else -1
+        return self.rules.final[top_card_id][card.id]
 
     def put_card(self, card: Card):
         self.cards.append(card)
+        if self.final_stacks:
+            self.final_stacks.nb_cards += 1
 
     def pick_card(self):
         self.cards.pop()
+        if self.final_stacks:
+            self.final_stacks.nb_cards -= 1
+
+    def set_cards(self, cards: List[Card]):
+        if self.final_stacks:
+            self.final_stacks.nb_cards += len(cards) - len(self.cards)
+        self.cards = cards
 
 
 class FinalStacks:
 
     NB_STACKS = 4
 
-    def __init__(self):
+    def __init__(self, rules: Optional[MoveRules] = None):
+        self.nb_cards: int = 0  # cards of all the stacks, updated by the stacks
         self.stacks: List[FinalStack] = []
         for _ in range(self.NB_STACKS):
-            final_stack: FinalStack = FinalStack()
+            final_stack: FinalStack = FinalStack(rules, self)
             self.stacks.append(final_stack)
 
+    def clone(self) -> FinalStacks:
+        # The stacks are shared, see GameSolitaire.clone
+        final_stacks: FinalStacks = FinalStacks.__new__(FinalStacks)
+        final_stacks.nb_cards = self.nb_cards
+        final_stacks.stacks = list(self.stacks)
+        return final_stacks
+
     def get_stack(self, i_stack: int) -> FinalStack:
         return self.stacks[i_stack]
+
+    def count_cards(self) -> int:
+        return self.nb_cards
+
+
+# Zobrist keys, random 64 bits keys generated with a fixed seed, so hashes are the same in every process and run.
+# The hash of a position is the xor of the keys of its parts: pairs of consecutive cards of the stock (card, next card
+# or -1 for the last one) and of the waste (previous card or -1 for the first one, card), draw count and passes of the
+# deck, initial stack card at an index (hidden or visible), top card of a final stack (the key of no card, -1, is 0).
+MAX_STACK_CARDS: int = InitialStacks.NB_STACKS - 1 + GameCards.NB_VALUES  # hidden cards + a full sequence
+_zobrist_rng: random.Random = random.Random(0x50717A1E)
+
+
+def _generate_keys(nb_keys: int) -> List[int]:
+    return [_zobrist_rng.getrandbits(64) for _ in range(nb_keys)]
+
+
+STOCK_PAIR_KEYS: List[List[int]] = [_generate_keys(len(GameCards.CARDS) + 1) for _ in range(len(GameCards.CARDS))]
+WASTE_PAIR_KEYS: List[List[int]] = [_generate_keys(len(GameCards.CARDS)) for _ in range(len(GameCards.CARDS) + 1)]
+DECK_DRAW_KEYS: List[int] = _generate_keys(Deck.NB_CARDS + 1)
+DECK_RECYCLE_KEYS: List[int] = _generate_keys(256)
+STACK_HIDDEN_KEYS: List[List[List[int]]] = [[_generate_keys(len(GameCards.CARDS)) for _ in range(MAX_STACK_CARDS)]
+                                            for _ in range(InitialStacks.NB_STACKS)]
+STACK_VISIBLE_KEYS: List[List[List[int]]] = [[_generate_keys(len(GameCards.CARDS)) for _ in range(MAX_STACK_CARDS)]
+                                             for _ in range(InitialStacks.NB_STACKS)]
+FINAL_STACK_KEYS: List[List[int]] = [_generate_keys(len(GameCards.CARDS)) + [0] for _ in range(FinalStacks.NB_STACKS)]
+FINAL_CARD_KEYS: List[int] = _generate_keys(len(GameCards.CARDS)) + [0]
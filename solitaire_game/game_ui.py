@@ -1,26 +1,77 @@
 # Author: 4sushi
 from __future__ import annotations
 import curses
+import random
 import re
-from solitaire_game.game import GameSolitaire, Card
-from typing import List, Optional, Dict, Tuple
+import sqlite3
+from collections import deque
+from solitaire_game.game import GameSolitaire, GameCards, Card, Move, Deck, InitialStack, FinalStack, AREA_DECK, \
+    AREA_FINAL_STACKS, AREA_INITIAL_STACKS, MOVE_SWITCH_DECK, SWITCH_DECK_MOVE
+from typing import List, Optional, Dict, Tuple, Set, TYPE_CHECKING
 import sys
+import time
 from datetime import datetime, timedelta
-from solitaire_game import BACK_CARD, TOP_PART_CARD, CARD_TEMPLATE, PART_CARD_TEMPLATE, TOP_PART_CARD_TEMPLATE
+from solitaire_game.templates import BACK_CARD, TOP_PART_CARD, CARD_TEMPLATE, PART_CARD_TEMPLATE, \
+    TOP_PART_CARD_TEMPLATE
+from solitaire_game.layout import Layout, CardRect
+from solitaire_game.solver import STATUS_UNSOLVABLE
+from solitaire_game.savefile import AutosaveJournal
+from solitaire_game.stats import StatsStore, StatsSummary, StatsWriter, GameStat, PLAYER_HUMAN, format_summary
+
+if TYPE_CHECKING:
+    # Only used by the annotations: the hints (multiprocessing) are imported by the first hint
+    from solitaire_game.hints import HintEngine, HintResult
+    from solitaire_game.autoplay import RolloutPlayer, RolloutSearch
+    from solitaire_game.difficulty import DifficultyIndex
+
+RED_CARD_PATTERN = re.compile(r'[0-9AJQK]+[♥♦]+|[♥♦]+\s?[0-9AJQK]+')
+BLACK_CARD_PATTERN = re.compile(r'[0-9AJQK]+[♠♣]+|[♠♣]+\s?[0-9AJQK]+')
+
+# Sprite states
+SPRITE_DEFAULT: int = 0
+SPRITE_CURSOR: int = 1
+SPRITE_SELECTED: int = 2
+
+
+class CardSprite:
+
+    def __init__(self, lines: List[List[Tuple[int, str, int]]], nb_lines: int, nb_cols: int):
+        self.lines: List[List[Tuple[int, str, int]]] = lines  # for each line, segments (x offset, text, attr)
+        self.nb_lines: int = nb_lines
+        self.nb_cols: int = nb_cols
 
 
 class GameUI:
 
-    def __init__(self):
+    def __init__(self, draw_count: int = Deck.DRAW_COUNT, max_passes: Optional[int] = None, animate: bool = True,
+                 autosave_path: Optional[str] = None, difficulty_index: Optional[DifficultyIndex] = None,
+                 difficulty: Optional[str] = None, stats_path: Optional[str] = None,
+                 autoplayer: Optional[RolloutPlayer] = None):
+        self.draw_count: int = draw_count
+        self.max_passes: Optional[int] = max_passes
+        self.animate: bool = animate
+        # New games are dealt from the band of the index (winnable deals of the variant) if a difficulty is given
+        self.difficulty_index: Optional[DifficultyIndex] = difficulty_index
+        self.difficulty: Optional[str] = difficulty
         self.cursor_area: None | int = None
         self.game: None | GameSolitaire = None
         self.selected_cursor_area: None | int = None
         self.selected_quantity: int = 1
         self.quantity: int = 1
         self.dt_start_game: datetime = datetime.now()
+        self.nb_undos: int = 0
+        self.game_recorded: bool = False  # the game is in the statistics
         self.KEY_QUIT: int = ord('!')
         self.KEY_RESTART: int = ord('?')
+        self.KEY_UNDO: int = ord('u')
+        self.KEY_REDO: int = ord('r')
+        self.KEY_HINT: int = ord('h')
+        self.KEY_AUTO_COMPLETE: int = ord('a')
+        self.KEY_STATS: int = ord('s')
         self.KEY_ENTER: int = 10
+        self.FRAME_TIME: float = 1 / 60  # min time between two frames, the keys read meanwhile are drawn at once
+        self.POLL_TIME: int = 50  # ms between two checks of the hint engine or of the autoplay search
+        self.ANIMATION_TIME: int = 40  # ms between two cards put on the final stacks by the auto-complete
         self.HORIZONTAL_MARGIN_BETWEEN_CARDS = 1
         self.VERTICAL_MARGIN_BETWEEN_CARDS = 1
         self.MARGIN_TOP = 1
@@ -34,23 +85,100 @@ class GameUI:
         self.x_center: None | int = None
         self.y_center: None | int = None
         self.stdscr = None
-        self.init_game()
-        curses.wrapper(self.init_screen)
+        self.layout: Optional[Layout] = None
+        self.windows: Dict = {}  # area id => curses window
+        self.dirty_areas: Set[int] = set()  # area ids to redraw
+        self.full_redraw: bool = True
+        self.message: Optional[str] = None  # shown in the menu line
+        self.menu_dirty: bool = True
+        self.hint_engine: Optional[HintEngine] = None  # started by the first hint
+        self.waiting_hint: bool = False
+        self.auto_moves: deque = deque()  # moves of the auto-complete left to play
+        # With an autoplayer, the moves are played by the Monte Carlo player, searched in background
+        self.autoplayer: Optional[RolloutPlayer] = autoplayer
+        self.autoplay_search: Optional[RolloutSearch] = None
+        self.autoplay_stuck_hash: Optional[int] = None  # position where the autoplayer found no move
+        self.sprites: Dict[Tuple, CardSprite] = {}  # (card template, card id, sprite state) => sprite
+        # Each action is appended to the autosave journal, the game interrupted last time is restored
+        self.autosave: Optional[AutosaveJournal] = AutosaveJournal(autosave_path) if autosave_path else None
+        self.stats_writer: Optional[StatsWriter] = StatsWriter(stats_path) if stats_path else None
+        self.init_game(self.load_autosave())
+
+    def run(self):
+        try:
+            curses.wrapper(self.init_screen)
+        finally:
+            if self.hint_engine:
+                self.hint_engine.close()
+            if self.autoplayer:
+                self.autoplayer.close()
+            if self.autosave:
+                self.autosave.close()
+            else:
+                # Without autosave, the game can not be continued: it is lost
+                self.record_game()
+            if self.stats_writer:
+                self.stats_writer.close()
+
+    def load_autosave(self) -> Optional[GameSolitaire]:
+        if self.autosave is None:
+            return None
+        game: Optional[GameSolitaire] = self.autosave.load()
+        if game is None or game.is_game_won():
+            return None
+        return game
 
-    def init_game(self):
-        self.game = GameSolitaire()
+    def init_game(self, game: Optional[GameSolitaire] = None):
+        # A given game is the one restored from the autosave
+        is_restored: bool = game is not None
+        if game is None:
+            # Seeded, so the autosave only stores the seed of the deal
+            if self.difficulty_index and self.difficulty:
+                seed: int = self.difficulty_index.pick_seed(self.difficulty)
+                self.set_message(f'Winnable deal, {self.difficulty}.')
+            else:
+                seed = random.getrandbits(32)
+                self.set_message(None)
+            game = GameSolitaire(seed=seed, draw_count=self.draw_count, max_passes=self.max_passes)
+            self.nb_undos = 0
+            elapsed: float = 0
+        else:
+            self.set_message('Game restored.')
+            # The undos and the time played are replayed from the autosave, whose journal goes on
+            self.nb_undos = self.autosave.nb_undos if self.autosave else 0
+            elapsed = self.autosave.elapsed if self.autosave else 0
+        self.game = game
+        self.game_recorded = False
+        if self.autoplayer:
+            self.autoplayer.reset(game)
+        if self.autosave:
+            try:
+                if is_restored:
+                    self.autosave.resume()
+                else:
+                    self.autosave.start(game)
+            except OSError as e:
+                self.autosave = None
+                self.set_message(f'Autosave disabled: {e}')
         self.cursor_area = 0
         self.selected_cursor_area = None
         self.selected_quantity = 1
         self.quantity = 1
-        self.dt_start_game: datetime = datetime.now()
+        self.dt_start_game: datetime = datetime.now() - timedelta(seconds=elapsed)
+        self.mark_all_dirty()
 
     def init_screen(self, stdscr):
         self.stdscr = stdscr
-        print(type(stdscr))
         curses.curs_set(0)
         self.stdscr.keypad(True)
-        # Init colors
+        # Mouse clicks are reported on press, without waiting to know if it is a double click
+        curses.mousemask(curses.BUTTON1_PRESSED | curses.BUTTON1_CLICKED)
+        curses.mouseinterval(0)
+        self.init_colors()
+        self.init_sprites()
+        self.controller()
+
+    def init_colors(self):
         curses.use_default_colors()
         curses.start_color()
         curses.init_pair(1, curses.COLOR_RED, -1)
@@ -64,27 +192,91 @@ class GameUI:
         self.COLOR_DEFAULT = curses.color_pair(2)
         self.COLOR_CURSOR = curses.color_pair(3)
         self.COLOR_CURSOR_SELECTED = curses.color_pair(4)
-        self.controller()
 
     def controller(self):
-        k = 0
-        while k != self.KEY_QUIT:
-            try:
-                if k in (curses.KEY_RIGHT, curses.KEY_LEFT, curses.KEY_DOWN, curses.KEY_UP):
-                    self.controller_direction_keys(k)
-                elif k == self.KEY_ENTER:
-                    self.controller_enter_key()
-                elif k == self.KEY_RESTART:
-                    self.init_game()
-                self.refresh_screen()
-                if self.game.is_game_won():
-                    self.popup_game_won()
-            except curses.error as e:
-                if str(e) == 'addwstr() returned ERR':
-                    self.popup_error()
-                else:
-                    raise e
-            k = self.stdscr.getch()
+        self.handle_keys([])
+        while True:
+            keys: List[int] = self.read_keys(time.perf_counter() + self.FRAME_TIME)
+            if self.KEY_QUIT in keys:
+                return
+            self.handle_keys(keys)
+
+    def read_keys(self, t_next_frame: float) -> List[int]:
+        # Wait for a key, then read all the keys arriving until the next frame: holding a key draws one frame per
+        # FRAME_TIME instead of one frame per key
+        # The popups wait for a key without timeout: it is reset on every return
+        self.stdscr.timeout(self.get_wait_time())
+        try:
+            keys: List[int] = [self.stdscr.getch()]
+            if keys[0] == -1:
+                return []
+            while keys[-1] != self.KEY_QUIT:
+                self.stdscr.timeout(max(0, int((t_next_frame - time.perf_counter()) * 1000)))
+                k: int = self.stdscr.getch()
+                if k == -1:
+                    break
+                keys.append(k)
+            return keys
+        finally:
+            self.stdscr.timeout(-1)
+
+    def get_wait_time(self) -> int:
+        # The wait of a key is bounded while the auto-complete is animated or a hint is awaited, to draw them
+        if self.auto_moves:
+            return self.ANIMATION_TIME
+        if self.waiting_hint or self.autoplay_search:
+            return self.POLL_TIME
+        return -1
+
+    def handle_key(self, k: int):
+        self.handle_keys([k])
+
+    def handle_keys(self, keys: List[int]):
+        for k in keys:
+            self.apply_key(k)
+        if self.auto_moves:
+            self.play_auto_move()
+        elif not self.message and self.game.get_auto_complete_moves():
+            self.set_message('All the cards can be put on the final stacks: press [a] to auto-complete.')
+        if self.hint_engine:
+            # The position is searched in background before the hint is asked
+            self.hint_engine.request(self.game)
+            self.update_hint()
+        if self.autoplayer:
+            self.update_autoplay()
+        if not self.refresh_screen():
+            return
+        if self.game.is_game_won():
+            self.record_game()
+            self.popup_game_won()
+
+    def apply_key(self, k: int):
+        previous_areas: Tuple = (self.cursor_area, self.selected_cursor_area)
+        if k != curses.KEY_RESIZE:
+            self.waiting_hint = False
+            self.auto_moves.clear()
+            self.set_message(None)
+        if k == self.KEY_HINT:
+            self.controller_hint_key()
+        elif k == self.KEY_AUTO_COMPLETE:
+            self.controller_auto_complete_key()
+        elif k in (curses.KEY_RIGHT, curses.KEY_LEFT, curses.KEY_DOWN, curses.KEY_UP):
+            self.controller_direction_keys(k)
+        elif k == self.KEY_ENTER:
+            self.controller_enter_key()
+        elif k == self.KEY_RESTART:
+            self.record_game()
+            self.init_game()
+        elif k == self.KEY_STATS:
+            self.popup_stats()
+        elif k in (self.KEY_UNDO, self.KEY_REDO):
+            self.controller_undo_keys(k)
+        elif k == curses.KEY_MOUSE:
+            self.controller_mouse()
+        elif k == curses.KEY_RESIZE:
+            # The windows are laid out again for the new size by refresh_screen
+            self.mark_all_dirty()
+        self.mark_dirty(*previous_areas, self.cursor_area, self.selected_cursor_area)
 
     def controller_direction_keys(self, k: int):
         if k == curses.KEY_RIGHT:
@@ -104,7 +296,7 @@ class GameUI:
                 return
             if self.cursor_area < 6:
                 return
-            i_stack: int = self.game.areas[str(self.cursor_area)]['i_stack']
+            i_stack: int = self.game.areas[self.cursor_area]['i_stack']
             if self.game.initial_stacks.get_stack(i_stack).count_visible_cards() > self.quantity:
                 self.quantity += 1
         elif k == curses.KEY_DOWN:
@@ -115,19 +307,140 @@ class GameUI:
     def controller_enter_key(self):
         if not self.selected_cursor_area:
             if self.cursor_area == 0:
-                self.game.action_switch_deck_cards()
+                self.play_move(SWITCH_DECK_MOVE)
+                self.mark_dirty(AREA_DECK)
             else:
                 self.selected_cursor_area = self.cursor_area
                 self.selected_quantity = self.quantity
         else:
             if self.cursor_area != 0:
-                self.game.handle_action_move_cards(str(self.selected_cursor_area), str(self.cursor_area),
-                                                   self.selected_quantity)
+                self.play_move(self.game.get_move(self.selected_cursor_area, self.cursor_area, self.selected_quantity))
             self.selected_cursor_area = None
             self.quantity = 1
             self.selected_quantity = self.quantity
 
+    def play_move(self, move: Optional[Move]) -> bool:
+        # Return False if the move is not legal
+        if move is None or not self.game.play(move):
+            return False
+        if self.autosave:
+            self.autosave.append_move(move)
+        return True
+
+    def controller_auto_complete_key(self):
+        moves: Optional[List[Move]] = self.game.get_auto_complete_moves()
+        if moves is None:
+            self.set_message('Auto-complete needs an empty stock and all the cards face up.')
+            return
+        self.selected_cursor_area = None
+        self.auto_moves.extend(moves)
+        if not self.animate:
+            while self.auto_moves:
+                self.play_auto_move()
+
+    def play_auto_move(self):
+        move: Move = self.auto_moves.popleft()
+        self.game.apply(move)
+        if self.autosave:
+            self.autosave.append_move(move)
+        self.mark_dirty(*self.game.get_move_areas(move))
+
+    def controller_hint_key(self):
+        if self.hint_engine is None:
+            from solitaire_game.hints import HintEngine
+            self.hint_engine = HintEngine()
+        self.waiting_hint = True
+        self.set_message('Searching a winning line...')
+
+    def update_hint(self):
+        if not self.waiting_hint:
+            return
+        hint: Optional[HintResult] = self.hint_engine.get_hint(self.game)
+        if hint is None:
+            if not self.hint_engine.process.is_alive():
+                self.waiting_hint = False
+                self.set_message('Hints are not available.')
+            return
+        self.waiting_hint = False
+        move: Optional[Move] = hint.get_move()
+        if move is None:
+            self.set_message('No winning line, the game is lost.' if hint.status == STATUS_UNSOLVABLE
+                             else 'No winning line found.')
+            return
+        # The move is shown as a selection: Enter plays it
+        self.mark_dirty(self.cursor_area, self.selected_cursor_area)
+        if move.kind == MOVE_SWITCH_DECK:
+            self.cursor_area = 0
+            self.selected_cursor_area = None
+        else:
+            self.selected_cursor_area, self.cursor_area = self.game.get_move_areas(move)
+            self.selected_quantity = move.quantity
+            self.quantity = 1
+        self.mark_dirty(self.cursor_area, self.selected_cursor_area)
+        self.set_message(f'Hint: press [Enter↵] to play the move ({len(hint.moves)} moves to win).')
+
+    def update_autoplay(self):
+        # Play the move of the search once it is done, then start the search of the next position
+        search: Optional[RolloutSearch] = self.autoplay_search
+        if search is not None:
+            if not search.done():
+                return
+            self.autoplay_search = None
+            # The result is dropped if the position has changed meanwhile, e.g. by a key
+            if search.zobrist_hash == self.game.zobrist_hash:
+                move: Optional[Move] = search.result().move
+                if move is None:
+                    self.autoplay_stuck_hash = self.game.zobrist_hash
+                    self.set_message('Autoplay: no more progress, the game is lost.')
+                    return
+                self.play_move(move)
+                self.selected_cursor_area = None
+                self.mark_dirty(*self.game.get_move_areas(move))
+        if self.auto_moves or self.game.is_game_won() or self.game.zobrist_hash == self.autoplay_stuck_hash:
+            return
+        self.autoplay_search = self.autoplayer.start(self.game)
+
+    def set_message(self, message: Optional[str]):
+        if message != self.message:
+            self.message = message
+            self.menu_dirty = True
+
+    def controller_mouse(self):
+        try:
+            _, x, y, _, button_state = curses.getmouse()
+        except curses.error:
+            return
+        if button_state & (curses.BUTTON1_PRESSED | curses.BUTTON1_CLICKED):
+            self.controller_click(y, x)
+
+    def controller_click(self, y: int, x: int):
+        # A click moves the cursor on the card and selects it, or moves the selected cards on it
+        hit: Optional[Tuple[int, int]] = self.layout.get_hit(y, x) if self.layout else None
+        if hit is None:
+            self.selected_cursor_area = None
+            return
+        self.cursor_area, self.quantity = hit
+        self.controller_enter_key()
+
+    def controller_undo_keys(self, k: int):
+        if k == self.KEY_UNDO:
+            move: Optional[Move] = self.game.undo()
+            if move:
+                self.nb_undos += 1
+            if move and self.autosave:
+                self.autosave.append_undo()
+        else:
+            move = self.game.redo()
+            if move and self.autosave:
+                self.autosave.append_redo()
+        if move:
+            self.mark_dirty(*self.game.get_move_areas(move))
+        self.selected_cursor_area = None
+        self.quantity = 1
+        self.selected_quantity = self.quantity
+
     def popup_game_won(self):
+        self.mark_all_dirty()
         self.stdscr.clear()
         dt_now: datetime = datetime.now()
         delta: timedelta = dt_now - self.dt_start_game
@@ -137,6 +450,8 @@ class GameUI:
         self.stdscr.addstr(self.y_center, self.x_center - int(len(message) / 2), message)
         while True:
             k = self.stdscr.getch()
+            if k == -1:
+                continue
             c = chr(k)
             if c == '!':
                 sys.exit(0)
@@ -144,106 +459,241 @@ class GameUI:
                 self.init_game()
                 break
 
-    def popup_error(self):
+    def record_game(self):
+        # Add the game to the statistics, once, when it is won or left. A game without any move is not counted.
+        if self.stats_writer is None or self.game_recorded or not self.game.journal:
+            return
+        self.game_recorded = True
+        duration: float = (datetime.now() - self.dt_start_game).total_seconds()
+        seed: Optional[int] = self.game.seed if self.game.seed is not None and self.game.seed >= 0 else None
+        player: str = self.autoplayer.get_player_name() if self.autoplayer else PLAYER_HUMAN
+        self.stats_writer.record(GameStat(player, seed, self.game.deck.draw_count, self.game.deck.max_passes,
+                                          self.game.is_game_won(), duration, len(self.game.journal), self.nb_undos,
+                                          time.time()))
+
+    def popup_stats(self):
+        # Statistics of the games played, until a key is pressed
+        if self.stats_writer is None:
+            self.set_message('Statistics are disabled.')
+            return
+        self.stats_writer.flush()
+        try:
+            store: StatsStore = StatsStore(self.stats_writer.path)
+            try:
+                summary: StatsSummary = store.get_summary(self.autoplayer.get_player_name() if self.autoplayer
+                                                          else PLAYER_HUMAN)
+            finally:
+                store.close()
+        except (sqlite3.Error, OSError) as e:
+            self.set_message(f'Statistics are not available: {e}')
+            return
+        self.mark_all_dirty()
         self.stdscr.clear()
-        error_message: str = 'Screen is to small, enlarge the window to play.'
-        self.stdscr.addstr(self.y_center - 1, self.x_center - int(len(error_message) / 2), error_message,
-                           self.COLOR_RED)
+        lines: List[str] = ['Statistics', ''] + format_summary(summary) + ['', 'Press any key to go back to the game.']
+        for i, line in enumerate(lines):
+            self.stdscr.addstr(self.y_center - len(lines) // 2 + i, self.x_center - int(len(line) / 2), line)
+        while self.stdscr.getch() == -1:
+            pass
 
-    def refresh_screen(self):
+    def popup_error(self):
+        self.mark_all_dirty()
         self.stdscr.clear()
-        self.height, self.width = self.stdscr.getmaxyx()
-        self.x_center = int(self.width / 2)
-        self.y_center = int(self.height / 2)
+        # Cut to the width of the screen, which can be smaller than the message
+        error_message: str = 'Screen is too small, enlarge the window to play.'[:max(self.width - 1, 0)]
+        try:
+            self.stdscr.addstr(max(self.y_center - 1, 0), max(self.x_center - len(error_message) // 2, 0),
+                               error_message, self.COLOR_RED)
+        except curses.error:
+            pass  # Not even one line: the screen stays blank until it is enlarged
 
-        self.draw_deck()
-        self.draw_initial_stacks()
-        self.draw_final_stacks()
+    def refresh_screen(self) -> bool:
+        """
+        Only the windows of the dirty areas are redrawn, and the terminal is updated once with doupdate. Return False,
+        with an error instead of the game, if the screen is too small.
+        """
+        height, width = self.stdscr.getmaxyx()
+        if (height, width) != (self.height, self.width):
+            self.height, self.width = height, width
+            self.x_center = int(self.width / 2)
+            self.y_center = int(self.height / 2)
+            self.layout = Layout(height, width, self.MARGIN_TOP, self.MARGIN_LEFT, self.HORIZONTAL_MARGIN_BETWEEN_CARDS,
+                                 self.VERTICAL_MARGIN_BETWEEN_CARDS)
+            self.windows = {}
+            self.init_sprites()
+            self.full_redraw = True
+        if self.full_redraw:
+            self.stdscr.erase()
+            self.draw_menu()
+            self.stdscr.noutrefresh()
+            if not self.windows and not self.init_windows():
+                self.popup_error()
+                return False
+            self.dirty_areas.update(self.windows.keys())
+            self.full_redraw = False
+        elif self.menu_dirty:
+            self.draw_menu()
+            self.stdscr.noutrefresh()
+        if not self.stacks_fit():
+            self.popup_error()
+            return False
 
-        info_menu: str = f'[Enter↵]select [Left←][Right→][Up↑][Down↓]navigate [?]new game [!]quit'
-        self.stdscr.addstr(self.height - 1, 0, info_menu + ' ' * (self.width - len(info_menu) - 1), curses.A_STANDOUT)
-        self.stdscr.refresh()
+        for area_id in sorted(self.dirty_areas):
+            window = self.windows[area_id]
+            window.erase()
+            self.draw_area(area_id)
+            window.noutrefresh()
+        self.dirty_areas.clear()
+        self.flush_screen()
+        return True
+
+    def stacks_fit(self) -> bool:
+        for i_stack, stack in enumerate(self.game.initial_stacks.stacks):
+            area_id: int = AREA_INITIAL_STACKS[i_stack]
+            cards: List[CardRect] = self.layout.get_initial_stack_cards(area_id, stack.count_hidden_cards(),
+                                                                        stack.count_visible_cards())
+            if not self.layout.fits_cards(area_id, cards):
+                return False
+        return True
+
+    def draw_menu(self):
+        text: str = self.message or \
+            '[Enter↵]select [←→↑↓]navigate [u]undo [r]redo [h]hint [a]auto [s]stats [?]new game [!]quit'
+        text = text[:self.width - 1]
+        self.stdscr.addstr(self.height - 1, 0, text + ' ' * (self.width - len(text) - 1), curses.A_STANDOUT)
+        self.menu_dirty = False
+
+    def flush_screen(self):
+        curses.doupdate()
+
+    def init_windows(self) -> bool:
+        # One window per area: the deck, each final stack and each initial stack. Return False if the screen is too
+        # small to contain them.
+        if not self.layout.fits:
+            return False
+        for area_id, rect in self.layout.area_rects.items():
+            self.windows[area_id] = self.stdscr.derwin(rect.nb_lines, rect.nb_cols, rect.y, rect.x)
+        return True
+
+    def mark_dirty(self, *cursor_areas: Optional[int]):
+        for cursor_area in cursor_areas:
+            if cursor_area is None:
+                continue
+            # The stock (cursor area 0) is drawn in the deck window
+            self.dirty_areas.add(max(cursor_area, AREA_DECK))
+
+    def mark_all_dirty(self):
+        self.full_redraw = True
+
+    def draw_area(self, area_id: int):
+        if area_id == AREA_DECK:
+            self.draw_deck()
+        elif area_id in AREA_FINAL_STACKS:
+            self.draw_final_stack(self.game.areas[area_id]['i_stack'])
+        else:
+            self.draw_initial_stack(self.game.areas[area_id]['i_stack'])
 
     def draw_deck(self):
-        area_id: int = 1
-        x: int = self.MARGIN_LEFT
-        y: int = self.MARGIN_TOP
-
-        self.draw_card(y, x, BACK_CARD, cursor_area=0)
-        x += self.get_shape_card_str(BACK_CARD)['nb_cols'] + self.HORIZONTAL_MARGIN_BETWEEN_CARDS
-        cards: List[Card] = self.game.deck.get_visible_cards()
-        for i, card in enumerate(cards):
-            if i == len(cards) - 1:
-                card_str: str = self.eval_card_template(CARD_TEMPLATE, card)
-                self.draw_card(y, x, card_str, cursor_area=area_id)
-            else:
-                card_str: str = self.eval_card_template(PART_CARD_TEMPLATE, card)
-                self.draw_card(y, x, card_str)
-                x += self.get_shape_card_str(PART_CARD_TEMPLATE)['nb_cols']
-        if len(cards) == 0:
-            card_str: str = self.eval_card_template(CARD_TEMPLATE)
-            self.draw_card(y, x, card_str, cursor_area=area_id)
+        window = self.windows[AREA_DECK]
+        # An empty stock is drawn as an empty card, selecting it turns the waste over
+        visible_cards: List[Card] = self.game.deck.get_visible_cards()
+        card_rects: List[CardRect] = self.layout.get_deck_cards(self.game.deck.count_stock_cards() > 0,
+                                                                len(visible_cards))
+        # The stock, then the visible cards of the waste, or an empty card
+        cards: List[Optional[Card]] = [None] + (visible_cards or [None])
+        for card_rect, card in zip(card_rects, cards):
+            self.draw_card(window, card_rect.y, card_rect.x, card_rect.card_template, card,
+                           cursor_area=card_rect.cursor_area)
 
     def draw_initial_stacks(self):
-        x: int = self.MARGIN_LEFT
-        for i_stack, stack in enumerate(self.game.initial_stacks.stacks):
-            area_id: int = 6 + i_stack
-            y: int = self.MARGIN_TOP + self.get_shape_card_str(CARD_TEMPLATE)[
-                'nb_lines'] + self.VERTICAL_MARGIN_BETWEEN_CARDS
-            for _ in stack.hidden_cards:
-                self.draw_card(y, x, TOP_PART_CARD)
-                y += self.get_shape_card_str(TOP_PART_CARD)['nb_lines']
-            for i_card, card in enumerate(stack.visible_cards):
-                if i_card == stack.count_visible_cards() - 1:
-                    card_str: str = self.eval_card_template(CARD_TEMPLATE, card)
-                    self.draw_card(y, x, card_str, cursor_area=area_id)
-                else:
-                    card_str: str = self.eval_card_template(TOP_PART_CARD_TEMPLATE, card)
-                    self.draw_card(y, x, card_str, cursor_area=area_id, quantity=stack.count_visible_cards() - i_card)
-                    y += self.get_shape_card_str(card_str)['nb_lines']
-            if stack.count_cards() == 0:
-                card_str: str = self.eval_card_template(CARD_TEMPLATE)
-                self.draw_card(y, x, card_str, cursor_area=area_id)
-            x += self.get_shape_card_str(CARD_TEMPLATE)['nb_cols'] + self.HORIZONTAL_MARGIN_BETWEEN_CARDS
+        for i_stack in range(len(self.game.initial_stacks.stacks)):
+            self.draw_initial_stack(i_stack)
+
+    def draw_initial_stack(self, i_stack: int):
+        area_id: int = AREA_INITIAL_STACKS[i_stack]
+        window = self.windows[area_id]
+        stack: InitialStack = self.game.initial_stacks.get_stack(i_stack)
+        card_rects: List[CardRect] = self.layout.get_initial_stack_cards(area_id, stack.count_hidden_cards(),
+                                                                         stack.count_visible_cards())
+        # Hidden cards are drawn without card, an empty stack as an empty card
+        cards: List[Optional[Card]] = [None] * stack.count_hidden_cards() + stack.visible_cards
+        for card_rect, card in zip(card_rects, cards or [None]):
+            self.draw_card(window, card_rect.y, card_rect.x, card_rect.card_template, card,
+                           cursor_area=card_rect.cursor_area, quantity=card_rect.quantity)
 
     def draw_final_stacks(self):
-        x: int = self.MARGIN_LEFT + (self.get_shape_card_str(CARD_TEMPLATE)['nb_cols'] +
-                                     self.HORIZONTAL_MARGIN_BETWEEN_CARDS) * 3
-        y: int = self.MARGIN_TOP
-        for i_stack, stack in enumerate(self.game.final_stacks.stacks):
-            area_id: int = 2 + i_stack
-            if stack.count_cards() > 0:
-                card: Card = stack.get_pickable_card()
-                card_str: str = self.eval_card_template(CARD_TEMPLATE, card)
-                self.draw_card(y, x, card_str, cursor_area=area_id)
-            else:
-                card_str: str = self.eval_card_template(CARD_TEMPLATE)
-                self.draw_card(y, x, card_str, cursor_area=area_id)
-            x += self.get_shape_card_str(CARD_TEMPLATE)['nb_cols'] + self.HORIZONTAL_MARGIN_BETWEEN_CARDS
+        for i_stack in range(len(self.game.final_stacks.stacks)):
+            self.draw_final_stack(i_stack)
+
+    def draw_final_stack(self, i_stack: int):
+        area_id: int = AREA_FINAL_STACKS[i_stack]
+        window = self.windows[area_id]
+        stack: FinalStack = self.game.final_stacks.get_stack(i_stack)
+        card: Optional[Card] = stack.get_pickable_card() if stack.count_cards() > 0 else None
+        card_rect: CardRect = self.layout.get_final_stack_cards(area_id)[0]
+        self.draw_card(window, card_rect.y, card_rect.x, card_rect.card_template, card,
+                       cursor_area=card_rect.cursor_area)
 
-    def draw_card(self, x: int, y: int, card_str: str, cursor_area=None, quantity=None):
-        stdscr_attr: int = 0
-        is_bold_card: bool = False
+    def draw_card(self, window, y: int, x: int, card_template: str, card: Optional[Card] = None, cursor_area=None,
+                  quantity=None) -> CardSprite:
+        state: int = SPRITE_DEFAULT
         if cursor_area and cursor_area == self.selected_cursor_area:
             if not quantity or quantity <= self.selected_quantity:
-                stdscr_attr = self.COLOR_CURSOR_SELECTED
-                is_bold_card = True
+                state = SPRITE_SELECTED
 
         if cursor_area == self.cursor_area:
             if not quantity or quantity <= self.quantity:
-                stdscr_attr = self.COLOR_CURSOR
-                is_bold_card = True
+                state = SPRITE_CURSOR
 
-        lines = card_str.split('\n')
-        for i, line in enumerate(lines):
-            line = self.render_card_bold(is_bold_card, line)
-            self.stdscr.addstr(x + i, y, line, stdscr_attr)
-            match = re.search(r'[0-9AJQK]+[♥♦]+|[♥♦]+\s?[0-9AJQK]+', line)
-            if match:
-                self.stdscr.addstr(x + i, y + match.start(), match.group(), self.COLOR_RED)
-            match = re.search(r'[0-9AJQK]+[♠♣]+|[♠♣]+\s?[0-9AJQK]+', line)
-            if match:
-                self.stdscr.addstr(x + i, y + match.start(), match.group(), self.COLOR_DEFAULT)
+        sprite: CardSprite = self.get_sprite(card_template, card, state)
+        for i, segments in enumerate(sprite.lines):
+            for x_segment, text, attr in segments:
+                window.addstr(y + i, x + x_segment, text, attr)
+        return sprite
+
+    def init_sprites(self):
+        self.sprites = {}
+        for card_template in (BACK_CARD, TOP_PART_CARD):
+            for state in (SPRITE_DEFAULT, SPRITE_CURSOR, SPRITE_SELECTED):
+                self.get_sprite(card_template, None, state)
+        for card_template in (CARD_TEMPLATE, PART_CARD_TEMPLATE, TOP_PART_CARD_TEMPLATE):
+            for card in [None] + GameCards.CARDS:
+                for state in (SPRITE_DEFAULT, SPRITE_CURSOR, SPRITE_SELECTED):
+                    self.get_sprite(card_template, card, state)
+
+    def get_sprite(self, card_template: str, card: Optional[Card], state: int) -> CardSprite:
+        key: Tuple = (card_template, card.id if card else None, state)
+        sprite: Optional[CardSprite] = self.sprites.get(key)
+        if sprite is None:
+            sprite = self.build_sprite(card_template, card, state)
+            self.sprites[key] = sprite
+        return sprite
+
+    def build_sprite(self, card_template: str, card: Optional[Card], state: int) -> CardSprite:
+        # Split each line of the card in segments with their own color: the value and icon of the card are drawn
+        # in red or with the default color, the rest of the line with the color of the cursor
+        attr: int = {SPRITE_DEFAULT: 0, SPRITE_CURSOR: self.COLOR_CURSOR,
+                     SPRITE_SELECTED: self.COLOR_CURSOR_SELECTED}[state]
+        card_str: str = self.eval_card_template(card_template, card)
+        lines: List[List[Tuple[int, str, int]]] = []
+        for line in card_str.split('\n'):
+            line = self.render_card_bold(state != SPRITE_DEFAULT, line)
+            matches: List[Tuple[int, int, int]] = []
+            for pattern, color in ((RED_CARD_PATTERN, self.COLOR_RED), (BLACK_CARD_PATTERN, self.COLOR_DEFAULT)):
+                match = pattern.search(line)
+                if match:
+                    matches.append((match.start(), match.end(), color))
+            segments: List[Tuple[int, str, int]] = []
+            x: int = 0
+            for start, end, color in sorted(matches):
+                if start > x:
+                    segments.append((x, line[x:start], attr))
+                segments.append((start, line[start:end], color))
+                x = end
+            if x < len(line) or not segments:
+                segments.append((x, line[x:], attr))
+            lines.append(segments)
+        shape: Dict = self.get_shape_card_str(card_str)
+        return CardSprite(lines, shape['nb_lines'], shape['nb_cols'])
 
     def render_card_bold(self, bold_card: bool, line: str) -> str:
         if not bold_card:
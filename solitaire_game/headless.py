@@ -0,0 +1,115 @@
+# Author: 4sushi
+from __future__ import annotations
+import curses
+from collections import deque
+from typing import List, Optional, Tuple, Iterable
+from solitaire_game.game import GameSolitaire, Deck
+from solitaire_game.game_ui import GameUI
+
+
+class MemoryScreen:
+    """
+    In-memory replacement of a curses window, with the subset of the API used by GameUI. Derived windows share the
+    cells of their parent, so the content of the whole screen can be read from the root screen.
+    """
+
+    def __init__(self, height: int, width: int, parent: Optional[MemoryScreen] = None, y: int = 0, x: int = 0):
+        self.height: int = height
+        self.width: int = width
+        self.y: int = y  # position in the root screen
+        self.x: int = x
+        self.root: MemoryScreen = parent.root if parent else self
+        if parent is None:
+            self.chars: List[List[str]] = [[' '] * width for _ in range(height)]
+            self.attrs: List[List[int]] = [[0] * width for _ in range(height)]
+        self.keys: deque = deque()  # pending keys, read by getch
+
+    def getmaxyx(self) -> Tuple[int, int]:
+        return self.height, self.width
+
+    def derwin(self, nb_lines: int, nb_cols: int, y: int, x: int) -> MemoryScreen:
+        if y < 0 or x < 0 or y + nb_lines > self.height or x + nb_cols > self.width:
+            raise curses.error('derwin() returned NULL')
+        return MemoryScreen(nb_lines, nb_cols, self, self.y + y, self.x + x)
+
+    def addstr(self, y: int, x: int, text: str, attr: int = 0):
+        # Like curses, writing outside the window is an error. Text longer than the line is cut instead of wrapped.
+        if y < 0 or x < 0 or y >= self.height or x >= self.width:
+            raise curses.error('addwstr() returned ERR')
+        text = text[:self.width - x]
+        chars: List[str] = self.root.chars[self.y + y]
+        attrs: List[int] = self.root.attrs[self.y + y]
+        x += self.x
+        chars[x:x + len(text)] = text
+        attrs[x:x + len(text)] = [attr] * len(text)
+
+    def erase(self):
+        for y in range(self.y, self.y + self.height):
+            self.root.chars[y][self.x:self.x + self.width] = ' ' * self.width
+            self.root.attrs[y][self.x:self.x + self.width] = [0] * self.width
+
+    def clear(self):
+        self.erase()
+
+    def noutrefresh(self):
+        pass
+
+    def refresh(self):
+        pass
+
+    def keypad(self, flag: bool):
+        pass
+
+    def timeout(self, delay: int):
+        pass
+
+    def nodelay(self, flag: bool):
+        pass
+
+    def push_keys(self, keys: Iterable[int]):
+        self.keys.extend(keys)
+
+    def getch(self) -> int:
+        return self.keys.popleft() if self.keys else -1
+
+    def get_lines(self) -> List[str]:
+        return [''.join(self.root.chars[y][self.x:self.x + self.width]) for y in range(self.y, self.y + self.height)]
+
+    def get_text(self) -> str:
+        return '\n'.join(line.rstrip() for line in self.get_lines())
+
+
+class HeadlessGameUI(GameUI):
+    """
+    GameUI drawing in a MemoryScreen, without terminal. Used to measure and replay the rendering.
+    """
+
+    def __init__(self, height: int = 50, width: int = 100, draw_count: int = Deck.DRAW_COUNT,
+                 max_passes: Optional[int] = None, game: Optional[GameSolitaire] = None, animate: bool = False):
+        super().__init__(draw_count, max_passes, animate)
+        if game is not None:
+            self.game = game
+        self.stdscr = MemoryScreen(height, width)
+        self.init_colors()
+        self.init_sprites()
+
+    def init_colors(self):
+        # Same values as curses.color_pair, which can not be called without terminal
+        self.COLOR_RED = 1 << 8
+        self.COLOR_DEFAULT = 2 << 8
+        self.COLOR_CURSOR = 3 << 8
+        self.COLOR_CURSOR_SELECTED = 4 << 8
+
+    def flush_screen(self):
+        pass
+
+    def popup_game_won(self):
+        # No blocking loop on the keys, the message stays on the screen until the next full redraw
+        self.mark_all_dirty()
+        self.stdscr.clear()
+        message: str = 'Victory! Press [?] to replay or [!] to quit.'
+        self.stdscr.addstr(self.y_center, self.x_center - int(len(message) / 2), message)
+
+    def press(self, *keys: int):
+        for k in keys:
+            self.handle_key(k)
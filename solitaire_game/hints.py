@@ -0,0 +1,144 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
+import multiprocessing
+import queue
+from solitaire_game.game import GameSolitaire, Move
+from solitaire_game.solver import Solver, SolverResult, STATUS_SOLVED, STATUS_UNKNOWN
+from solitaire_game.state import pack_game, unpack_game
+
+HINT_SECONDS: float = 3.0  # search budget of a position
+SLICE_SECONDS: float = 0.05  # the worker looks for a newer position between two slices of search
+MAX_TABLE_SIZE: int = 500_000
+
+
+class HintResult:
+
+    def __init__(self, zobrist_hash: int, status: str, moves: List[Move], nodes: int, elapsed: float):
+        self.zobrist_hash: int = zobrist_hash  # position of the hint
+        self.status: str = status
+        self.moves: List[Move] = moves  # winning line, the hint is the first move
+        self.nodes: int = nodes
+        self.elapsed: float = elapsed
+
+    def get_move(self) -> Optional[Move]:
+        return self.moves[0] if self.moves else None
+
+
+class HintSearch:
+    """
+    Search of a winning line from the positions of a game, reusing the previous searches: positions already proven
+    without winning line are skipped, and a position on the last winning line found gets the rest of the line
+    without search.
+    """
+
+    def __init__(self, max_seconds: float = HINT_SECONDS, slice_seconds: float = SLICE_SECONDS):
+        self.max_seconds: float = max_seconds
+        self.slice_seconds: float = slice_seconds
+        self.table: OrderedDict[int, bool] = OrderedDict()  # canonical hash of positions without winning line
+        self.line: List[Move] = []  # last winning line found
+        self.line_hashes: Dict[int, int] = {}  # zobrist hash of a position of the line => index of its next move
+
+    def search(self, game: GameSolitaire, should_stop: Callable[[], bool] = lambda: False) -> Optional[HintResult]:
+        """
+        Search by slices, return None if should_stop returns True between two slices.
+        """
+        i_line: Optional[int] = self.line_hashes.get(game.zobrist_hash)
+        if i_line is not None:
+            return HintResult(game.zobrist_hash, STATUS_SOLVED, self.line[i_line:], 0, 0.0)
+        solver: Solver = Solver(game, max_nodes=None, max_seconds=self.slice_seconds, max_table_size=MAX_TABLE_SIZE,
+                                table=self.table)
+        nodes: int = 0
+        elapsed: float = 0.0
+        while True:
+            result: SolverResult = solver.solve()
+            nodes += result.nodes
+            elapsed += result.elapsed
+            if result.status != STATUS_UNKNOWN or elapsed >= self.max_seconds:
+                break
+            if should_stop():
+                return None
+        if result.status == STATUS_SOLVED:
+            self.set_line(game, result.moves)
+        return HintResult(game.zobrist_hash, result.status, result.moves, nodes, elapsed)
+
+    def set_line(self, game: GameSolitaire, moves: List[Move]):
+        self.line = moves
+        self.line_hashes = {}
+        line_game: GameSolitaire = game.clone(with_journal=False)
+        for i_move, move in enumerate(moves):
+            self.line_hashes[line_game.zobrist_hash] = i_move
+            line_game.apply(move)
+
+
+def run_hint_worker(requests: multiprocessing.Queue, results: multiprocessing.Queue, max_seconds: float):
+    # Requests are (zobrist hash, packed game), or None to stop. Only the most recent request is searched.
+    hint_search: HintSearch = HintSearch(max_seconds)
+    pending: List[Optional[Tuple[int, bytes]]] = []
+
+    def should_stop() -> bool:
+        try:
+            while True:
+                pending.append(requests.get_nowait())
+        except queue.Empty:
+            pass
+        return len(pending) > 0
+
+    while True:
+        request: Optional[Tuple[int, bytes]] = pending.pop() if pending else requests.get()
+        pending.clear()
+        should_stop()
+        if pending:
+            continue  # a newer request is waiting
+        if request is None:
+            return
+        game: GameSolitaire = unpack_game(request[1])
+        result: Optional[HintResult] = hint_search.search(game, should_stop)
+        if result is not None:
+            results.put(result)
+
+
+class HintEngine:
+    """
+    Hints computed in a background process, without blocking the caller: request sends the position, get_hint
+    returns the result once it is available. The positions are searched as they are requested, so the hint of a
+    position is often ready before it is asked.
+    """
+
+    def __init__(self, max_seconds: float = HINT_SECONDS):
+        # Spawned, so the worker does not inherit the state of curses
+        context = multiprocessing.get_context('spawn')
+        self.requests: multiprocessing.Queue = context.Queue()
+        self.results: multiprocessing.Queue = context.Queue()
+        self.process = context.Process(target=run_hint_worker, args=(self.requests, self.results, max_seconds),
+                                       daemon=True)
+        self.process.start()
+        self.requested_hash: Optional[int] = None
+        self.hints: Dict[int, HintResult] = {}  # zobrist hash => result, for the recent positions
+
+    def request(self, game: GameSolitaire):
+        if game.zobrist_hash == self.requested_hash or game.zobrist_hash in self.hints:
+            return
+        self.requested_hash = game.zobrist_hash
+        self.requests.put((game.zobrist_hash, pack_game(game)))
+
+    def poll(self):
+        try:
+            while True:
+                result: HintResult = self.results.get_nowait()
+                if len(self.hints) >= 1000:
+                    del self.hints[next(iter(self.hints))]
+                self.hints[result.zobrist_hash] = result
+        except queue.Empty:
+            pass
+
+    def get_hint(self, game: GameSolitaire) -> Optional[HintResult]:
+        self.poll()
+        return self.hints.get(game.zobrist_hash)
+
+    def close(self, timeout: float = 1.0):
+        self.requests.put(None)
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
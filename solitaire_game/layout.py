@@ -0,0 +1,131 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from solitaire_game.game import AREA_DECK, AREA_FINAL_STACKS, AREA_INITIAL_STACKS
+from solitaire_game.templates import BACK_CARD, TOP_PART_CARD, CARD_TEMPLATE, PART_CARD_TEMPLATE, TOP_PART_CARD_TEMPLATE
+
+# Cursor area of the stock, drawn in the window of the deck
+AREA_STOCK: int = 0
+
+
+class Rect(NamedTuple):
+    y: int
+    x: int
+    nb_lines: int
+    nb_cols: int
+
+
+class CardRect(NamedTuple):
+    # Position of a card in the window of its area. cursor_area and quantity are the selection made by clicking the
+    # card, cursor_area is None if the card can not be selected.
+    y: int
+    x: int
+    card_template: str
+    cursor_area: Optional[int]
+    quantity: int
+
+
+def get_shape(card_template: str) -> Tuple[int, int]:
+    lines: List[str] = card_template.split('\n')
+    return len(lines), max([len(line) for line in lines])
+
+
+class Layout:
+    """
+    Position of the windows of the areas and of the cards in them, for a screen size. The cards of an area are only
+    computed again when the number of cards of the area changes. A hit map gives in O(1) the area and the quantity
+    of cards under a cell of the screen, for the mouse.
+    """
+
+    def __init__(self, height: int, width: int, margin_top: int = 1, margin_left: int = 1,
+                 horizontal_margin: int = 1, vertical_margin: int = 1):
+        self.height: int = height
+        self.width: int = width
+        self.horizontal_margin: int = horizontal_margin
+        self.shapes: Dict[str, Tuple[int, int]] = {
+            card_template: get_shape(card_template)
+            for card_template in (BACK_CARD, TOP_PART_CARD, CARD_TEMPLATE, PART_CARD_TEMPLATE, TOP_PART_CARD_TEMPLATE)
+        }
+        nb_lines, nb_cols = self.shapes[CARD_TEMPLATE]
+        nb_cols += horizontal_margin
+        y: int = margin_top + nb_lines + vertical_margin
+        self.area_rects: Dict[int, Rect] = {}  # area id => rect of the window in the screen
+        # The screen is too small if the windows of the areas and the menu line do not fit
+        self.fits: bool = height - 1 > y and width >= margin_left + nb_cols * len(AREA_INITIAL_STACKS)
+        if self.fits:
+            self.area_rects[AREA_DECK] = Rect(margin_top, margin_left, nb_lines, nb_cols * 3)
+            for i_stack, area_id in enumerate(AREA_FINAL_STACKS):
+                self.area_rects[area_id] = Rect(margin_top, margin_left + nb_cols * (3 + i_stack), nb_lines, nb_cols)
+            for i_stack, area_id in enumerate(AREA_INITIAL_STACKS):
+                self.area_rects[area_id] = Rect(y, margin_left + nb_cols * i_stack, height - 1 - y, nb_cols)
+        self.area_keys: Dict[int, Tuple] = {}  # area id => key of the cards in the hit map
+        self.cards_cache: Dict[Tuple, List[CardRect]] = {}  # (area id, key) => cards
+        self.hit_map: List[Optional[Tuple[int, int]]] = [None] * (height * width)  # cell => (cursor area, quantity)
+
+    def get_deck_cards(self, has_stock: bool, nb_visible: int) -> List[CardRect]:
+        return self.get_area_cards(AREA_DECK, (has_stock, nb_visible))
+
+    def get_final_stack_cards(self, area_id: int) -> List[CardRect]:
+        return self.get_area_cards(area_id, ())
+
+    def get_initial_stack_cards(self, area_id: int, nb_hidden: int, nb_visible: int) -> List[CardRect]:
+        return self.get_area_cards(area_id, (nb_hidden, nb_visible))
+
+    def get_area_cards(self, area_id: int, key: Tuple) -> List[CardRect]:
+        cards: Optional[List[CardRect]] = self.cards_cache.get((area_id, key))
+        if cards is None:
+            cards = self.compute_area_cards(area_id, key)
+            self.cards_cache[(area_id, key)] = cards
+        if self.area_keys.get(area_id) != key:
+            self.area_keys[area_id] = key
+            self.update_hit_map(area_id, cards)
+        return cards
+
+    def compute_area_cards(self, area_id: int, key: Tuple) -> List[CardRect]:
+        cards: List[CardRect] = []
+        if area_id == AREA_DECK:
+            has_stock, nb_visible = key
+            cards.append(CardRect(0, 0, BACK_CARD if has_stock else CARD_TEMPLATE, AREA_STOCK, 1))
+            x: int = self.shapes[BACK_CARD][1] + self.horizontal_margin
+            for _ in range(nb_visible - 1):
+                cards.append(CardRect(0, x, PART_CARD_TEMPLATE, None, 1))
+                x += self.shapes[PART_CARD_TEMPLATE][1]
+            cards.append(CardRect(0, x, CARD_TEMPLATE, AREA_DECK, 1))
+        elif area_id in AREA_FINAL_STACKS:
+            cards.append(CardRect(0, 0, CARD_TEMPLATE, area_id, 1))
+        else:
+            nb_hidden, nb_visible = key
+            y: int = 0
+            for _ in range(nb_hidden):
+                cards.append(CardRect(y, 0, TOP_PART_CARD, None, 1))
+                y += self.shapes[TOP_PART_CARD][0]
+            for i_card in range(nb_visible - 1):
+                cards.append(CardRect(y, 0, TOP_PART_CARD_TEMPLATE, area_id, nb_visible - i_card))
+                y += self.shapes[TOP_PART_CARD_TEMPLATE][0]
+            cards.append(CardRect(y, 0, CARD_TEMPLATE, area_id, 1))  # last visible card, or empty stack
+        return cards
+
+    def fits_cards(self, area_id: int, cards: List[CardRect]) -> bool:
+        # The cards of an initial stack go down: a long stack can be higher than its window on a short screen
+        rect: Rect = self.area_rects[area_id]
+        return all(card.y + self.shapes[card.card_template][0] <= rect.nb_lines for card in cards)
+
+    def update_hit_map(self, area_id: int, cards: List[CardRect]):
+        rect: Rect = self.area_rects[area_id]
+        hit_map: List[Optional[Tuple[int, int]]] = self.hit_map
+        for y in range(rect.y, rect.y + rect.nb_lines):
+            hit_map[y * self.width + rect.x:y * self.width + rect.x + rect.nb_cols] = [None] * rect.nb_cols
+        for card in cards:
+            if card.cursor_area is None:
+                continue
+            nb_lines, nb_cols = self.shapes[card.card_template]
+            hit: Tuple[int, int] = (card.cursor_area, card.quantity)
+            # Cards are clipped to the window of the area, like their drawing
+            for y in range(rect.y + card.y, min(rect.y + card.y + nb_lines, rect.y + rect.nb_lines)):
+                x: int = y * self.width + rect.x + card.x
+                hit_map[x:x + nb_cols] = [hit] * nb_cols
+
+    def get_hit(self, y: int, x: int) -> Optional[Tuple[int, int]]:
+        if 0 <= y < self.height and 0 <= x < self.width:
+            return self.hit_map[y * self.width + x]
+        return None
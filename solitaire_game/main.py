@@ -1,8 +1,124 @@
-from solitaire_game.game_ui import GameUI
+import importlib
+import sys
 
+# Subcommand => module, function, help. The modules are only imported when their command runs: the headless commands
+# (sim, solve, rate, server, autoplay) never import curses nor the UI, and start fast when launched from scripts.
+COMMANDS = {
+    'play': ('solitaire_game.main', 'play', 'play in the terminal (default command)'),
+    'sim': ('solitaire_game.simulation', 'main', 'play seeded deals without UI'),
+    'solve': ('solitaire_game.solver', 'main', 'solve seeded deals'),
+    'replay': ('solitaire_game.replay', 'main', 'render the positions of recorded games'),
+    'rate': ('solitaire_game.difficulty', 'main', 'rate deals by difficulty and build the index'),
+    'server': ('solitaire_game.server', 'main', 'host games behind a line protocol'),
+    'autoplay': ('solitaire_game.autoplay', 'main', 'play seeded deals with the Monte Carlo player, without UI'),
+    'stats': ('solitaire_game.stats', 'main', 'show the statistics of the games'),
+    'bench': ('benchmarks.run', 'main', 'run the benchmarks (from a clone of the repository)'),
+}
 
-def main():
-    game_ui = GameUI()
+
+def get_commands_help():
+    return 'commands:\n' + '\n'.join(f'  {name:<8} {help_text}' for name, (_, _, help_text) in COMMANDS.items()) + \
+        '\n\nsolitaire COMMAND -h for the options of a command.'
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in COMMANDS:
+        # Options of the game without command, e.g. solitaire --draw 1
+        return play(argv)
+    module_name, function_name, _ = COMMANDS[argv[0]]
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError as e:
+        if argv[0] == 'bench' and e.name and e.name.startswith('benchmarks'):
+            sys.exit('solitaire bench: the benchmarks are not installed, run it from a clone of the repository')
+        raise
+    return getattr(module, function_name)(argv[1:])
+
+
+def play(argv=None):
+    # Imported here, so that the other commands do not load the UI
+    import argparse
+    from solitaire_game.game import Deck
+    from solitaire_game.difficulty import BANDS
+    parser = argparse.ArgumentParser(prog='solitaire', description='Solitaire game (klondike) in the terminal.',
+                                     epilog=get_commands_help(), formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--draw', type=int, choices=[1, 3], default=Deck.DRAW_COUNT, help='cards drawn from the stock')
+    parser.add_argument('--max-passes', type=int, default=None, help='max passes through the stock (default: no limit)')
+    parser.add_argument('--no-animation', action='store_true', help='auto-complete the game at once')
+    parser.add_argument('--no-autosave', action='store_true',
+                        help='do not save the game while it is played, nor restore the last game')
+    parser.add_argument('--no-stats', action='store_true', help='do not add the games to the statistics')
+    parser.add_argument('--difficulty', choices=list(BANDS), default=None,
+                        help='deal winnable games of this difficulty, from the index built by solitaire-rate')
+    parser.add_argument('--difficulty-index', default=None, metavar='FILE',
+                        help='difficulty index (default: the index of the variant in the user data directory)')
+    parser.add_argument('--autoplay', action='store_true',
+                        help='watch the Monte Carlo player play, the keys still work (see the autoplay command)')
+    parser.add_argument('--autoplay-policy', choices=['random', 'greedy'], default='greedy',
+                        help='policy of the playouts of the autoplay')
+    parser.add_argument('--autoplay-seconds', type=float, default=0.5, help='search budget of a move of the autoplay')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='processes of the autoplay playouts (default: cpu count)')
+    parser.add_argument('--stats', nargs='?', const='-', default=None, metavar='FILE',
+                        help='time each frame by phase, and write the histograms on exit (default: stderr)')
+    parser.add_argument('--profile', nargs='?', const='solitaire.prof', default=None, metavar='FILE',
+                        help='also run cProfile and dump the pstats to FILE (default: solitaire.prof)')
+    args = parser.parse_args(argv)
+
+    from solitaire_game.savefile import get_autosave_path
+    from solitaire_game.difficulty import DifficultyIndex, get_index_path
+    from solitaire_game.stats import get_stats_path
+    # The games of the autoplay are not continued, they would replace the game of the player
+    autosave_path = None if args.no_autosave or args.autoplay else get_autosave_path()
+    stats_path = None if args.no_stats else get_stats_path()
+    difficulty_index = None
+    if args.difficulty:
+        index_path = args.difficulty_index or get_index_path(args.draw, args.max_passes)
+        try:
+            difficulty_index = DifficultyIndex(index_path)
+        except (OSError, ValueError) as e:
+            parser.error(f'no difficulty index ({e}), build it with: solitaire-rate rate ... && solitaire-rate index')
+        if (difficulty_index.draw_count, difficulty_index.max_passes) != (args.draw, args.max_passes):
+            parser.error(f'{index_path} is the index of another variant (--draw, --max-passes)')
+        if difficulty_index.count == 0:
+            parser.error(f'{index_path} has no deal')
+    autoplayer = None
+    if args.autoplay:
+        from solitaire_game.autoplay import RolloutPlayer
+        autoplayer = RolloutPlayer(args.autoplay_policy, args.autoplay_seconds, workers=args.workers)
+    if args.stats is None and args.profile is None:
+        from solitaire_game.game_ui import GameUI
+        game_ui = GameUI(draw_count=args.draw, max_passes=args.max_passes, animate=not args.no_animation,
+                         autosave_path=autosave_path, difficulty_index=difficulty_index, difficulty=args.difficulty,
+                         stats_path=stats_path, autoplayer=autoplayer)
+        game_ui.run()
+        return
+
+    # Only imported when requested, the normal game has no instrumentation
+    import cProfile
+    from solitaire_game.profiling import FrameStats, ProfiledGameUI
+    stats = FrameStats()
+    game_ui = ProfiledGameUI(args.draw, args.max_passes, not args.no_animation, stats, autosave_path,
+                             difficulty_index, args.difficulty, stats_path, autoplayer)
+    profiler = cProfile.Profile() if args.profile else None
+    try:
+        if profiler:
+            profiler.enable()
+        game_ui.run()
+    finally:
+        # Also on sys.exit from the victory popup
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        if args.stats in (None, '-'):
+            stats.write_report(sys.stderr)
+        else:
+            with open(args.stats, 'w') as f:
+                stats.write_report(f)
+        if profiler:
+            print(f'pstats written to {args.profile}, read them with: python -m pstats {args.profile}',
+                  file=sys.stderr)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,165 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import Dict, List, Optional, TextIO, TYPE_CHECKING
+import time
+from solitaire_game.game_ui import GameUI
+
+if TYPE_CHECKING:
+    from solitaire_game.difficulty import DifficultyIndex
+    from solitaire_game.autoplay import RolloutPlayer
+
+# Upper bounds of the histogram buckets, in microseconds
+BUCKETS_US: List[int] = [50, 100, 200, 500, 1000, 2000, 5000, 10_000, 20_000, 50_000, 100_000]
+# refresh is the time of refresh_screen out of the draw and flush phases: the layout of the windows after a resize,
+# the menu, and the erase of the windows redrawn
+PHASES: List[str] = ['controller', 'refresh', 'draw_deck', 'draw_final_stack', 'draw_initial_stack', 'flush']
+# Time waiting for the user, in a popup until a key is pressed: not part of the frame
+WAIT_PHASE: str = 'wait'
+
+
+class FrameStats:
+    """
+    Time of each frame, from the keys read to the terminal update, split in phases. Phases can be nested, the time of
+    a phase excludes the time of the phases started inside it. The wait phase is excluded from the frame.
+    """
+
+    def __init__(self):
+        self.frames: Dict[str, List[float]] = {phase: [] for phase in PHASES + ['total']}  # phase => seconds per frame
+        self.frame: Dict[str, float] = {}  # phase => seconds in the current frame
+        self.stack: List[List] = []  # [phase, start time, time of the nested phases]
+        self.t_frame: float = 0
+        self.wait_time: float = 0  # seconds in the wait phase in the current frame
+
+    def start_frame(self):
+        self.frame = {}
+        self.t_frame = time.perf_counter()
+        self.wait_time = 0
+
+    def end_frame(self):
+        for phase, times in self.frames.items():
+            if phase != 'total':
+                times.append(self.frame.get(phase, 0.0))
+        self.frames['total'].append(time.perf_counter() - self.t_frame - self.wait_time)
+
+    def begin(self, phase: str):
+        self.stack.append([phase, time.perf_counter(), 0.0])
+
+    def end(self):
+        phase, t_start, nested_time = self.stack.pop()
+        elapsed: float = time.perf_counter() - t_start
+        if phase == WAIT_PHASE:
+            self.wait_time += elapsed
+        else:
+            self.frame[phase] = self.frame.get(phase, 0.0) + elapsed - nested_time
+        if self.stack:
+            self.stack[-1][2] += elapsed
+
+    def count_frames(self) -> int:
+        return len(self.frames['total'])
+
+    def write_report(self, f: TextIO):
+        f.write(f'{self.count_frames()} frames\n')
+        f.write(f'{"phase":<20} {"mean µs":>10} {"p50 µs":>10} {"p99 µs":>10} {"max µs":>10}\n')
+        for phase, times in self.frames.items():
+            if not times:
+                continue
+            sorted_times: List[float] = sorted(times)
+            mean: float = sum(times) / len(times)
+            f.write(f'{phase:<20} {mean * 1e6:>10.1f} {get_percentile(sorted_times, 50) * 1e6:>10.1f} '
+                    f'{get_percentile(sorted_times, 99) * 1e6:>10.1f} {sorted_times[-1] * 1e6:>10.1f}\n')
+        for phase, times in self.frames.items():
+            if times and max(times) > 0:
+                f.write(f'\n{phase}\n')
+                write_histogram(f, times)
+
+
+def get_percentile(sorted_values: List[float], q: float) -> float:
+    return sorted_values[min(int(round(q / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)]
+
+
+def write_histogram(f: TextIO, times: List[float], width: int = 40):
+    counts: List[int] = [0] * (len(BUCKETS_US) + 1)
+    for t in times:
+        t_us: float = t * 1e6
+        i_bucket: int = 0
+        while i_bucket < len(BUCKETS_US) and t_us > BUCKETS_US[i_bucket]:
+            i_bucket += 1
+        counts[i_bucket] += 1
+    max_count: int = max(counts)
+    labels: List[str] = [f'<= {bound} µs' for bound in BUCKETS_US] + [f'> {BUCKETS_US[-1]} µs']
+    for label, count in zip(labels, counts):
+        if count:
+            f.write(f'  {label:>14} {count:>7} {"#" * max(1, round(count / max_count * width))}\n')
+
+
+class ProfiledGameUI(GameUI):
+    """
+    GameUI recording the time of each phase of the frames in a FrameStats. A frame starts when the keys are read and
+    ends when the terminal is updated. The popups waiting for a key are not timed.
+    """
+
+    def __init__(self, draw_count: int, max_passes: Optional[int], animate: bool, stats: FrameStats,
+                 autosave_path: Optional[str] = None, difficulty_index: Optional[DifficultyIndex] = None,
+                 difficulty: Optional[str] = None, stats_path: Optional[str] = None,
+                 autoplayer: Optional[RolloutPlayer] = None):
+        self.stats: FrameStats = stats
+        super().__init__(draw_count, max_passes, animate, autosave_path, difficulty_index, difficulty, stats_path,
+                         autoplayer)
+
+    def handle_keys(self, keys: List[int]):
+        self.stats.start_frame()
+        self.stats.begin('controller')
+        try:
+            super().handle_keys(keys)
+        finally:
+            self.stats.end()
+            self.stats.end_frame()
+
+    def refresh_screen(self) -> bool:
+        self.stats.begin('refresh')
+        try:
+            return super().refresh_screen()
+        finally:
+            self.stats.end()
+
+    def popup_game_won(self):
+        self.stats.begin(WAIT_PHASE)
+        try:
+            super().popup_game_won()
+        finally:
+            self.stats.end()
+
+    def popup_stats(self):
+        self.stats.begin(WAIT_PHASE)
+        try:
+            super().popup_stats()
+        finally:
+            self.stats.end()
+
+    def draw_deck(self):
+        self.stats.begin('draw_deck')
+        try:
+            super().draw_deck()
+        finally:
+            self.stats.end()
+
+    def draw_final_stack(self, i_stack: int):
+        self.stats.begin('draw_final_stack')
+        try:
+            super().draw_final_stack(i_stack)
+        finally:
+            self.stats.end()
+
+    def draw_initial_stack(self, i_stack: int):
+        self.stats.begin('draw_initial_stack')
+        try:
+            super().draw_initial_stack(i_stack)
+        finally:
+            self.stats.end()
+
+    def flush_screen(self):
+        self.stats.begin('flush')
+        try:
+            super().flush_screen()
+        finally:
+            self.stats.end()
@@ -0,0 +1,180 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+import argparse
+import curses
+import json
+import sys
+from solitaire_game.game import Move, MOVE_SWITCH_DECK
+from solitaire_game.headless import HeadlessGameUI, MemoryScreen
+from solitaire_game.layout import AREA_STOCK
+from solitaire_game.savefile import GameRecord, AutosaveJournal, read_records
+
+# Foreground colors of the color pairs of HeadlessGameUI (see GameUI.init_colors)
+ANSI_COLORS: Dict[int, int] = {1: 31, 3: 35, 4: 32}
+
+
+class Frame:
+
+    def __init__(self, i_move: int, move: Optional[Move], lines: List[str], attrs: List[List[int]]):
+        self.i_move: int = i_move  # number of moves played, 0 for the initial position
+        self.move: Optional[Move] = move  # last move played
+        self.lines: List[str] = lines
+        self.attrs: List[List[int]] = attrs
+
+    def get_text(self) -> str:
+        return '\n'.join(line.rstrip() for line in self.lines)
+
+
+class Replayer:
+    """
+    Render the positions of recorded games, drawn by GameUI in a MemoryScreen. The screen and the sprites of the
+    cards are made once and reused by all the games.
+    """
+
+    def __init__(self, height: int = 50, width: int = 100):
+        self.ui: HeadlessGameUI = HeadlessGameUI(height=height, width=width)
+
+    def render_frames(self, record: GameRecord) -> Iterator[Frame]:
+        """
+        Play the moves of the record and yield the screen after each of them. Frames are made one at a time, only
+        the areas changed by a move are redrawn. The last move is shown with the colors of a selection: its source is
+        selected and the cursor is on its destination.
+        Raise ValueError on an illegal move.
+        """
+        ui: HeadlessGameUI = self.ui
+        ui.game = record.new_game()
+        ui.cursor_area, ui.selected_cursor_area = AREA_STOCK, None
+        ui.mark_all_dirty()
+        nb_moves: int = len(record.moves)
+        ui.set_message(f'Move 0/{nb_moves}')
+        yield self.render(0, None)
+        for i_move, move in enumerate(record.moves, 1):
+            if not ui.game.play(move):
+                raise ValueError(f'Error replay - Illegal move {i_move} {move}')
+            ui.mark_dirty(ui.cursor_area, ui.selected_cursor_area)
+            if move.kind == MOVE_SWITCH_DECK:
+                ui.selected_cursor_area, ui.cursor_area = None, AREA_STOCK
+            else:
+                ui.selected_cursor_area, ui.cursor_area = ui.game.get_move_areas(move)
+                ui.selected_quantity, ui.quantity = 1, move.quantity
+            ui.mark_dirty(ui.cursor_area, ui.selected_cursor_area)
+            ui.set_message(f'Move {i_move}/{nb_moves}' + (' - won' if ui.game.is_game_won() else ''))
+            yield self.render(i_move, move)
+
+    def render(self, i_move: int, move: Optional[Move]) -> Frame:
+        # The frame shows an error if a stack is higher than its window
+        self.ui.refresh_screen()
+        screen: MemoryScreen = self.ui.stdscr
+        return Frame(i_move, move, screen.get_lines(), [list(attrs) for attrs in screen.attrs])
+
+
+def render_frames(record: GameRecord, height: int = 50, width: int = 100) -> Iterator[Frame]:
+    return Replayer(height, width).render_frames(record)
+
+
+def get_ansi_line(line: str, attrs: List[int]) -> str:
+    # Text of the line with the SGR sequences of its attributes
+    parts: List[str] = []
+    previous_attr: int = 0
+    for char, attr in zip(line, attrs):
+        if attr != previous_attr:
+            codes: List[str] = ['0']
+            if attr & curses.A_STANDOUT:
+                codes.append('7')
+            color: Optional[int] = ANSI_COLORS.get((attr & curses.A_COLOR) >> 8)
+            if color:
+                codes.append(str(color))
+            parts.append(f'\x1b[{";".join(codes)}m')
+            previous_attr = attr
+        parts.append(char)
+    if previous_attr:
+        parts.append('\x1b[0m')
+    return ''.join(parts)
+
+
+def iter_text(frames: Iterable[Frame]) -> Iterator[str]:
+    # Frames separated by a form feed
+    for i, frame in enumerate(frames):
+        yield ('\f\n' if i > 0 else '') + frame.get_text() + '\n'
+
+
+def iter_asciicast(frames: Iterable[Frame], height: int, width: int, frame_time: float = 0.5,
+                   title: Optional[str] = None) -> Iterator[str]:
+    """
+    Lines of an asciicast v2 recording: the header, then one event per frame writing only the lines changed since
+    the previous frame.
+    """
+    header: Dict = {'version': 2, 'width': width, 'height': height}
+    if title:
+        header['title'] = title
+    yield json.dumps(header) + '\n'
+    previous: List[Tuple[str, List[int]]] = []
+    for i, frame in enumerate(frames):
+        parts: List[str] = ['\x1b[H\x1b[2J'] if i == 0 else []
+        for y, (line, attrs) in enumerate(zip(frame.lines, frame.attrs)):
+            if i > 0 and previous[y] == (line, attrs):
+                continue
+            parts.append(f'\x1b[{y + 1};1H' + get_ansi_line(line, attrs))
+        previous = list(zip(frame.lines, frame.attrs))
+        yield json.dumps([round(i * frame_time, 3), 'o', ''.join(parts)]) + '\n'
+
+
+def read_input_records(path: str) -> Iterator[GameRecord]:
+    # A file of records (solitaire-sim -f bin), or an autosave journal
+    journal: AutosaveJournal = AutosaveJournal(path)
+    game = journal.load()
+    if game is not None:
+        yield GameRecord.from_game(game)
+        return
+    with open(path, 'rb') as f:
+        yield from read_records(f)
+
+
+def write_lines(f: TextIO, lines: Iterable[str]):
+    for line in lines:
+        f.write(line)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog='solitaire-replay',
+                                     description='Render the positions of recorded games, without terminal.')
+    parser.add_argument('input', help='file of game records (solitaire-sim -f bin) or autosave journal')
+    parser.add_argument('--seed', type=int, action='append', default=None,
+                        help='only replay the games of this seed (can be repeated)')
+    parser.add_argument('--limit', type=int, default=None, help='max number of games replayed')
+    parser.add_argument('-f', '--format', choices=['text', 'asciicast'], default='text')
+    parser.add_argument('--size', default='50x100', help='screen size, LINESxCOLUMNS (default: 50x100)')
+    parser.add_argument('--frame-time', type=float, default=0.5, help='seconds between two frames of an asciicast')
+    parser.add_argument('-o', '--output', default=None,
+                        help='output file (default: stdout). With several asciicast games, {seed} and {index} in '
+                             'the name give one file per game')
+    args = parser.parse_args(argv)
+
+    height, width = (int(value) for value in args.size.split('x'))
+    records: Iterator[GameRecord] = read_input_records(args.input)
+    replayer: Replayer = Replayer(height, width)
+    index: int = 0
+    for record in records:
+        if args.seed is not None and record.seed not in args.seed:
+            continue
+        if args.limit is not None and index >= args.limit:
+            break
+        if args.format == 'asciicast' and index > 0 and (not args.output or '{' not in args.output):
+            parser.error('an asciicast file has one game: use --limit 1, --seed or {seed} in the output name')
+        frames: Iterator[Frame] = replayer.render_frames(record)
+        if args.format == 'asciicast':
+            lines: Iterator[str] = iter_asciicast(frames, height, width, args.frame_time, title=f'seed {record.seed}')
+        else:
+            lines = iter_text(frames)
+        if args.output:
+            path: str = args.output.format(seed=record.seed, index=index)
+            with open(path, 'a' if path == args.output and index > 0 else 'w', encoding='utf-8') as f:
+                write_lines(f, lines)
+        else:
+            write_lines(sys.stdout, lines)
+        index += 1
+
+
+if __name__ == '__main__':
+    main()
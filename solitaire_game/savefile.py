@@ -0,0 +1,355 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+import os
+import time
+from solitaire_game.game import GameSolitaire, Move, SWITCH_DECK_MOVE, MOVE_DECK_TO_FINAL, MOVE_DECK_TO_INITIAL, \
+    MOVE_FINAL_TO_INITIAL, MOVE_INITIAL_TO_FINAL, MOVE_INITIAL_TO_INITIAL, InitialStacks, FinalStacks
+from solitaire_game.state import pack_game, unpack_game
+
+# A saved game is a record of varints:
+#   flags:          1 seeded deal, 2 move log, 4 won, 8 max passes
+#   draw count, max passes (if flag 8)
+#   deal:           the seed (if flag 1), else the size and the bytes of the packed initial position (see state.py)
+#   move log:       number of moves, move codes (if flag 2)
+# Moves with a quantity of 1 have a code < 128, so a move takes 1 byte in the log, a seeded game ~5 bytes + its moves.
+FLAG_SEEDED: int = 1
+FLAG_MOVES: int = 2
+FLAG_WON: int = 4
+FLAG_MAX_PASSES: int = 8
+
+# Codes of the moves with a quantity of 1 (0 for the deck switch), a move of more cards between initial stacks is
+# coded as the code of its single card move + NB_MOVE_CODES * (quantity - 1)
+MOVE_CODES: List[Move] = [SWITCH_DECK_MOVE]
+MOVE_CODES += [Move(MOVE_DECK_TO_FINAL, 0, dest, 1) for dest in range(FinalStacks.NB_STACKS)]
+MOVE_CODES += [Move(MOVE_DECK_TO_INITIAL, 0, dest, 1) for dest in range(InitialStacks.NB_STACKS)]
+MOVE_CODES += [Move(MOVE_FINAL_TO_INITIAL, src, dest, 1) for src in range(FinalStacks.NB_STACKS)
+               for dest in range(InitialStacks.NB_STACKS)]
+MOVE_CODES += [Move(MOVE_INITIAL_TO_FINAL, src, dest, 1) for src in range(InitialStacks.NB_STACKS)
+               for dest in range(FinalStacks.NB_STACKS)]
+MOVE_CODES += [Move(MOVE_INITIAL_TO_INITIAL, src, dest, 1) for src in range(InitialStacks.NB_STACKS)
+               for dest in range(InitialStacks.NB_STACKS) if src != dest]
+NB_MOVE_CODES: int = len(MOVE_CODES)
+MOVE_CODE_INDEX: Dict[Move, int] = {move: code for code, move in enumerate(MOVE_CODES)}
+
+# Autosave journal: a header (magic, record of the initial position) then one varint per action, appended as they are
+# played. The actions are undo, redo, the time played (followed by the seconds since the deal, written at most once
+# per second) and the moves (code + 3).
+JOURNAL_MAGIC: bytes = b'SOLJ\x02'
+ACTION_UNDO: int = 0
+ACTION_REDO: int = 1
+ACTION_ELAPSED: int = 2
+ACTION_MOVE: int = 3
+
+
+def encode_move(move: Move) -> int:
+    if move.kind == MOVE_INITIAL_TO_INITIAL:
+        return MOVE_CODE_INDEX[move._replace(quantity=1)] + NB_MOVE_CODES * (move.quantity - 1)
+    return MOVE_CODE_INDEX[move]
+
+
+def decode_move(code: int) -> Move:
+    move: Move = MOVE_CODES[code % NB_MOVE_CODES]
+    if code >= NB_MOVE_CODES:
+        return move._replace(quantity=code // NB_MOVE_CODES + 1)
+    return move
+
+
+def write_varint(data: bytearray, value: int):
+    # LEB128: 7 bits per byte, the high bit is set on all the bytes but the last one
+    while value >= 0x80:
+        data.append((value & 0x7F) | 0x80)
+        value >>= 7
+    data.append(value)
+
+
+def read_varint(data: bytes, i: int) -> Tuple[int, int]:
+    # Return the value and the index after it, raise ValueError if the data ends in the middle of the varint
+    value: int = 0
+    shift: int = 0
+    while True:
+        if i >= len(data):
+            raise ValueError('Error varint - Truncated data')
+        byte: int = data[i]
+        i += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, i
+        shift += 7
+
+
+class GameRecord:
+    """
+    Saved game: the initial position, by its seed or packed, and the moves played from it.
+    """
+
+    def __init__(self, seed: Optional[int], state: Optional[bytes], draw_count: int, max_passes: Optional[int],
+                 moves: List[Move], won: bool = False):
+        self.seed: Optional[int] = seed
+        self.state: Optional[bytes] = state  # packed initial position, for the games without seed
+        self.draw_count: int = draw_count
+        self.max_passes: Optional[int] = max_passes
+        self.moves: List[Move] = moves
+        self.won: bool = won
+
+    @classmethod
+    def from_game(cls, game: GameSolitaire, with_moves: bool = True) -> GameRecord:
+        moves: List[Move] = [move for move, _ in game.journal]
+        seed: Optional[int] = game.seed if game.seed is not None and game.seed >= 0 else None
+        state: Optional[bytes] = None
+        if seed is None:
+            # Back to the initial position to pack it, then forward again
+            redo_journal: List[Move] = list(game.redo_journal)
+            for _ in moves:
+                game.undo()
+            state = pack_game(game)
+            for _ in moves:
+                game.redo()
+            game.redo_journal = redo_journal
+        return cls(seed, state, game.deck.draw_count, game.deck.max_passes, moves if with_moves else [],
+                   game.is_game_won())
+
+    def new_game(self) -> GameSolitaire:
+        # Initial position of the game
+        if self.seed is not None:
+            return GameSolitaire(seed=self.seed, draw_count=self.draw_count, max_passes=self.max_passes)
+        return unpack_game(self.state)
+
+    def to_game(self) -> GameSolitaire:
+        # Game after the moves, raise ValueError if a move is illegal
+        game: GameSolitaire = self.new_game()
+        for move in self.moves:
+            if not game.play(move):
+                raise ValueError(f'Error game record - Illegal move {move}')
+        return game
+
+    def encode(self, with_moves: bool = True) -> bytes:
+        data: bytearray = bytearray()
+        flags: int = (FLAG_SEEDED if self.seed is not None else 0) | (FLAG_MOVES if with_moves else 0) | \
+            (FLAG_WON if self.won else 0) | (FLAG_MAX_PASSES if self.max_passes is not None else 0)
+        write_varint(data, flags)
+        write_varint(data, self.draw_count)
+        if self.max_passes is not None:
+            write_varint(data, self.max_passes)
+        if self.seed is not None:
+            write_varint(data, self.seed)
+        else:
+            write_varint(data, len(self.state))
+            data += self.state
+        if with_moves:
+            write_varint(data, len(self.moves))
+            for move in self.moves:
+                write_varint(data, encode_move(move))
+        return bytes(data)
+
+    @classmethod
+    def decode(cls, data: bytes, i: int = 0) -> Tuple[GameRecord, int]:
+        # Return the record and the index after it
+        flags, i = read_varint(data, i)
+        draw_count, i = read_varint(data, i)
+        max_passes: Optional[int] = None
+        if flags & FLAG_MAX_PASSES:
+            max_passes, i = read_varint(data, i)
+        seed: Optional[int] = None
+        state: Optional[bytes] = None
+        if flags & FLAG_SEEDED:
+            seed, i = read_varint(data, i)
+        else:
+            size, i = read_varint(data, i)
+            state = bytes(data[i:i+size])
+            if len(state) != size:
+                raise ValueError('Error game record - Truncated data')
+            i += size
+        moves: List[Move] = []
+        if flags & FLAG_MOVES:
+            nb_moves, i = read_varint(data, i)
+            for _ in range(nb_moves):
+                code, i = read_varint(data, i)
+                moves.append(decode_move(code))
+        return cls(seed, state, draw_count, max_passes, moves, bool(flags & FLAG_WON)), i
+
+
+def encode_game(game: GameSolitaire, with_moves: bool = True) -> bytes:
+    return GameRecord.from_game(game, with_moves).encode(with_moves)
+
+
+def decode_game(data: bytes) -> GameSolitaire:
+    return GameRecord.decode(data)[0].to_game()
+
+
+def write_records(f: BinaryIO, records: List[GameRecord], with_moves: bool = True):
+    # Records of a file are prefixed by their size, so a file can be appended and read without decoding the moves
+    data: bytearray = bytearray()
+    for record in records:
+        encoded: bytes = record.encode(with_moves)
+        write_varint(data, len(encoded))
+        data += encoded
+    f.write(data)
+
+
+def read_records(f: BinaryIO) -> Iterator[GameRecord]:
+    for record, _ in iter_records(f.read()):
+        yield record
+
+
+def iter_records(data: bytes) -> Iterator[Tuple[GameRecord, int]]:
+    # Yield the records and the index after them. A truncated record at the end of the data (interrupted write) is
+    # ignored.
+    i: int = 0
+    while i < len(data):
+        try:
+            size, i = read_varint(data, i)
+            if i + size > len(data):
+                return
+            record, _ = GameRecord.decode(data[i:i+size])
+        except ValueError:
+            return
+        i += size
+        yield record, i
+
+
+class AutosaveJournal:
+    """
+    Game saved while it is played: the initial position is written when the game starts, then each action is
+    appended, without rewriting the file. A game interrupted at any time (quit, closed terminal) is restored by
+    replaying the actions, and its journal is continued.
+    """
+
+    def __init__(self, path: str):
+        self.path: str = path
+        self.f: Optional[BinaryIO] = None
+        self.nb_undos: int = 0  # undos replayed by the last load
+        self.elapsed: float = 0  # seconds played, restored by the last load
+        self.end: int = 0  # end of the actions replayed by the last load
+        self.t_start: float = 0  # time.monotonic() at the deal, less the time played before a restore
+        self.nb_seconds_written: int = 0
+
+    def start(self, game: GameSolitaire):
+        # The journal of a new game replaces the previous one, the moves already played are written as actions
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.close()
+        data: bytearray = bytearray(JOURNAL_MAGIC)
+        record: GameRecord = GameRecord.from_game(game, with_moves=True)
+        header: bytes = record.encode(with_moves=False)
+        write_varint(data, len(header))
+        data += header
+        for move in record.moves:
+            write_varint(data, ACTION_MOVE + encode_move(move))
+        tmp_path: str = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+        self.open(0)
+
+    def resume(self):
+        # Continue the journal of the game restored by the last load: its undos and redos are kept. An action cut by
+        # an interrupted write is removed.
+        self.close()
+        with open(self.path, 'r+b') as f:
+            f.truncate(self.end)
+        self.open(self.elapsed)
+
+    def open(self, elapsed: float):
+        # Unbuffered: each action is written to the OS right away, a killed process loses nothing
+        self.f = open(self.path, 'ab', buffering=0)
+        self.t_start = time.monotonic() - elapsed
+        self.nb_seconds_written = int(elapsed)
+
+    def get_elapsed(self) -> float:
+        return time.monotonic() - self.t_start
+
+    def append_action(self, action: int):
+        if self.f is None:
+            return
+        data: bytearray = bytearray()
+        self.add_elapsed(data)
+        write_varint(data, action)
+        try:
+            self.f.write(data)
+        except OSError:
+            # E.g. a full disk: the game goes on without autosave
+            self.close()
+
+    def add_elapsed(self, data: bytearray):
+        # The time played, if a second has passed since it was last written
+        nb_seconds: int = int(self.get_elapsed())
+        if nb_seconds > self.nb_seconds_written:
+            write_varint(data, ACTION_ELAPSED)
+            write_varint(data, nb_seconds)
+            self.nb_seconds_written = nb_seconds
+
+    def append_move(self, move: Move):
+        self.append_action(ACTION_MOVE + encode_move(move))
+
+    def append_undo(self):
+        self.append_action(ACTION_UNDO)
+
+    def append_redo(self):
+        self.append_action(ACTION_REDO)
+
+    def load(self) -> Optional[GameSolitaire]:
+        """
+        Replay the journal, return None if there is no journal or it is not valid. The replay stops at the first
+        truncated or illegal action.
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                data: bytes = f.read()
+        except OSError:
+            return None
+        if not data.startswith(JOURNAL_MAGIC):
+            return None
+        try:
+            size, i = read_varint(data, len(JOURNAL_MAGIC))
+            record, _ = GameRecord.decode(data[i:i+size])
+            game: GameSolitaire = record.new_game()
+        except (ValueError, IndexError):
+            return None
+        i += size
+        self.nb_undos = 0
+        self.elapsed = 0
+        self.end = i
+        while i < len(data):
+            try:
+                action, i = read_varint(data, i)
+                if action == ACTION_ELAPSED:
+                    self.elapsed, i = read_varint(data, i)
+            except ValueError:
+                break
+            if action == ACTION_UNDO:
+                game.undo()
+                self.nb_undos += 1
+            elif action == ACTION_REDO:
+                game.redo()
+            elif action != ACTION_ELAPSED and not game.play(decode_move(action - ACTION_MOVE)):
+                break
+            self.end = i
+        return game
+
+    def delete(self):
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def close(self):
+        if self.f is not None:
+            # The time played since the last action
+            data: bytearray = bytearray()
+            self.add_elapsed(data)
+            try:
+                self.f.write(data)
+            except OSError:
+                pass
+            self.f.close()
+            self.f = None
+
+
+def get_autosave_path() -> str:
+    # Per user state directory: XDG_STATE_HOME on Linux, LOCALAPPDATA on Windows
+    if os.name == 'nt':
+        base: str = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_STATE_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'state')
+    return os.path.join(base, 'solitaire-game', 'autosave.bin')
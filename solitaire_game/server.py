@@ -0,0 +1,419 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import time
+from solitaire_game.game import GameSolitaire, Move, Deck, SWITCH_DECK_MOVE, MOVE_SWITCH_DECK, \
+    MOVE_INITIAL_TO_INITIAL, MOVE_AREA_KINDS
+from solitaire_game.hints import HintSearch, HintResult, HINT_SECONDS
+from solitaire_game.state import pack_game, unpack_game
+
+# Line protocol: one command per line, one response line per command, "ok [result]" or "error <message>".
+#   deal [seed=N] [draw=1|3] [max_passes=N]     ok <session id> <seed>
+#   move <session id> <kind> <src> <dest> [quantity]
+#   switch <session id>                         turn the next cards of the stock (or the waste over)
+#   undo <session id> / redo <session id>
+#   state <session id>                          ok <json>, see get_state
+#   hint <session id>                           ok <kind> <src> <dest> <quantity> <moves to win>, or ok none <status>
+#   close <session id>
+#   quit                                        closes the connection
+# Moves are the moves of GameSolitaire (see Move), the sessions are shared by all the connections.
+POOL_SIZE: int = 1024
+IDLE_TIMEOUT: float = 600.0  # seconds without command before a session is closed
+
+
+class Session:
+
+    def __init__(self, session_id: int, game: GameSolitaire):
+        self.session_id: int = session_id
+        self.game: GameSolitaire = game
+        self.last_access: float = time.monotonic()
+
+
+class GamePool:
+    """
+    Preallocated games: a new session reuses a released game, dealt again in place (GameSolitaire.redeal).
+    """
+
+    def __init__(self, size: int = POOL_SIZE):
+        self.size: int = size
+        self.games: List[GameSolitaire] = [GameSolitaire() for _ in range(size)]
+
+    def acquire(self, seed: int, draw_count: int, max_passes: Optional[int]) -> GameSolitaire:
+        if not self.games:
+            return GameSolitaire(seed, draw_count, max_passes)
+        game: GameSolitaire = self.games.pop()
+        game.redeal(seed, draw_count, max_passes)
+        return game
+
+    def release(self, game: GameSolitaire):
+        if len(self.games) < self.size:
+            self.games.append(game)
+
+
+# Hint search of the worker processes, its table of lost positions is reused by the next hints
+_hint_search: Optional[HintSearch] = None
+
+
+def search_hint(state: bytes, max_seconds: float) -> HintResult:
+    global _hint_search
+    if _hint_search is None or _hint_search.max_seconds != max_seconds:
+        _hint_search = HintSearch(max_seconds)
+    return _hint_search.search(unpack_game(state))
+
+
+def get_state(game: GameSolitaire) -> Dict:
+    # Cards are written like in the UI (e.g. "10♥"), the hidden cards are only counted
+    return {
+        'seed': game.seed,
+        'draw_count': game.deck.draw_count,
+        'max_passes': game.deck.max_passes,
+        'stock': game.deck.count_stock_cards(),
+        'waste': len(game.deck.waste),
+        'waste_visible': [repr(card) for card in game.deck.get_visible_cards()],
+        'final_stacks': [repr(stack.cards[-1]) if stack.cards else None for stack in game.final_stacks.stacks],
+        'initial_stacks': [
+            {'hidden': stack.count_hidden_cards(), 'visible': [repr(card) for card in stack.visible_cards]}
+            for stack in game.initial_stacks.stacks
+        ],
+        'moves': len(game.journal),
+        'won': game.is_game_won(),
+        'legal_moves': [list(move) for move in game.legal_moves()],
+    }
+
+
+class CommandError(ValueError):
+    pass
+
+
+class GameServer:
+    """
+    Sessions of GameSolitaire driven by a line protocol, on a Unix or TCP socket. Commands are executed in the event
+    loop, they only take a few µs, except the hints: they are searched in worker processes. The sessions idle for
+    idle_timeout seconds are closed.
+    """
+
+    def __init__(self, pool_size: int = POOL_SIZE, idle_timeout: float = IDLE_TIMEOUT,
+                 hint_seconds: float = HINT_SECONDS, hint_workers: Optional[int] = None):
+        self.pool: GamePool = GamePool(pool_size)
+        self.idle_timeout: float = idle_timeout
+        self.hint_seconds: float = hint_seconds
+        self.hint_workers: int = hint_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.hint_executor: Optional[ProcessPoolExecutor] = None  # started by the first hint
+        # Sessions by last access, the oldest first
+        self.sessions: OrderedDict[int, Session] = OrderedDict()
+        self.session_ids: Iterator[int] = itertools.count(1)
+        self.servers: List[asyncio.AbstractServer] = []
+        self.unix_path: Optional[str] = None
+        self.client_writers: Set[asyncio.StreamWriter] = set()
+        self.client_tasks: Set[asyncio.Task] = set()
+        self.eviction_task: Optional[asyncio.Task] = None
+        self.commands: Dict[str, Callable[[List[str]], Awaitable[str]]] = {
+            'deal': self.command_deal,
+            'move': self.command_move,
+            'switch': self.command_switch,
+            'undo': self.command_undo,
+            'redo': self.command_redo,
+            'state': self.command_state,
+            'hint': self.command_hint,
+            'close': self.command_close,
+        }
+
+    async def execute(self, line: str) -> str:
+        # Response line of a command line, without the end of line
+        words: List[str] = line.split()
+        if not words:
+            return 'error empty command'
+        command = self.commands.get(words[0].lower())
+        if command is None:
+            return f'error unknown command {words[0]}'
+        try:
+            result: str = await command(words[1:])
+        except CommandError as e:
+            return f'error {e}'
+        except (ValueError, IndexError):
+            return f'error invalid arguments for {words[0]}'
+        return f'ok {result}' if result else 'ok'
+
+    def get_session(self, args: List[str]) -> Session:
+        session: Optional[Session] = self.sessions.get(int(args[0]))
+        if session is None:
+            raise CommandError(f'unknown session {args[0]}')
+        session.last_access = time.monotonic()
+        self.sessions.move_to_end(session.session_id)
+        return session
+
+    async def command_deal(self, args: List[str]) -> str:
+        options: Dict[str, str] = dict(arg.split('=', 1) for arg in args)
+        seed: int = int(options['seed']) if 'seed' in options else random.getrandbits(32)
+        draw_count: int = int(options.get('draw', Deck.DRAW_COUNT))
+        max_passes: Optional[int] = int(options['max_passes']) if 'max_passes' in options else None
+        if seed < 0 or draw_count not in (1, 3) or (max_passes is not None and not 1 <= max_passes <= 255):
+            raise CommandError('invalid deal options')
+        session: Session = Session(next(self.session_ids), self.pool.acquire(seed, draw_count, max_passes))
+        self.sessions[session.session_id] = session
+        return f'{session.session_id} {seed}'
+
+    async def command_move(self, args: List[str]) -> str:
+        session: Session = self.get_session(args)
+        if len(args) not in (4, 5):
+            # The quantity is optional
+            raise CommandError('invalid move')
+        move: Move = Move(*(int(arg) for arg in args[1:5]))
+        if move.kind == MOVE_SWITCH_DECK:
+            move = SWITCH_DECK_MOVE
+        elif not 0 <= move.kind < len(MOVE_AREA_KINDS) or min(move) < 0 or \
+                (move.kind != MOVE_INITIAL_TO_INITIAL and move.quantity != 1):
+            # Negative stack indexes would be accepted by the lists of the game
+            raise CommandError('invalid move')
+        if not session.game.play(move):
+            raise CommandError('illegal move')
+        return ''
+
+    async def command_switch(self, args: List[str]) -> str:
+        if not self.get_session(args).game.play(SWITCH_DECK_MOVE):
+            raise CommandError('illegal move')
+        return ''
+
+    async def command_undo(self, args: List[str]) -> str:
+        if self.get_session(args).game.undo() is None:
+            raise CommandError('nothing to undo')
+        return ''
+
+    async def command_redo(self, args: List[str]) -> str:
+        if self.get_session(args).game.redo() is None:
+            raise CommandError('nothing to redo')
+        return ''
+
+    async def command_state(self, args: List[str]) -> str:
+        return json.dumps(get_state(self.get_session(args).game), ensure_ascii=False)
+
+    async def command_hint(self, args: List[str]) -> str:
+        session: Session = self.get_session(args)
+        if self.hint_executor is None:
+            # Spawned, the workers do not inherit the sockets and the event loop
+            self.hint_executor = ProcessPoolExecutor(self.hint_workers, mp_context=multiprocessing.get_context('spawn'))
+        loop = asyncio.get_running_loop()
+        hint: HintResult = await loop.run_in_executor(self.hint_executor, search_hint, pack_game(session.game),
+                                                      self.hint_seconds)
+        move: Optional[Move] = hint.get_move()
+        if move is None:
+            return f'none {hint.status}'
+        return f'{move.kind} {move.src_i_stack} {move.dest_i_stack} {move.quantity} {len(hint.moves)}'
+
+    async def command_close(self, args: List[str]) -> str:
+        self.close_session(self.get_session(args))
+        return ''
+
+    def close_session(self, session: Session):
+        del self.sessions[session.session_id]
+        self.pool.release(session.game)
+
+    def evict_idle_sessions(self) -> int:
+        # Return the number of sessions closed. The sessions are sorted by last access, the scan stops at the first
+        # active one.
+        deadline: float = time.monotonic() - self.idle_timeout
+        nb_sessions: int = 0
+        while self.sessions:
+            session: Session = next(iter(self.sessions.values()))
+            if session.last_access > deadline:
+                break
+            self.close_session(session)
+            nb_sessions += 1
+        return nb_sessions
+
+    async def run_eviction(self):
+        while True:
+            await asyncio.sleep(min(self.idle_timeout / 4, 60.0))
+            self.evict_idle_sessions()
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.client_writers.add(writer)
+        self.client_tasks.add(asyncio.current_task())
+        try:
+            while True:
+                line: bytes = await reader.readline()
+                if not line or line.strip() == b'quit':
+                    break
+                response: str = await self.execute(line.decode('utf-8', errors='replace'))
+                writer.write(response.encode('utf-8') + b'\n')
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass  # connection lost, or line longer than the limit of the reader
+        finally:
+            writer.close()
+            self.client_writers.discard(writer)
+            self.client_tasks.discard(asyncio.current_task())
+
+    async def start(self, unix_path: Optional[str] = None, host: Optional[str] = None, port: int = 0):
+        # Listen on a Unix socket and/or a TCP socket
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.remove(unix_path)
+            self.unix_path = unix_path
+            self.servers.append(await asyncio.start_unix_server(self.handle_client, path=unix_path))
+        if host:
+            self.servers.append(await asyncio.start_server(self.handle_client, host, port))
+        if self.eviction_task is None:
+            self.eviction_task = asyncio.ensure_future(self.run_eviction())
+
+    def get_tcp_address(self) -> Optional[Tuple[str, int]]:
+        for server in self.servers:
+            for sock in server.sockets:
+                if sock.family in (socket.AF_INET, socket.AF_INET6):
+                    return sock.getsockname()[:2]
+        return None
+
+    async def close(self):
+        for server in self.servers:
+            server.close()
+        # The connections are closed, their handlers end on the end of their stream
+        for writer in list(self.client_writers):
+            writer.close()
+        await asyncio.gather(*self.client_tasks, return_exceptions=True)
+        for server in self.servers:
+            await server.wait_closed()
+        self.servers = []
+        if self.unix_path and os.path.exists(self.unix_path):
+            os.remove(self.unix_path)
+            self.unix_path = None
+        if self.eviction_task:
+            self.eviction_task.cancel()
+            self.eviction_task = None
+        if self.hint_executor:
+            self.hint_executor.shutdown(wait=False)
+            self.hint_executor = None
+
+
+class GameClient:
+    """
+    Client of a GameServer, the methods send a command and parse its response. Errors of the server are raised as
+    ValueError. connect opens a Unix or TCP socket, LocalClient calls a server of the same process without socket.
+    """
+
+    def __init__(self, reader: Optional[asyncio.StreamReader] = None, writer: Optional[asyncio.StreamWriter] = None):
+        self.reader: Optional[asyncio.StreamReader] = reader
+        self.writer: Optional[asyncio.StreamWriter] = writer
+
+    @classmethod
+    async def connect(cls, unix_path: Optional[str] = None, host: str = '127.0.0.1', port: int = 0) -> GameClient:
+        if unix_path:
+            reader, writer = await asyncio.open_unix_connection(unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def send(self, line: str) -> str:
+        self.writer.write(line.encode('utf-8') + b'\n')
+        await self.writer.drain()
+        response: bytes = await self.reader.readline()
+        if not response:
+            raise ConnectionError('Error client - Connection closed by the server')
+        return response.decode('utf-8').rstrip('\n')
+
+    async def request(self, line: str) -> str:
+        # Result of the command, without "ok"
+        response: str = await self.send(line)
+        if response.startswith('error'):
+            raise ValueError(f'Error server - {response[6:]}')
+        return response[3:]
+
+    async def deal(self, seed: Optional[int] = None, draw_count: int = Deck.DRAW_COUNT,
+                   max_passes: Optional[int] = None) -> Tuple[int, int]:
+        # Return the session id and the seed of the deal
+        options: List[str] = [f'draw={draw_count}']
+        if seed is not None:
+            options.append(f'seed={seed}')
+        if max_passes is not None:
+            options.append(f'max_passes={max_passes}')
+        session_id, seed = (await self.request('deal ' + ' '.join(options))).split()
+        return int(session_id), int(seed)
+
+    async def move(self, session_id: int, move: Move):
+        await self.request(f'move {session_id} {move.kind} {move.src_i_stack} {move.dest_i_stack} {move.quantity}')
+
+    async def switch(self, session_id: int):
+        await self.request(f'switch {session_id}')
+
+    async def undo(self, session_id: int):
+        await self.request(f'undo {session_id}')
+
+    async def redo(self, session_id: int):
+        await self.request(f'redo {session_id}')
+
+    async def state(self, session_id: int) -> Dict:
+        return json.loads(await self.request(f'state {session_id}'))
+
+    async def hint(self, session_id: int) -> Optional[Move]:
+        words: List[str] = (await self.request(f'hint {session_id}')).split()
+        if words[0] == 'none':
+            return None
+        return Move(*(int(word) for word in words[:4]))
+
+    async def close_session(self, session_id: int):
+        await self.request(f'close {session_id}')
+
+    async def close(self):
+        if self.writer:
+            self.writer.write(b'quit\n')
+            self.writer.close()
+            self.writer = None
+
+
+class LocalClient(GameClient):
+    """
+    In-process client, for the tests and the harnesses running the server in their event loop: the commands are
+    executed by the server directly, with the same protocol.
+    """
+
+    def __init__(self, server: GameServer):
+        super().__init__()
+        self.server: GameServer = server
+
+    async def send(self, line: str) -> str:
+        return await self.server.execute(line)
+
+
+async def serve(game_server: GameServer, unix_path: Optional[str], host: Optional[str], port: int):
+    await game_server.start(unix_path, host, port)
+    address: str = unix_path or '{}:{}'.format(*game_server.get_tcp_address())
+    print(f'solitaire-server listening on {address}', file=sys.stderr)
+    try:
+        await asyncio.gather(*(server.serve_forever() for server in game_server.servers))
+    finally:
+        await game_server.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog='solitaire-server',
+                                     description='Host solitaire games behind a line protocol.')
+    parser.add_argument('--unix', default=None, metavar='PATH', help='listen on a Unix socket')
+    parser.add_argument('--host', default=None, help='listen on TCP (default: 127.0.0.1 without --unix)')
+    parser.add_argument('--port', type=int, default=7777)
+    parser.add_argument('--pool-size', type=int, default=POOL_SIZE, help='games preallocated')
+    parser.add_argument('--idle-timeout', type=float, default=IDLE_TIMEOUT,
+                        help='seconds without command before a session is closed')
+    parser.add_argument('--hint-seconds', type=float, default=HINT_SECONDS, help='search budget of a hint')
+    parser.add_argument('--hint-workers', type=int, default=None,
+                        help='processes searching the hints (default: cpu count - 1)')
+    args = parser.parse_args(argv)
+    host: Optional[str] = args.host or (None if args.unix else '127.0.0.1')
+    server: GameServer = GameServer(args.pool_size, args.idle_timeout, args.hint_seconds, args.hint_workers)
+    try:
+        asyncio.run(serve(server, args.unix, host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
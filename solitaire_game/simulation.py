@@ -0,0 +1,289 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import Optional, List, Dict, Iterator, Iterable, Set, Tuple
+from collections import deque
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import time
+from solitaire_game.game import GameSolitaire, Deck, Move, MOVE_SWITCH_DECK, MOVE_DECK_TO_FINAL, MOVE_DECK_TO_INITIAL, \
+    MOVE_INITIAL_TO_INITIAL, MOVE_INITIAL_TO_FINAL
+from solitaire_game.solver import Solver, STATUS_SOLVED
+from solitaire_game.savefile import GameRecord, iter_records, write_records
+
+RESULT_FIELDS: List[str] = ['seed', 'policy', 'won', 'moves', 'time']
+
+
+class Policy:
+    """
+    A policy plays a deal until it is won, no more progress is possible or max_moves is reached.
+    The random generator given to the policy is seeded with the deal seed, so results are deterministic per seed.
+    """
+
+    name: str = ''
+
+    def choose_move(self, game: GameSolitaire, rng: random.Random) -> Optional[Move]:
+        raise NotImplementedError
+
+    def play(self, game: GameSolitaire, rng: random.Random, max_moves: int) -> Tuple[bool, int]:
+        nb_moves: int = 0
+        nb_switches: int = 0
+        while nb_moves < max_moves and not game.is_game_won():
+            auto_moves: Optional[List[Move]] = game.get_auto_complete_moves()
+            if auto_moves is not None:
+                # The game is decided, the remaining cards are put on the final stacks
+                for move in auto_moves:
+                    game.apply(move)
+                nb_moves += len(auto_moves)
+                break
+            move: Optional[Move] = self.choose_move(game, rng)
+            if move is None:
+                break
+            if move.kind == MOVE_SWITCH_DECK:
+                # A full cycle of the deck without any other move, the game is stuck
+                nb_switches += 1
+                if nb_switches > game.deck.count_cards() // game.deck.draw_count + 2:
+                    break
+            else:
+                nb_switches = 0
+            game.apply(move)
+            nb_moves += 1
+        return game.is_game_won(), nb_moves
+
+
+class RandomPolicy(Policy):
+
+    name = 'random'
+
+    def choose_move(self, game: GameSolitaire, rng: random.Random) -> Optional[Move]:
+        moves: List[Move] = game.legal_moves()
+        if not moves:
+            return None
+        return rng.choice(moves)
+
+
+class GreedyPolicy(Policy):
+    """
+    Play the first move making progress: a card to the final stacks, a move turning a hidden card face up, a card
+    from the deck to the initial stacks. Otherwise switch the deck cards.
+    """
+
+    name = 'greedy'
+
+    def choose_move(self, game: GameSolitaire, rng: random.Random) -> Optional[Move]:
+        best_move: Optional[Move] = None
+        best_score: int = 0
+        for move in game.legal_moves():
+            score: int = self.get_move_score(game, move)
+            if score > best_score:
+                best_move, best_score = move, score
+        return best_move
+
+    def get_move_score(self, game: GameSolitaire, move: Move) -> int:
+        # Progress made by the move, 0 for none
+        if move.kind == MOVE_INITIAL_TO_FINAL or move.kind == MOVE_DECK_TO_FINAL:
+            return 4
+        elif move.kind == MOVE_INITIAL_TO_INITIAL:
+            src_stack = game.initial_stacks.get_stack(move.src_i_stack)
+            if move.quantity == src_stack.count_visible_cards() and src_stack.count_hidden_cards() > 0:
+                return 3
+        elif move.kind == MOVE_DECK_TO_INITIAL:
+            return 2
+        elif move.kind == MOVE_SWITCH_DECK:
+            return 1
+        return 0
+
+
+class SolverPolicy(Policy):
+
+    name = 'solver'
+
+    def __init__(self, max_nodes: int = 200_000):
+        self.max_nodes: int = max_nodes
+
+    def play(self, game: GameSolitaire, rng: random.Random, max_moves: int) -> Tuple[bool, int]:
+        # Only a node budget is used, a time budget would make the results depend on the machine
+        result = Solver(game, max_nodes=self.max_nodes).solve()
+        if result.status != STATUS_SOLVED or len(result.moves) > max_moves:
+            return False, 0
+        for move in result.moves:
+            game.apply(move)
+        return game.is_game_won(), len(result.moves)
+
+
+POLICIES: Dict[str, type] = {policy.name: policy for policy in (RandomPolicy, GreedyPolicy, SolverPolicy)}
+
+
+def simulate_deal(seed: int, policy: Policy, max_moves: int = 1000, draw_count: int = Deck.DRAW_COUNT,
+                  max_passes: Optional[int] = None, with_record: bool = False) -> Dict:
+    # With with_record, the result also has the record of the game played, with its moves
+    t_start: float = time.perf_counter()
+    game: GameSolitaire = GameSolitaire(seed=seed, draw_count=draw_count, max_passes=max_passes)
+    won, nb_moves = policy.play(game, random.Random(seed), max_moves)
+    result: Dict = {'seed': seed, 'policy': policy.name, 'won': won, 'moves': nb_moves,
+                    'time': round(time.perf_counter() - t_start, 6)}
+    if with_record:
+        result['record'] = GameRecord.from_game(game)
+    return result
+
+
+def simulate_deals(seeds: List[int], policy_name: str, max_moves: int, solver_nodes: int,
+                   draw_count: int = Deck.DRAW_COUNT, max_passes: Optional[int] = None,
+                   with_record: bool = False) -> List[Dict]:
+    policy: Policy = SolverPolicy(solver_nodes) if policy_name == SolverPolicy.name else POLICIES[policy_name]()
+    return [simulate_deal(seed, policy, max_moves, draw_count, max_passes, with_record) for seed in seeds]
+
+
+def chunk_seeds(seeds: Iterable[int], chunk_size: int) -> Iterator[List[int]]:
+    chunk: List[int] = []
+    for seed in seeds:
+        chunk.append(seed)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_simulation(seeds: Iterable[int], policy_name: str = 'greedy', workers: Optional[int] = None,
+                   max_moves: int = 1000, solver_nodes: int = 200_000, chunk_size: int = 64,
+                   draw_count: int = Deck.DRAW_COUNT, max_passes: Optional[int] = None,
+                   with_record: bool = False) -> Iterator[Dict]:
+    # Results are yielded in the order of the seeds, with a bounded number of chunks in flight, so millions of deals
+    # can be streamed without keeping them in memory
+    from concurrent.futures import ProcessPoolExecutor, Future  # imported here, a single worker runs in this process
+    workers = workers or os.cpu_count() or 1
+    chunks: Iterator[List[int]] = chunk_seeds(seeds, chunk_size)
+    if workers == 1:
+        for chunk in chunks:
+            yield from simulate_deals(chunk, policy_name, max_moves, solver_nodes, draw_count, max_passes,
+                                      with_record)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures: deque = deque()
+        for chunk in chunks:
+            futures.append(executor.submit(simulate_deals, chunk, policy_name, max_moves, solver_nodes, draw_count,
+                                           max_passes, with_record))
+            if len(futures) >= workers * 2:
+                future: Future = futures.popleft()
+                yield from future.result()
+        while futures:
+            yield from futures.popleft().result()
+
+
+def read_done_seeds(path: str, output_format: str = 'jsonl') -> Set[int]:
+    # Seeds already simulated in a previous run, to resume it. The format is the one of the output, not guessed from
+    # the extension of the file: -f csv -o results.txt is read as CSV. The truncated result of an interrupted run is
+    # removed, so the next results can be appended.
+    seeds: Set[int] = set()
+    if not os.path.exists(path):
+        return seeds
+    with open(path, 'r+b') as f:
+        end: int = 0  # end of the last complete result
+        if output_format == 'bin':
+            for record, end in iter_records(f.read()):
+                seeds.add(record.seed)
+        else:
+            for line, line_end in iter_lines(f.read()):
+                seed: Optional[int] = parse_result_seed(line, output_format)
+                if seed is not None:
+                    seeds.add(seed)
+                    end = line_end
+                elif output_format == 'csv' and end == 0 and line.rstrip(b'\r\n') == ','.join(RESULT_FIELDS).encode():
+                    end = line_end  # header
+        f.truncate(end)
+    return seeds
+
+
+def iter_lines(data: bytes) -> Iterator[Tuple[bytes, int]]:
+    # Complete lines (ending with a newline) and their end offset, the truncated last line is skipped
+    start: int = 0
+    while True:
+        stop: int = data.find(b'\n', start)
+        if stop < 0:
+            return
+        yield data[start:stop + 1], stop + 1
+        start = stop + 1
+
+
+def parse_result_seed(line: bytes, output_format: str) -> Optional[int]:
+    # Seed of a line of results, None for a line which is not a result (header, empty or corrupted line)
+    try:
+        if output_format == 'csv':
+            row: List[str] = next(csv.reader([line.decode()]))
+            return int(row[0]) if len(row) == len(RESULT_FIELDS) else None
+        return int(json.loads(line)['seed'])
+    except (ValueError, KeyError, TypeError, IndexError, StopIteration):
+        return None
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog='solitaire-sim', description='Play seeded deals without UI.')
+    parser.add_argument('-n', '--count', type=int, default=1000, help='number of deals')
+    parser.add_argument('--start-seed', type=int, default=0, help='seed of the first deal')
+    parser.add_argument('--shard', default='0/1', help='play only the seeds of the shard K/N (seed %% N == K)')
+    parser.add_argument('-p', '--policy', choices=sorted(POLICIES), default='greedy')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='number of processes (default: cpu count)')
+    parser.add_argument('--max-moves', type=int, default=1000)
+    parser.add_argument('--solver-nodes', type=int, default=200_000, help='node budget of the solver policy')
+    parser.add_argument('--draw', type=int, choices=[1, 3], default=Deck.DRAW_COUNT, help='cards drawn from the stock')
+    parser.add_argument('--max-passes', type=int, default=None, help='max passes through the stock (default: no limit)')
+    parser.add_argument('-f', '--format', choices=['jsonl', 'csv', 'bin'], default=None,
+                        help='output format (default: from the output file extension, else jsonl). bin stores the '
+                             'record of each game with its moves, in a few dozen bytes (see savefile.py)')
+    parser.add_argument('-o', '--output', default=None, help='output file (default: stdout)')
+    parser.add_argument('--resume', action='store_true', help='skip the seeds already in the output file')
+    parser.add_argument('--stats-db', default=None, metavar='FILE',
+                        help='also add the games to this statistics database, the player being the policy '
+                             '(see solitaire-stats)')
+    args = parser.parse_args(argv)
+
+    shard_index, shard_count = (int(value) for value in args.shard.split('/'))
+    extension: str = os.path.splitext(args.output)[1][1:] if args.output else ''
+    output_format: str = args.format or (extension if extension in ('csv', 'bin') else 'jsonl')
+    done_seeds: Set[int] = read_done_seeds(args.output, output_format) if args.resume and args.output else set()
+    seeds: Iterator[int] = (seed for seed in range(args.start_seed, args.start_seed + args.count)
+                            if seed % shard_count == shard_index and seed not in done_seeds)
+
+    # An interrupted run may have left an empty file, or a truncated CSV header removed by read_done_seeds
+    is_new_file: bool = not args.output or not args.resume or not os.path.exists(args.output) or \
+        os.path.getsize(args.output) == 0
+    is_binary: bool = output_format == 'bin'
+    if args.output:
+        f = open(args.output, ('a' if args.resume else 'w') + ('b' if is_binary else ''),
+                 newline=None if is_binary else '')
+    else:
+        f = sys.stdout.buffer if is_binary else sys.stdout
+    stats_writer = None
+    if args.stats_db:
+        # Imported here, most simulations do not write statistics
+        from solitaire_game.stats import StatsWriter, GameStat
+        stats_writer = StatsWriter(args.stats_db)
+    try:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS) if output_format == 'csv' else None
+        if writer and is_new_file:
+            writer.writeheader()
+        for result in run_simulation(seeds, args.policy, args.workers, args.max_moves, args.solver_nodes,
+                                     draw_count=args.draw, max_passes=args.max_passes, with_record=is_binary):
+            if is_binary:
+                write_records(f, [result['record']])
+            elif writer:
+                writer.writerow(result)
+            else:
+                f.write(json.dumps(result) + '\n')
+            f.flush()
+            if stats_writer:
+                stats_writer.record(GameStat(args.policy, result['seed'], args.draw, args.max_passes, result['won'],
+                                             result['time'], result['moves'], 0, time.time()))
+    finally:
+        if f not in (sys.stdout, sys.stdout.buffer):
+            f.close()
+        if stats_writer:
+            stats_writer.close()
+
+
+if __name__ == '__main__':
+    main()
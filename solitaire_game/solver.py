@@ -0,0 +1,241 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import Optional, List, Dict, Iterator
+from collections import OrderedDict
+import time
+from solitaire_game.game import DRAW_COUNT, GameSolitaire, GameCards, Card, Move, InitialStack, FinalStack, \
+    MOVE_SWITCH_DECK, MOVE_DECK_TO_FINAL, MOVE_DECK_TO_INITIAL, MOVE_FINAL_TO_INITIAL, MOVE_INITIAL_TO_FINAL
+
+STATUS_SOLVED = 'solved'
+STATUS_UNSOLVABLE = 'unsolvable'
+STATUS_UNKNOWN = 'unknown'
+
+RED_SUITS: List[bool] = [symbol['color'] == 'red' for symbol in GameCards.SYMBOLS.values()]
+
+
+def card_suit(card: Card) -> int:
+    return card.id // GameCards.NB_VALUES
+
+
+class SolverResult:
+
+    def __init__(self, status: str, moves: List[Move], nodes: int, elapsed: float, peak_table_size: int):
+        self.status: str = status
+        self.moves: List[Move] = moves
+        self.nodes: int = nodes
+        self.elapsed: float = elapsed
+        self.peak_table_size: int = peak_table_size
+
+    @property
+    def nodes_per_second(self) -> float:
+        if self.elapsed <= 0:
+            return 0.0
+        return self.nodes / self.elapsed
+
+    def __repr__(self) -> str:
+        return (f'SolverResult(status={self.status}, moves={len(self.moves)}, nodes={self.nodes}, '
+                f'elapsed={self.elapsed:.3f}s, nodes_per_second={self.nodes_per_second:.0f}, '
+                f'peak_table_size={self.peak_table_size})')
+
+
+class Solver:
+    """
+    Depth first search over klondike positions, with move ordering, safe auto moves to the final stacks,
+    symmetry pruning (final stacks and empty initial stacks are interchangeable) and a bounded transposition table
+    keyed by the canonical Zobrist hash of the positions.
+    Moves are made and unmade on a private copy of the game, with GameSolitaire.apply and GameSolitaire.undo.
+    After a search, the table only contains positions fully explored without winning line: it can be given to
+    another solver, e.g. on a later position of the same game, to skip them.
+    """
+
+    def __init__(self, game: GameSolitaire, max_nodes: Optional[int] = 1_000_000, max_seconds: Optional[float] = None,
+                 max_table_size: int = 2_000_000, table: Optional[OrderedDict[int, bool]] = None):
+        self.max_nodes: Optional[int] = max_nodes
+        self.max_seconds: Optional[float] = max_seconds
+        self.max_table_size: int = max_table_size
+        self.game: GameSolitaire = game.clone(with_journal=False)
+        # Ordered by insertion, the oldest entry is evicted in O(1). A plain dict would have to skip the slots freed
+        # at its head.
+        self.table: OrderedDict[int, bool] = table if table is not None else OrderedDict()
+        self.peak_table_size: int = 0
+        self.nodes: int = 0
+
+    def solve(self) -> SolverResult:
+        t_start: float = time.perf_counter()
+        deadline: Optional[float] = t_start + self.max_seconds if self.max_seconds is not None else None
+        game: GameSolitaire = self.game
+        self.nodes = 0
+        key: int = self.get_state_key()
+        self.store(key)
+        path_keys: Dict[int, bool] = {key: True}
+        keys: List[int] = [key]
+        path: List[Move] = []
+        frames: List[Iterator[Move]] = [iter(self.generate_moves())]
+        status: str = STATUS_UNSOLVABLE
+        # Once all the cards are face up and the stock is empty, the end of the game is known without search
+        auto_moves: Optional[List[Move]] = game.get_auto_complete_moves()
+        if auto_moves is not None:
+            frames = []
+            status = STATUS_SOLVED
+
+        while frames:
+            if self.max_nodes is not None and self.nodes >= self.max_nodes:
+                status = STATUS_UNKNOWN
+                break
+            if deadline is not None and (self.nodes & 255) == 0 and time.perf_counter() > deadline:
+                status = STATUS_UNKNOWN
+                break
+            move: Optional[Move] = next(frames[-1], None)
+            if move is None:
+                frames.pop()
+                if path:
+                    path.pop()
+                    game.undo()
+                    del path_keys[keys.pop()]
+                continue
+            game.apply(move)
+            key = self.get_state_key()
+            if key in path_keys or key in self.table:
+                game.undo()
+                continue
+            self.nodes += 1
+            self.store(key)
+            path.append(move)
+            keys.append(key)
+            path_keys[key] = True
+            auto_moves = game.get_auto_complete_moves()
+            if auto_moves is not None:
+                status = STATUS_SOLVED
+                break
+            frames.append(iter(self.generate_moves()))
+
+        moves: List[Move] = list(path) + auto_moves if status == STATUS_SOLVED else []
+        if status != STATUS_UNSOLVABLE:
+            # The positions of the path are not fully explored, the other positions of the table are (depth first)
+            for key in keys:
+                self.table.pop(key, None)
+        # Restore the initial position, so the solver can be reused
+        for _ in path:
+            game.undo()
+        game.redo_journal.clear()
+        elapsed: float = time.perf_counter() - t_start
+        return SolverResult(status, moves, self.nodes, elapsed, self.peak_table_size)
+
+    def store(self, key: int):
+        if len(self.table) >= self.max_table_size:
+            # Evict the oldest entry, it can only make the search revisit a position
+            self.table.popitem(last=False)
+        self.table[key] = True
+        if len(self.table) > self.peak_table_size:
+            self.peak_table_size = len(self.table)
+
+    def get_state_key(self) -> int:
+        # Positions only differing by the order of the final stacks share the same canonical hash
+        return self.game.canonical_hash
+
+    def get_final_heights(self) -> List[int]:
+        heights: List[int] = [0] * len(RED_SUITS)
+        for stack in self.game.final_stacks.stacks:
+            if stack.cards:
+                heights[card_suit(stack.cards[0])] = len(stack.cards)
+        return heights
+
+    def is_safe_final_move(self, card: Card, heights: List[int]) -> bool:
+        # A card is safe to move to the final stacks when no card still in play could need to be put on it
+        value: int = card.value
+        if value <= 2:
+            return True
+        suit: int = card_suit(card)
+        for other_suit, height in enumerate(heights):
+            if other_suit == suit:
+                continue
+            if RED_SUITS[other_suit] != RED_SUITS[suit] and height < value - 1:
+                return False
+            if RED_SUITS[other_suit] == RED_SUITS[suit] and height < value - 2:
+                return False
+        return True
+
+    def generate_moves(self) -> List[Move]:
+        game: GameSolitaire = self.game
+        initial_stacks: List[InitialStack] = game.initial_stacks.stacks
+        final_stacks: List[FinalStack] = game.final_stacks.stacks
+        final_moves: List[Move] = []
+        reveal_moves: List[Move] = []
+        deck_moves: List[Move] = []
+        other_moves: List[Move] = []
+        switch_moves: List[Move] = []
+        back_moves: List[Move] = []
+        heights: Optional[List[int]] = None
+
+        for move in game.legal_moves():
+            kind: int = move.kind
+            if kind == MOVE_DECK_TO_FINAL or kind == MOVE_INITIAL_TO_FINAL:
+                if not final_stacks[move.dest_i_stack].cards and \
+                        any(not stack.cards for stack in final_stacks[:move.dest_i_stack]):
+                    # Empty final stacks are interchangeable, only the first one is used
+                    continue
+                if kind == MOVE_DECK_TO_FINAL:
+                    card: Card = game.deck.get_pickable_card()
+                else:
+                    card = initial_stacks[move.src_i_stack].visible_cards[-1]
+                if heights is None:
+                    heights = self.get_final_heights()
+                if self.is_safe_final_move(card, heights):
+                    return [move]
+                final_moves.append(move)
+            elif kind == MOVE_SWITCH_DECK:
+                switch_moves.append(move)
+            elif kind == MOVE_FINAL_TO_INITIAL:
+                back_moves.append(move)
+            else:
+                dest_stack: InitialStack = initial_stacks[move.dest_i_stack]
+                if not dest_stack.visible_cards and \
+                        any(not stack.visible_cards for stack in initial_stacks[:move.dest_i_stack]):
+                    # Empty initial stacks are interchangeable, only the first one is used
+                    continue
+                if kind == MOVE_DECK_TO_INITIAL:
+                    deck_moves.append(move)
+                    continue
+                src_stack: InitialStack = initial_stacks[move.src_i_stack]
+                is_full_move: bool = move.quantity == src_stack.count_visible_cards()
+                if is_full_move and not src_stack.hidden_cards and not dest_stack.visible_cards:
+                    # Moving a whole stack starting with a king to an empty stack changes nothing
+                    continue
+                if is_full_move and src_stack.hidden_cards:
+                    reveal_moves.append(move)
+                else:
+                    other_moves.append(move)
+
+        reveal_moves.sort(key=lambda m: -initial_stacks[m.src_i_stack].count_hidden_cards())
+        return final_moves + reveal_moves + deck_moves + other_moves + switch_moves + back_moves
+
+
+def solve(game: GameSolitaire, max_nodes: Optional[int] = 1_000_000, max_seconds: Optional[float] = None,
+          max_table_size: int = 2_000_000) -> SolverResult:
+    return Solver(game, max_nodes=max_nodes, max_seconds=max_seconds, max_table_size=max_table_size).solve()
+
+
+def main(argv: Optional[List[str]] = None):
+    # Imported here, the library use of the solver does not need them
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(prog='solitaire solve', description='Solve seeded deals, one JSON line per deal.')
+    parser.add_argument('seeds', type=int, nargs='*', help='seeds of the deals (default: --count deals)')
+    parser.add_argument('-n', '--count', type=int, default=1, help='number of deals, from --start-seed')
+    parser.add_argument('--start-seed', type=int, default=0, help='seed of the first deal')
+    parser.add_argument('--draw', type=int, choices=[1, 3], default=DRAW_COUNT,
+                        help='cards drawn from the stock')
+    parser.add_argument('--max-passes', type=int, default=None, help='max passes through the stock (default: no limit)')
+    parser.add_argument('--max-nodes', type=int, default=1_000_000, help='node budget per deal')
+    parser.add_argument('--max-seconds', type=float, default=None, help='time budget per deal')
+    parser.add_argument('--moves', action='store_true', help='also write the moves of the winning line')
+    args = parser.parse_args(argv)
+    seeds: List[int] = args.seeds or list(range(args.start_seed, args.start_seed + args.count))
+    for seed in seeds:
+        game: GameSolitaire = GameSolitaire(seed=seed, draw_count=args.draw, max_passes=args.max_passes)
+        result: SolverResult = solve(game, max_nodes=args.max_nodes, max_seconds=args.max_seconds)
+        line: Dict = {'seed': seed, 'status': result.status, 'moves': len(result.moves), 'nodes': result.nodes,
+                      'elapsed': round(result.elapsed, 6)}
+        if args.moves:
+            line['line'] = [list(move) for move in result.moves]
+        print(json.dumps(line), flush=True)
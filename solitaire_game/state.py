@@ -0,0 +1,75 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import Optional, List
+from solitaire_game.game import GameSolitaire, GameCards, Card, Deck, InitialStack, InitialStacks, FinalStacks, \
+    MoveRules
+
+# A game state is packed in an immutable and hashable bytes object, cards are encoded with their id (0-51):
+#   deck:           draw count, max passes (0 if not limited), nb passes, nb stock cards, stock card ids (next card
+#                   first), nb waste cards, waste card ids (pickable card last), nb visible cards
+#   initial stacks: for each stack, nb hidden cards, nb visible cards, hidden card ids, visible card ids
+#   final stacks:   for each stack, nb cards, card ids
+# The total number of cards of the game is the first byte.
+
+
+def pack_game(game: GameSolitaire) -> bytes:
+    deck: Deck = game.deck
+    stock_cards: List[Card] = deck.get_stock_cards()
+    # The number of passes only matters with max passes (<= 255), else it is capped to fit in a byte
+    nb_passes: int = min(deck.nb_recycles + 1, 255)
+    data: List[int] = [game.NB_CARDS, deck.draw_count, deck.max_passes or 0, nb_passes, len(stock_cards)]
+    data += [card.id for card in stock_cards]
+    data.append(len(deck.waste))
+    data += [card.id for card in deck.waste]
+    data.append(deck.nb_visible)
+    for stack in game.initial_stacks.stacks:
+        data += [len(stack.hidden_cards), len(stack.visible_cards)]
+        data += [card.id for card in stack.hidden_cards]
+        data += [card.id for card in stack.visible_cards]
+    for stack in game.final_stacks.stacks:
+        data.append(len(stack.cards))
+        data += [card.id for card in stack.cards]
+    return bytes(data)
+
+
+def unpack_game(state: bytes) -> GameSolitaire:
+    cards: List[Card] = GameCards.CARDS
+    nb_cards: int = state[0]
+    draw_count: int = state[1]
+    max_passes: Optional[int] = state[2] or None
+    nb_passes: int = state[3]
+    i: int = 5 + state[4]
+    stock_cards: List[Card] = [cards[card_id] for card_id in state[5:i]]
+    nb_waste: int = state[i]
+    waste_cards: List[Card] = [cards[card_id] for card_id in state[i+1:i+1+nb_waste]]
+    i += 1 + nb_waste
+    deck: Deck = Deck.from_cards(stock_cards, waste_cards, state[i], nb_passes, draw_count, max_passes)
+    i += 1
+
+    stacks_cards: List[List[Card]] = []
+    for _ in range(InitialStacks.NB_STACKS):
+        nb_hidden: int = state[i]
+        nb_visible: int = state[i+1]
+        i += 2
+        stacks_cards.append([cards[card_id] for card_id in state[i:i+nb_hidden]])
+        i += nb_hidden
+        stacks_cards.append([cards[card_id] for card_id in state[i:i+nb_visible]])
+        i += nb_visible
+
+    final_cards: List[List[Card]] = []
+    for _ in range(FinalStacks.NB_STACKS):
+        nb_final: int = state[i]
+        final_cards.append([cards[card_id] for card_id in state[i+1:i+1+nb_final]])
+        i += 1 + nb_final
+
+    # The range of values of the cards of the game gives the rules (custom decks, see GameCards)
+    values: List[int] = [card.value for stack_cards in stacks_cards + final_cards + [stock_cards, waste_cards]
+                         for card in stack_cards]
+    rules: MoveRules = MoveRules.get_rules(min(values), max(values))
+    stacks: List[InitialStack] = [InitialStack(stacks_cards[i_stack*2], stacks_cards[i_stack*2+1], i_stack, rules)
+                                  for i_stack in range(InitialStacks.NB_STACKS)]
+    final_stacks: FinalStacks = FinalStacks(rules)
+    for stack, stack_cards in zip(final_stacks.stacks, final_cards):
+        stack.set_cards(stack_cards)
+
+    return GameSolitaire.from_stacks(deck, InitialStacks.from_stacks(stacks), final_stacks, nb_cards)
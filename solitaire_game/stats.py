@@ -0,0 +1,238 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import argparse
+import json
+import os
+import queue
+import sqlite3
+import threading
+
+# Percentiles of the duration of the won games
+PERCENTILES: Tuple[int, ...] = (0, 50, 90)
+PLAYER_HUMAN: str = 'human'
+
+# One row per game. The players table keeps the counters of each player up to date, so the win rate and the streaks
+# are read without scanning the games, and the percentiles are read from the index of the durations.
+SCHEMA: str = '''
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    player TEXT NOT NULL,
+    seed INTEGER,
+    draw_count INTEGER NOT NULL,
+    max_passes INTEGER,
+    won INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    moves INTEGER NOT NULL,
+    undos INTEGER NOT NULL,
+    ended_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_duration ON games (player, won, duration);
+CREATE TABLE IF NOT EXISTS players (
+    player TEXT PRIMARY KEY,
+    games INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    current_streak INTEGER NOT NULL,
+    longest_streak INTEGER NOT NULL
+);
+'''
+
+
+class GameStat(NamedTuple):
+    player: str  # PLAYER_HUMAN, or the policy of a simulation
+    seed: Optional[int]
+    draw_count: int
+    max_passes: Optional[int]
+    won: bool
+    duration: float  # seconds
+    moves: int
+    undos: int
+    ended_at: float  # timestamp
+
+
+class StatsSummary(NamedTuple):
+    player: str
+    games: int
+    wins: int
+    current_streak: int  # wins since the last lost game
+    longest_streak: int
+    durations: Dict[int, float]  # percentile => duration of the won games, in seconds
+
+    def get_win_rate(self) -> float:
+        return self.wins / self.games if self.games else 0.0
+
+
+class StatsStore:
+    """
+    Statistics of the games, in a SQLite database in WAL mode: the game and the simulations write to it while the
+    statistics are read.
+    """
+
+    def __init__(self, path: str, timeout: float = 10.0):
+        self.path: str = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Transactions are opened explicitly, see add_games
+        self.connection: sqlite3.Connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        # A commit does not wait for the disk, a power loss can lose the last games but never corrupts the database
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+
+    def add_games(self, stats: List[GameStat]):
+        # One transaction per batch. It is opened before reading the counters of the players, so several processes
+        # can write to the same database.
+        if not stats:
+            return
+        cursor: sqlite3.Cursor = self.connection.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.executemany('INSERT INTO games (player, seed, draw_count, max_passes, won, duration, moves, undos, '
+                               'ended_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', stats)
+            counters: Dict[str, List[int]] = {}
+            for stat in stats:
+                player_counters: Optional[List[int]] = counters.get(stat.player)
+                if player_counters is None:
+                    row: Optional[Tuple] = cursor.execute('SELECT games, wins, current_streak, longest_streak FROM '
+                                                          'players WHERE player = ?', (stat.player,)).fetchone()
+                    player_counters = counters[stat.player] = list(row) if row else [0, 0, 0, 0]
+                player_counters[0] += 1
+                if stat.won:
+                    player_counters[1] += 1
+                    player_counters[2] += 1
+                    player_counters[3] = max(player_counters[3], player_counters[2])
+                else:
+                    player_counters[2] = 0
+            cursor.executemany('INSERT OR REPLACE INTO players (player, games, wins, current_streak, longest_streak) '
+                               'VALUES (?, ?, ?, ?, ?)',
+                               [(player, *player_counters) for player, player_counters in counters.items()])
+            cursor.execute('COMMIT')
+        except BaseException:
+            cursor.execute('ROLLBACK')
+            raise
+
+    def get_players(self) -> List[str]:
+        return [row[0] for row in self.connection.execute('SELECT player FROM players ORDER BY games DESC')]
+
+    def get_summary(self, player: str = PLAYER_HUMAN) -> StatsSummary:
+        row: Optional[Tuple] = self.connection.execute('SELECT games, wins, current_streak, longest_streak FROM '
+                                                       'players WHERE player = ?', (player,)).fetchone()
+        games, wins, current_streak, longest_streak = row or (0, 0, 0, 0)
+        durations: Dict[int, float] = {}
+        if wins:
+            for percentile in PERCENTILES:
+                # Walks the index of the durations, without sorting the games
+                durations[percentile] = self.connection.execute(
+                    'SELECT duration FROM games WHERE player = ? AND won = 1 ORDER BY duration LIMIT 1 OFFSET ?',
+                    (player, int(round(percentile / 100 * (wins - 1))))).fetchone()[0]
+        return StatsSummary(player, games, wins, current_streak, longest_streak, durations)
+
+    def close(self):
+        self.connection.close()
+
+
+class StatsWriter:
+    """
+    Record the games from a background thread: record() only queues the game, the UI never waits for the disk. The
+    games queued meanwhile are written at once, in one transaction, so a simulation writing thousands of games per
+    second makes a few transactions per second.
+    """
+
+    def __init__(self, path: str, batch_size: int = 1000):
+        self.path: str = path
+        self.batch_size: int = batch_size
+        self.queue: queue.Queue = queue.Queue()
+        self.error: Optional[Exception] = None  # error of the database, the games are no more written
+        self.thread: threading.Thread = threading.Thread(target=self.run, name='stats-writer', daemon=True)
+        self.thread.start()
+
+    def record(self, stat: GameStat):
+        self.queue.put(stat)
+
+    def flush(self):
+        # Wait until the games recorded are written
+        self.queue.join()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def run(self):
+        store: Optional[StatsStore] = None
+        try:
+            store = StatsStore(self.path)
+        except (sqlite3.Error, OSError) as e:
+            self.error = e
+        running: bool = True
+        while running:
+            batch: List[Optional[GameStat]] = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            running = None not in batch
+            if store is not None:
+                try:
+                    store.add_games([stat for stat in batch if stat is not None])
+                except sqlite3.Error as e:
+                    # E.g. a full disk: the game goes on without statistics
+                    self.error = e
+                    store.close()
+                    store = None
+            for _ in batch:
+                self.queue.task_done()
+        if store is not None:
+            store.close()
+
+
+def get_stats_path() -> str:
+    # Per user data directory, next to the difficulty indexes
+    if os.name == 'nt':
+        base: str = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return os.path.join(base, 'solitaire-game', 'stats.sqlite3')
+
+
+def format_duration(seconds: float) -> str:
+    return f'{int(seconds) // 60}:{int(seconds) % 60:02d}'
+
+
+def format_summary(summary: StatsSummary) -> List[str]:
+    lines: List[str] = [f'Games played: {summary.games}',
+                        f'Games won: {summary.wins} ({summary.get_win_rate():.1%})',
+                        f'Current streak: {summary.current_streak}',
+                        f'Longest streak: {summary.longest_streak}']
+    if summary.durations:
+        lines.append('Time to win: best {}, median {}, 90% under {}'.format(
+            *(format_duration(summary.durations[percentile]) for percentile in PERCENTILES)))
+    return lines
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog='solitaire-stats', description='Show the statistics of the games.')
+    parser.add_argument('--db', default=None, help='statistics database (default: the one of the user data directory)')
+    parser.add_argument('--player', action='append', default=None,
+                        help=f'player: {PLAYER_HUMAN}, or the policy of a simulation (default: all, repeatable)')
+    parser.add_argument('--json', action='store_true', help='write the statistics as JSON lines')
+    args = parser.parse_args(argv)
+    path: str = args.db or get_stats_path()
+    if not os.path.exists(path):
+        parser.error(f'no statistics in {path}, play a game first')
+    store: StatsStore = StatsStore(path)
+    try:
+        for i, player in enumerate(args.player or store.get_players()):
+            summary: StatsSummary = store.get_summary(player)
+            if args.json:
+                print(json.dumps({**summary._asdict(), 'win_rate': round(summary.get_win_rate(), 4)}))
+                continue
+            print(('\n' if i > 0 else '') + f'[{player}]')
+            for line in format_summary(summary):
+                print(f'  {line}')
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import Dict, List
+import json
+import random
+from solitaire_game.autoplay import RolloutPlayer, determinize, get_visited_hashes, main
+from solitaire_game.game import GameSolitaire, Move
+from solitaire_game.state import pack_game
+
+
+def get_player(seed: int) -> RolloutPlayer:
+    # Fixed number of rollouts in this process: the moves only depend on the seed
+    return RolloutPlayer(move_seconds=None, rollouts=4, workers=1, max_rollout_moves=100, seed=seed)
+
+
+def test_rollouts_are_deterministic():
+    states: List[bytes] = []
+    for _ in range(2):
+        game: GameSolitaire = GameSolitaire(seed=2)
+        get_player(0).play(game, max_moves=40)
+        states.append(pack_game(game))
+    assert states[0] == states[1]
+
+
+def test_autoplay_rollouts_are_deterministic(capsys):
+    lines: List[List[Dict]] = []
+    for _ in range(2):
+        main(['3', '4', '--rollouts', '4', '-w', '1', '--max-moves', '30'])
+        lines.append([json.loads(line) for line in capsys.readouterr().out.splitlines()])
+    for line in lines[0] + lines[1]:
+        del line['time']
+    assert lines[0] == lines[1]
+    assert [line['seed'] for line in lines[0]] == [3, 4]
+
+
+def test_player_does_not_loop():
+    for seed in range(3):
+        game: GameSolitaire = GameSolitaire(seed=seed)
+        player: RolloutPlayer = get_player(seed)
+        won, nb_moves = player.play(game, max_moves=60)
+        # Every move leads to a new position, the running set of the player has the positions of the game
+        visited_hashes = get_visited_hashes(game)
+        assert len(visited_hashes) == nb_moves + 1
+        assert player.visited_hashes <= visited_hashes
+
+
+def test_reset_reads_the_positions_of_the_game():
+    game: GameSolitaire = GameSolitaire(seed=5)
+    rng: random.Random = random.Random(0)
+    for _ in range(20):
+        game.play(rng.choice(game.legal_moves()))
+    player: RolloutPlayer = get_player(0)
+    player.reset(game)
+    assert player.visited_hashes == get_visited_hashes(game)
+    for move in player.get_candidate_moves(game):
+        child: GameSolitaire = game.clone(with_journal=False)
+        child.apply(move)
+        assert child.zobrist_hash not in player.visited_hashes
+    # A new game forgets the positions of the previous one
+    player.reset(GameSolitaire(seed=6))
+    assert player.visited_hashes == {GameSolitaire(seed=6).zobrist_hash}
+
+
+def test_determinize_keeps_the_seen_cards():
+    game: GameSolitaire = GameSolitaire(seed=1)
+    sample: GameSolitaire = determinize(game, random.Random(0))
+    assert sample.final_stacks.count_cards() == game.final_stacks.count_cards()
+    for stack, sample_stack in zip(game.initial_stacks.stacks, sample.initial_stacks.stacks):
+        assert sample_stack.visible_cards == stack.visible_cards
+        assert len(sample_stack.hidden_cards) == len(stack.hidden_cards)
+    # The game itself is left untouched
+    assert pack_game(game) == pack_game(GameSolitaire(seed=1))
+    moves: List[Move] = sample.legal_moves()
+    assert moves == game.legal_moves()
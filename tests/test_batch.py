@@ -0,0 +1,61 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import List, Set
+import random
+import pytest
+from solitaire_game.game import GameSolitaire, Move
+from solitaire_game.state import pack_game
+
+np = pytest.importorskip('numpy')
+from solitaire_game.batch import BatchGames, playouts, NO_ACTION  # noqa: E402
+
+SEEDS: List[int] = list(range(40))
+
+
+@pytest.mark.parametrize('draw_count, max_passes', [(1, None), (3, None), (1, 2), (3, 2)])
+def test_batch_matches_game(draw_count: int, max_passes):
+    # Same random games played by the batch and by GameSolitaire: same legal moves and same positions
+    games: List[GameSolitaire] = [GameSolitaire(seed=seed, draw_count=draw_count, max_passes=max_passes)
+                                  for seed in SEEDS]
+    batch: BatchGames = BatchGames.from_seeds(SEEDS, draw_count, max_passes)
+    rng: random.Random = random.Random(0)
+    for _ in range(300):
+        mask = batch.legal_mask()
+        actions: List[int] = []
+        for k, game in enumerate(games):
+            assert pack_game(batch.get_game(k)) == pack_game(game)
+            legal_moves: List[Move] = game.legal_moves()
+            actions_set: Set[int] = {batch.move_to_action(move) for move in legal_moves}
+            assert set(np.nonzero(mask[k])[0].tolist()) == actions_set
+            if not legal_moves:
+                actions.append(NO_ACTION)
+                continue
+            move: Move = rng.choice(legal_moves)
+            assert batch.action_to_move(k, batch.move_to_action(move)) == move
+            game.apply(move)
+            actions.append(batch.move_to_action(move))
+        batch.apply(np.array(actions))
+
+
+def test_from_games_round_trip():
+    games: List[GameSolitaire] = []
+    for seed in SEEDS:
+        game: GameSolitaire = GameSolitaire(seed=seed)
+        rng: random.Random = random.Random(seed)
+        for _ in range(50):
+            game.apply(rng.choice(game.legal_moves()))
+        games.append(game)
+    batch: BatchGames = BatchGames.from_games(games)
+    for k, game in enumerate(games):
+        assert pack_game(batch.get_game(k)) == pack_game(game)
+
+
+@pytest.mark.parametrize('policy', ['random', 'greedy'])
+def test_playouts_won_games_are_won(policy: str):
+    batch: BatchGames = BatchGames.from_seeds(range(200))
+    won, nb_moves = playouts(batch, policy=policy, rng=np.random.default_rng(0))
+    assert won.shape == (200,) and nb_moves.shape == (200,)
+    for k in np.nonzero(won)[0]:
+        assert batch.get_game(int(k)).is_game_won()
+    if policy == 'greedy':
+        assert won.any()
@@ -0,0 +1,129 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import BinaryIO, List, Set
+import random
+import pytest
+from solitaire_game.difficulty import (DealRating, DifficultyIndex, build_index, open_ratings, pack_rating,
+                                       read_ratings, run_rating, rate_deal, BANDS, RATING_STRUCT)
+from solitaire_game.game import GameSolitaire
+from solitaire_game.solver import STATUS_SOLVED, STATUS_UNKNOWN
+
+
+def write_ratings(path: str, ratings: List[DealRating], draw_count: int = 1, max_passes=None):
+    f, _ = open_ratings(path, draw_count, max_passes, resume=False)
+    with f:
+        for rating in ratings:
+            f.write(pack_rating(rating))
+
+
+def get_ratings(count: int) -> List[DealRating]:
+    # Solved deals of random difficulty, and a few deals the solver gave up on
+    rng: random.Random = random.Random(0)
+    ratings: List[DealRating] = [DealRating(seed, STATUS_SOLVED, rng.randrange(100, 100_000), rng.randrange(80, 400),
+                                            rng.randrange(1, 10)) for seed in range(count)]
+    return ratings + [DealRating(count + i, STATUS_UNKNOWN, 100_000, 0, 0) for i in range(5)]
+
+
+def test_rate_deal():
+    for seed in range(3):
+        rating: DealRating = rate_deal(seed, max_nodes=5000)
+        assert rating.seed == seed and rating.nodes <= 5000
+        if rating.status == STATUS_SOLVED:
+            # The line found is replayed to count its passes through the stock
+            assert rating.moves > 0 and rating.passes >= 1
+        else:
+            assert (rating.moves, rating.passes) == (0, 0)
+    # The ratings of a run do not depend on the number of processes
+    assert list(run_rating(range(3), max_nodes=5000, workers=1)) == [rate_deal(seed, max_nodes=5000)
+                                                                     for seed in range(3)]
+
+
+def test_difficulty_ignores_the_line_length():
+    rating: DealRating = DealRating(0, STATUS_SOLVED, 1000, 100, 2)
+    assert rating.get_difficulty() == rating._replace(moves=300).get_difficulty()
+    assert rating.get_difficulty() < rating._replace(nodes=2000).get_difficulty()
+    assert rating.get_difficulty() < rating._replace(passes=3).get_difficulty()
+
+
+def test_resume_ratings_removes_the_truncated_record(tmp_path):
+    path: str = str(tmp_path / 'ratings.bin')
+    ratings: List[DealRating] = get_ratings(10)
+    write_ratings(path, ratings)
+    with open(path, 'r+b') as f:
+        f.truncate(f.seek(0, 2) - RATING_STRUCT.size // 2)
+    f, done_seeds = open_ratings(path, 1, None, resume=True)
+    with f:
+        f.write(pack_rating(ratings[-1]))
+    assert done_seeds == {rating.seed for rating in ratings[:-1]}
+    assert read_ratings(path) == ((1, None), ratings)
+    with pytest.raises(ValueError, match='another variant'):
+        open_ratings(path, 3, None, resume=True)
+
+
+def test_build_index(tmp_path):
+    ratings: List[DealRating] = get_ratings(90)
+    # The ratings of a variant can be split across files, a seed rated twice is indexed once
+    write_ratings(str(tmp_path / 'ratings-0.bin'), ratings[::2])
+    write_ratings(str(tmp_path / 'ratings-1.bin'), ratings[1::2] + ratings[:3])
+    index_path, count = build_index([str(tmp_path / 'ratings-0.bin'), str(tmp_path / 'ratings-1.bin')],
+                                    str(tmp_path / 'index' / 'draw1.idx'))
+    assert count == 90
+    index: DifficultyIndex = DifficultyIndex(index_path)
+    try:
+        assert (index.draw_count, index.max_passes, index.count) == (1, None, 90)
+        deals: List[DealRating] = [index.get_deal(i) for i in range(index.count)]
+        assert sorted(deals, key=lambda rating: rating.seed) == ratings[:90]
+        difficulties: List[float] = [deal.get_difficulty() for deal in deals]
+        assert difficulties == sorted(difficulties)
+    finally:
+        index.close()
+
+
+def test_build_index_rejects_mixed_variants(tmp_path):
+    write_ratings(str(tmp_path / 'draw1.bin'), get_ratings(3), draw_count=1)
+    write_ratings(str(tmp_path / 'draw3.bin'), get_ratings(3), draw_count=3)
+    with pytest.raises(ValueError, match='same variant'):
+        build_index([str(tmp_path / 'draw1.bin'), str(tmp_path / 'draw3.bin')], str(tmp_path / 'index.idx'))
+
+
+def test_pick_seed_in_band(tmp_path):
+    write_ratings(str(tmp_path / 'ratings.bin'), get_ratings(30), draw_count=3, max_passes=2)
+    index_path, _ = build_index([str(tmp_path / 'ratings.bin')], str(tmp_path / 'index.idx'))
+    index: DifficultyIndex = DifficultyIndex(index_path)
+    try:
+        assert (index.draw_count, index.max_passes) == (3, 2)
+        rng: random.Random = random.Random(1)
+        bands: List[Set[int]] = []
+        for band in BANDS:
+            i_start, i_end = index.get_band_range(band)
+            seeds: Set[int] = {index.get_deal(i).seed for i in range(i_start, i_end)}
+            assert len(seeds) == 10
+            assert all(index.pick_seed(band, rng) in seeds for _ in range(50))
+            bands.append(seeds)
+        # The bands split the index
+        assert set.union(*bands) == set(range(30))
+        # The picked seed deals a game of the variant of the index
+        game: GameSolitaire = GameSolitaire(seed=index.pick_seed('hard', rng), draw_count=index.draw_count,
+                                            max_passes=index.max_passes)
+        assert game.deck.draw_count == 3
+    finally:
+        index.close()
+
+
+def test_pick_seed_from_an_empty_band(tmp_path):
+    write_ratings(str(tmp_path / 'ratings.bin'), get_ratings(2))
+    index_path, _ = build_index([str(tmp_path / 'ratings.bin')], str(tmp_path / 'index.idx'))
+    index: DifficultyIndex = DifficultyIndex(index_path)
+    try:
+        with pytest.raises(ValueError, match='No deal in the band easy'):
+            index.pick_seed('easy')
+    finally:
+        index.close()
+
+
+def test_invalid_index(tmp_path):
+    path: str = str(tmp_path / 'index.idx')
+    with open(path, 'wb') as f:
+        f.write(b'SOLR' + bytes(20))
+    with pytest.raises(ValueError, match='Invalid file'):
+        DifficultyIndex(path)
@@ -0,0 +1,334 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import List, Optional
+import random
+import pytest
+from solitaire_game.game import (GameSolitaire, GameCards, Card, Deck, Move, MoveRules, InitialStack, InitialStacks,
+                                 FinalStack, FinalStacks, MOVE_INITIAL_TO_FINAL, MOVE_DECK_TO_FINAL, SWITCH_DECK_MOVE)
+from solitaire_game.solver import Solver
+from solitaire_game.state import pack_game, unpack_game
+
+
+def play_random_moves(game: GameSolitaire, seed: int, nb_moves: int) -> List[Move]:
+    rng: random.Random = random.Random(seed)
+    moves: List[Move] = []
+    for _ in range(nb_moves):
+        legal_moves: List[Move] = game.legal_moves()
+        if not legal_moves:
+            break
+        move: Move = rng.choice(legal_moves)
+        game.apply(move)
+        moves.append(move)
+    return moves
+
+
+@pytest.mark.parametrize('seed', range(10))
+@pytest.mark.parametrize('draw_count, max_passes', [(1, None), (3, None), (3, 2)])
+def test_undo_redo_restore_positions(seed: int, draw_count: int, max_passes):
+    game: GameSolitaire = GameSolitaire(seed=seed, draw_count=draw_count, max_passes=max_passes)
+    states: List[bytes] = [pack_game(game)]
+    rng: random.Random = random.Random(seed)
+    for _ in range(200):
+        legal_moves: List[Move] = game.legal_moves()
+        if not legal_moves:
+            break
+        game.apply(rng.choice(legal_moves))
+        states.append(pack_game(game))
+    for state in reversed(states[:-1]):
+        assert game.undo() is not None
+        assert pack_game(game) == state
+    assert game.undo() is None
+    for state in states[1:]:
+        assert game.redo() is not None
+        assert pack_game(game) == state
+    assert game.redo() is None
+
+
+def test_move_clears_redo_journal():
+    game: GameSolitaire = GameSolitaire(seed=0)
+    play_random_moves(game, 0, 10)
+    game.undo()
+    assert game.can_redo()
+    game.apply(game.legal_moves()[0])
+    assert not game.can_redo()
+
+
+def test_play_rejects_illegal_moves():
+    game: GameSolitaire = GameSolitaire(seed=0)
+    legal_moves: List[Move] = game.legal_moves()
+    state: bytes = pack_game(game)
+    for i_src in range(7):
+        for i_dest in range(4):
+            move: Move = Move(MOVE_INITIAL_TO_FINAL, i_src, i_dest, 1)
+            assert game.play(move) == (move in legal_moves)
+            if move in legal_moves:
+                game.undo()
+    assert pack_game(game) == state
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_legal_moves_are_legal(seed: int):
+    game: GameSolitaire = GameSolitaire(seed=seed)
+    rng: random.Random = random.Random(seed)
+    for _ in range(100):
+        legal_moves: List[Move] = game.legal_moves()
+        if not legal_moves:
+            break
+        assert all(game.is_legal(move) for move in legal_moves)
+        game.apply(rng.choice(legal_moves))
+
+
+@pytest.mark.parametrize('seed', range(10))
+@pytest.mark.parametrize('draw_count, max_passes', [(1, None), (3, None), (3, 2)])
+def test_incremental_hashes_match_recomputed(seed: int, draw_count: int, max_passes):
+    # The hashes updated by each move and undo are the ones of the same position built from scratch
+    game: GameSolitaire = GameSolitaire(seed=seed, draw_count=draw_count, max_passes=max_passes)
+    play_random_moves(game, seed, 150)
+    while True:
+        position: GameSolitaire = unpack_game(pack_game(game))
+        assert (game.zobrist_hash, game.canonical_hash) == (position.zobrist_hash, position.canonical_hash)
+        if game.undo() is None:
+            break
+
+
+def test_canonical_hash_ignores_the_order_of_the_final_stacks():
+    game: GameSolitaire = GameSolitaire(seed=0)
+    play_random_moves(game, 0, 300)
+    final_stacks = game.final_stacks.stacks
+    i_stack: int = next(i for i, stack in enumerate(final_stacks) if stack.cards)
+    j_stack: int = (i_stack + 1) % len(final_stacks)
+    swapped: GameSolitaire = unpack_game(pack_game(game))
+    cards = [stack.cards for stack in swapped.final_stacks.stacks]
+    swapped.final_stacks.stacks[i_stack].cards = list(cards[j_stack])
+    swapped.final_stacks.stacks[j_stack].cards = list(cards[i_stack])
+    swapped.init_hashes()
+    assert swapped.canonical_hash == game.canonical_hash
+    assert swapped.zobrist_hash != game.zobrist_hash
+
+
+def can_put_on_initial_stack(bottom_card, card: Card, max_value: int) -> bool:
+    # Rules written with the attributes of the cards, as before the lookup tables
+    if bottom_card is None:
+        return card.value == max_value
+    return bottom_card.color != card.color and bottom_card.value == card.value + 1
+
+
+def can_put_on_final_stack(top_card, card: Card, min_value: int) -> bool:
+    if top_card is None:
+        return card.value == min_value
+    return top_card.symbol == card.symbol and top_card.value + 1 == card.value
+
+
+@pytest.mark.parametrize('min_value, max_value', [(1, 13), (1, 7), (3, 9)])
+def test_rule_tables_match_the_card_rules(min_value: int, max_value: int):
+    rules: MoveRules = GameCards(min_value, max_value).rules
+    assert rules is MoveRules.get_rules(min_value, max_value)
+    cards: List[Card] = [card for card in GameCards.CARDS if min_value <= card.value <= max_value]
+    for card in cards:
+        initial_stack: InitialStack = InitialStack([], [], rules=rules)
+        final_stack: FinalStack = FinalStack(rules)
+        assert initial_stack.can_put_cards([card]) == can_put_on_initial_stack(None, card, max_value)
+        assert final_stack.can_put_card(card) == can_put_on_final_stack(None, card, min_value)
+        for other_card in cards:
+            initial_stack = InitialStack([], [other_card], rules=rules)
+            final_stack.cards = [other_card]
+            assert initial_stack.can_put_cards([card]) == can_put_on_initial_stack(other_card, card, max_value)
+            assert final_stack.can_put_card(card) == can_put_on_final_stack(other_card, card, min_value)
+    # The cards out of the range of the deck are never accepted
+    for card in GameCards.CARDS:
+        if card not in cards:
+            assert not any(row[card.id] for row in rules.initial + rules.final)
+
+
+def test_deck_draw_three():
+    cards: List[Card] = GameCards.CARDS[:7]
+    deck: Deck = Deck.from_cards(list(cards), [], draw_count=3)
+    deck.switch_cards()
+    assert deck.get_visible_cards() == cards[:3] and deck.get_pickable_card() == cards[2]
+    # Picking the cards of the draw shows the previous ones, then the top card of the waste
+    deck.pick_card()
+    assert deck.get_visible_cards() == cards[:2]
+    deck.switch_cards()
+    assert deck.get_visible_cards() == cards[3:6]
+    for _ in range(3):
+        deck.pick_card()
+    assert deck.get_visible_cards() == cards[1:2]
+    # The last draw takes the cards left in the stock
+    deck.switch_cards()
+    assert deck.get_visible_cards() == cards[6:] and deck.count_stock_cards() == 0
+    # The waste turned over is the new stock, in the order of the draws
+    deck.switch_cards()
+    assert deck.get_stock_cards() == [cards[0], cards[1], cards[6]] and deck.nb_recycles == 1
+    assert not deck.get_visible_cards()
+
+
+@pytest.mark.parametrize('max_passes', [1, 2, 3])
+def test_deck_max_passes(max_passes: int):
+    deck: Deck = Deck.from_cards(list(GameCards.CARDS[:4]), [], draw_count=1, max_passes=max_passes)
+    nb_switches: int = 0
+    while deck.can_switch_cards():
+        deck.switch_cards()
+        nb_switches += 1
+    # 4 draws per pass, and a turn over between two passes
+    assert nb_switches == 4 * max_passes + max_passes - 1
+    assert deck.nb_recycles == max_passes - 1 and deck.count_stock_cards() == 0 and deck.count_cards() == 4
+    unlimited: Deck = Deck.from_cards(list(GameCards.CARDS[:4]), [], draw_count=1)
+    for _ in range(100):
+        unlimited.switch_cards()
+    assert unlimited.can_switch_cards()
+
+
+def test_deck_undo_restores_draws_and_recycles():
+    cards: List[Card] = GameCards.CARDS[:5]
+    deck: Deck = Deck.from_cards(list(cards), [], draw_count=3)
+    states: List = []
+    undo_infos: List = []
+    for _ in range(6):
+        states.append((deck.get_stock_cards(), list(deck.waste), deck.nb_visible, deck.nb_recycles, deck.zobrist))
+        undo_infos.append(deck.switch_cards())
+    for state, undo_info in zip(reversed(states), reversed(undo_infos)):
+        deck.unswitch_cards(undo_info)
+        assert (deck.get_stock_cards(), deck.waste, deck.nb_visible, deck.nb_recycles, deck.zobrist) == state
+
+
+@pytest.mark.parametrize('draw_count, max_passes', [(0, None), (25, None), (1, 0), (3, 256)])
+def test_deck_rejects_invalid_options(draw_count: int, max_passes):
+    with pytest.raises(ValueError, match='Invalid draw count or max passes'):
+        GameSolitaire(seed=0, draw_count=draw_count, max_passes=max_passes)
+
+
+def test_game_stock_runs_out_with_one_pass():
+    game: GameSolitaire = GameSolitaire(seed=0, draw_count=3, max_passes=1)
+    for _ in range(Deck.NB_CARDS // 3):
+        assert game.play(SWITCH_DECK_MOVE)
+    assert game.deck.count_stock_cards() == 0
+    assert not game.is_legal(SWITCH_DECK_MOVE) and SWITCH_DECK_MOVE not in game.legal_moves()
+    assert not game.play(SWITCH_DECK_MOVE)
+
+
+def get_small_game(stock: List[str], waste: List[str], stacks: List[List[str]],
+                   hidden: Optional[List[str]] = None) -> GameSolitaire:
+    # Game of the aces and twos, the cards are named by their repr (e.g. 'A♠'), hidden cards go on the first stack
+    cards = {repr(card): card for card in GameCards.CARDS if card.value <= 2}
+    rules: MoveRules = MoveRules.get_rules(1, 2)
+    initial_stacks: List[InitialStack] = [InitialStack([], [cards[name] for name in names], rules=rules)
+                                          for names in stacks + [[]] * (InitialStacks.NB_STACKS - len(stacks))]
+    initial_stacks[0].hidden_cards = [cards[name] for name in hidden or []]
+    initial_stacks[0].zobrist = initial_stacks[0].compute_zobrist()
+    deck: Deck = Deck.from_cards([cards[name] for name in stock], [cards[name] for name in waste])
+    return GameSolitaire.from_stacks(deck, InitialStacks.from_stacks(initial_stacks), FinalStacks(rules), 8)
+
+
+def test_auto_complete_moves():
+    stacks: List[List[str]] = [['2♥'], ['A♥'], ['2♠', 'A♠'], ['2♣'], ['A♣']]
+    game: GameSolitaire = get_small_game([], ['2♦', 'A♦'], stacks)
+    moves = game.get_auto_complete_moves()
+    assert moves == [Move(MOVE_DECK_TO_FINAL, 0, 0, 1), Move(MOVE_DECK_TO_FINAL, 0, 0, 1),
+                     Move(MOVE_INITIAL_TO_FINAL, 1, 1, 1), Move(MOVE_INITIAL_TO_FINAL, 0, 1, 1),
+                     Move(MOVE_INITIAL_TO_FINAL, 2, 2, 1), Move(MOVE_INITIAL_TO_FINAL, 2, 2, 1),
+                     Move(MOVE_INITIAL_TO_FINAL, 4, 3, 1), Move(MOVE_INITIAL_TO_FINAL, 3, 3, 1)]
+    for move in moves:
+        assert game.play(move)
+    assert game.is_game_won() and game.get_auto_complete_moves() == []
+
+
+def test_auto_complete_needs_a_decided_game():
+    stacks: List[List[str]] = [['2♥'], ['A♥'], ['2♠'], ['2♣'], ['A♣']]
+    # A card left in the stock, a hidden card, a card blocking another of its symbol
+    assert get_small_game(['A♦'], ['2♦'], stacks + [['A♠']]).get_auto_complete_moves() is None
+    assert get_small_game([], ['2♦', 'A♦'], stacks, hidden=['A♠']).get_auto_complete_moves() is None
+    assert get_small_game([], ['2♦', 'A♦'], stacks + [['A♠', '2♠']]).get_auto_complete_moves() is None
+    assert get_small_game([], ['2♦', 'A♦'], stacks + [['A♠']]).get_auto_complete_moves() is not None
+
+
+def test_auto_complete_finishes_a_solved_game():
+    game: GameSolitaire = GameSolitaire(seed=0)
+    moves: List[Move] = Solver(game, max_nodes=5000).solve().moves
+    assert moves
+    for i_move, move in enumerate(moves):
+        auto_moves = game.get_auto_complete_moves()
+        if auto_moves is not None:
+            break
+        game.apply(move)
+    assert i_move < len(moves) - 1 and not game.is_game_won()
+    for move in auto_moves:
+        assert game.play(move)
+    assert game.is_game_won()
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_final_stacks_card_counter(seed: int):
+    game: GameSolitaire = GameSolitaire(seed=seed, draw_count=1)
+    rng: random.Random = random.Random(seed)
+    for _ in range(300):
+        if rng.random() < 0.2 and game.can_undo():
+            game.undo()
+        else:
+            moves: List[Move] = game.legal_moves()
+            if not moves:
+                break
+            # Moves to the final stacks first, so that many cards reach them
+            final_moves: List[Move] = [move for move in moves if move.kind in (MOVE_DECK_TO_FINAL,
+                                                                               MOVE_INITIAL_TO_FINAL)]
+            game.apply(rng.choice(final_moves or moves))
+        assert game.final_stacks.count_cards() == sum(len(stack.cards) for stack in game.final_stacks.stacks)
+
+
+class ForkedGame:
+    # A game and a reference game holding its own copy of the position, both given the same moves and undos
+
+    def __init__(self, game: GameSolitaire):
+        self.game: GameSolitaire = game
+        self.reference: GameSolitaire = unpack_game(pack_game(game))
+        self.nb_moves: int = 0  # moves played since the fork, the reference can only undo those
+
+    def step(self, rng: random.Random):
+        if self.nb_moves and rng.random() < 0.25:
+            assert self.game.undo() == self.reference.undo()
+            self.nb_moves -= 1
+            return
+        moves: List[Move] = self.game.legal_moves()
+        assert moves == self.reference.legal_moves()
+        if moves:
+            move: Move = rng.choice(moves)
+            self.game.apply(move)
+            self.reference.apply(move)
+            self.nb_moves += 1
+
+    def check(self):
+        assert pack_game(self.game) == pack_game(self.reference)
+        assert (self.game.zobrist_hash, self.game.canonical_hash) == (self.reference.zobrist_hash,
+                                                                      self.reference.canonical_hash)
+        assert self.game.final_stacks.count_cards() == self.reference.final_stacks.count_cards()
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_clones_are_isolated(seed: int):
+    # The games forked from a position share their stacks: the moves and undos of one game never change the others
+    rng: random.Random = random.Random(seed)
+    game: GameSolitaire = GameSolitaire(seed=seed, draw_count=rng.choice([1, 3]), max_passes=rng.choice([None, 2]))
+    play_random_moves(game, seed, rng.randrange(0, 60))
+    games: List[ForkedGame] = [ForkedGame(game)]
+    for _ in range(200):
+        if len(games) < 6 and rng.random() < 0.05:
+            parent: ForkedGame = rng.choice(games)
+            games.append(ForkedGame(parent.game.clone(with_journal=rng.random() < 0.5)))
+        rng.choice(games).step(rng)
+        for forked_game in games:
+            forked_game.check()
+
+
+def test_clone_journal():
+    game: GameSolitaire = GameSolitaire(seed=3)
+    moves: List[Move] = play_random_moves(game, 3, 20)
+    game.undo()
+    clone: GameSolitaire = game.clone()
+    assert clone.redo() == moves[-1] and clone.can_undo()
+    # Without journal, the position is the same but the clone can not go back
+    position: GameSolitaire = game.clone(with_journal=False)
+    assert pack_game(position) == pack_game(game) and not position.can_undo() and not position.can_redo()
+    # The clone with the journal undoes back to the deal, the game has not moved
+    while clone.undo():
+        pass
+    assert pack_game(clone) == pack_game(GameSolitaire(seed=3))
+    assert pack_game(game) != pack_game(clone) and game.can_redo()
@@ -0,0 +1,65 @@
+# Author: 4sushi
+from __future__ import annotations
+import curses
+import pytest
+from solitaire_game.game import GameSolitaire
+from solitaire_game.headless import HeadlessGameUI, MemoryScreen
+from solitaire_game.solver import Solver
+
+ERROR_MESSAGE: str = 'Screen is too small, enlarge the window to play.'
+
+
+@pytest.mark.parametrize('height, width', [(1, 1), (1, 10), (3, 20), (8, 100), (30, 40)])
+def test_small_screen_shows_an_error(height: int, width: int):
+    # The message is cut to the width of the screen, a screen of one column stays blank
+    ui: HeadlessGameUI = HeadlessGameUI(height, width, game=GameSolitaire(seed=0))
+    ui.press(curses.KEY_RIGHT, curses.KEY_RESIZE)
+    assert ERROR_MESSAGE[:width - 1] in ui.stdscr.get_text()
+
+
+def test_stack_higher_than_its_window():
+    # A screen high enough for the windows, but not for the 7 cards of the last initial stack
+    ui: HeadlessGameUI = HeadlessGameUI(15, 100, game=GameSolitaire(seed=0))
+    ui.press(curses.KEY_RIGHT)
+    assert ui.layout.fits and not ui.stacks_fit()
+    assert ERROR_MESSAGE in ui.stdscr.get_text()
+    # Enlarged, the game is drawn again
+    ui.stdscr = MemoryScreen(30, 100)
+    ui.press(curses.KEY_RESIZE)
+    assert ERROR_MESSAGE not in ui.stdscr.get_text() and ui.stacks_fit()
+
+
+def get_decided_game() -> GameSolitaire:
+    # Game of the seed 0 played with the line of the solver until it is decided
+    game: GameSolitaire = GameSolitaire(seed=0)
+    for move in Solver(game, max_nodes=5000).solve().moves:
+        if game.get_auto_complete_moves() is not None:
+            break
+        game.apply(move)
+    return game
+
+
+def test_auto_complete_key():
+    ui: HeadlessGameUI = HeadlessGameUI(game=get_decided_game())
+    ui.press(curses.KEY_RIGHT)
+    assert 'press [a] to auto-complete' in ui.stdscr.get_text()
+    ui.press(ui.KEY_AUTO_COMPLETE)
+    assert ui.game.is_game_won() and 'Victory!' in ui.stdscr.get_text()
+
+
+def test_auto_complete_is_animated():
+    game: GameSolitaire = get_decided_game()
+    nb_moves: int = len(game.get_auto_complete_moves())
+    ui: HeadlessGameUI = HeadlessGameUI(game=game, animate=True)
+    # A move is played per frame, the frames are drawn without waiting for a key
+    ui.press(ui.KEY_AUTO_COMPLETE)
+    assert len(ui.auto_moves) == nb_moves - 1 and ui.get_wait_time() == ui.ANIMATION_TIME
+    while ui.auto_moves:
+        ui.press(curses.KEY_RESIZE)
+    assert ui.game.is_game_won()
+
+
+def test_auto_complete_is_stopped_by_a_key():
+    ui: HeadlessGameUI = HeadlessGameUI(game=get_decided_game(), animate=True)
+    ui.press(ui.KEY_AUTO_COMPLETE, curses.KEY_RIGHT)
+    assert not ui.auto_moves and not ui.game.is_game_won() and ui.get_wait_time() == -1
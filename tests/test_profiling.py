@@ -0,0 +1,45 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import List
+import pytest
+from solitaire_game.profiling import FrameStats, WAIT_PHASE
+
+
+@pytest.fixture
+def clock(monkeypatch) -> List[float]:
+    clock: List[float] = [0.0]
+    monkeypatch.setattr('solitaire_game.profiling.time.perf_counter', lambda: clock[0])
+    return clock
+
+
+def test_nested_phases_are_excluded_from_their_parent(clock: List[float]):
+    stats: FrameStats = FrameStats()
+    stats.start_frame()
+    stats.begin('controller')
+    clock[0] += 1
+    stats.begin('refresh')
+    clock[0] += 2
+    stats.begin('flush')
+    clock[0] += 4
+    stats.end()
+    stats.end()
+    stats.end()
+    stats.end_frame()
+    assert (stats.frames['controller'], stats.frames['refresh'], stats.frames['flush']) == ([1], [2], [4])
+    assert stats.frames['total'] == [7] and stats.frames['draw_deck'] == [0]
+
+
+def test_wait_is_not_part_of_the_frame(clock: List[float]):
+    # A popup waiting for a key does not make the frame slow
+    stats: FrameStats = FrameStats()
+    for _ in range(2):
+        stats.start_frame()
+        stats.begin('controller')
+        clock[0] += 1
+        stats.begin(WAIT_PHASE)
+        clock[0] += 30
+        stats.end()
+        stats.end()
+        stats.end_frame()
+    assert stats.frames['controller'] == [1, 1] and stats.frames['total'] == [1, 1]
+    assert WAIT_PHASE not in stats.frames
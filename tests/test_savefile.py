@@ -0,0 +1,175 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import List
+import io
+import random
+import pytest
+from solitaire_game.game import GameSolitaire, Move, MOVE_FINAL_TO_INITIAL, MOVE_INITIAL_TO_INITIAL
+from solitaire_game.savefile import GameRecord, AutosaveJournal, MOVE_CODES, NB_MOVE_CODES, encode_move, \
+    decode_move, encode_game, decode_game, write_records, read_records, iter_records
+from solitaire_game.state import pack_game, unpack_game
+
+
+def play_random_game(seed: int, nb_moves: int = 200, draw_count: int = 3, max_passes=None) -> GameSolitaire:
+    game: GameSolitaire = GameSolitaire(seed=seed, draw_count=draw_count, max_passes=max_passes)
+    rng: random.Random = random.Random(seed)
+    for _ in range(nb_moves):
+        moves: List[Move] = game.legal_moves()
+        if not moves:
+            break
+        game.apply(rng.choice(moves))
+    return game
+
+
+def test_move_codes_round_trip():
+    for code, move in enumerate(MOVE_CODES):
+        assert decode_move(code) == move and encode_move(move) == code
+        if move.kind == MOVE_INITIAL_TO_INITIAL:
+            for quantity in range(2, 14):
+                assert decode_move(encode_move(move._replace(quantity=quantity))) == move._replace(quantity=quantity)
+    # A move of a single card takes one byte in the log
+    assert NB_MOVE_CODES <= 128
+
+
+@pytest.mark.parametrize('seed', range(10))
+@pytest.mark.parametrize('draw_count, max_passes', [(1, None), (3, None), (3, 2)])
+def test_seeded_record_round_trip(seed: int, draw_count: int, max_passes):
+    game: GameSolitaire = play_random_game(seed, draw_count=draw_count, max_passes=max_passes)
+    data: bytes = encode_game(game)
+    restored: GameSolitaire = decode_game(data)
+    assert pack_game(restored) == pack_game(game)
+    assert [move for move, _ in restored.journal] == [move for move, _ in game.journal]
+
+
+def test_unseeded_record_round_trip():
+    # A game without seed stores its packed initial position
+    game: GameSolitaire = unpack_game(pack_game(play_random_game(0, 20)))
+    assert game.seed is None or game.seed < 0
+    initial_state: bytes = pack_game(game)
+    rng: random.Random = random.Random(1)
+    for _ in range(100):
+        game.apply(rng.choice(game.legal_moves()))
+    record: GameRecord = GameRecord.decode(GameRecord.from_game(game).encode())[0]
+    assert record.seed is None and record.state == initial_state
+    assert pack_game(record.to_game()) == pack_game(game)
+
+
+def test_records_file_ignores_truncated_record():
+    games: List[GameSolitaire] = [play_random_game(seed) for seed in range(5)]
+    f: io.BytesIO = io.BytesIO()
+    write_records(f, [GameRecord.from_game(game) for game in games])
+    data: bytes = f.getvalue()
+    assert [record.seed for record in read_records(io.BytesIO(data))] == list(range(5))
+    # An interrupted write: the last record is cut, the index after the last complete record is the end of the 4th
+    truncated: bytes = data[:-3]
+    ends: List[int] = [end for _, end in iter_records(truncated)]
+    assert len(ends) == 4
+    assert [record.seed for record, _ in iter_records(data[:ends[-1]])] == list(range(4))
+
+
+def test_record_to_game_rejects_illegal_moves():
+    # The final stacks are empty at the start of a game
+    record: GameRecord = GameRecord(0, None, 3, None, [Move(MOVE_FINAL_TO_INITIAL, 0, 0, 1)])
+    with pytest.raises(ValueError):
+        record.to_game()
+
+
+def test_autosave_restores_moves_and_undos(tmp_path):
+    path: str = str(tmp_path / 'autosave.bin')
+    journal: AutosaveJournal = AutosaveJournal(path)
+    game: GameSolitaire = GameSolitaire(seed=3)
+    journal.start(game)
+    rng: random.Random = random.Random(3)
+    for i in range(60):
+        move: Move = rng.choice(game.legal_moves())
+        game.apply(move)
+        journal.append_move(move)
+        if i % 10 == 9:
+            game.undo()
+            journal.append_undo()
+        if i % 20 == 19:
+            game.redo()
+            journal.append_redo()
+    journal.close()
+    restored: GameSolitaire = AutosaveJournal(path).load()
+    assert pack_game(restored) == pack_game(game)
+    assert [move for move, _ in restored.journal] == [move for move, _ in game.journal]
+    loader: AutosaveJournal = AutosaveJournal(path)
+    loader.load()
+    assert loader.nb_undos == 6
+
+
+def test_autosave_stops_at_truncated_action(tmp_path):
+    path: str = str(tmp_path / 'autosave.bin')
+    journal: AutosaveJournal = AutosaveJournal(path)
+    game: GameSolitaire = play_random_game(4, 30)
+    journal.start(game)
+    journal.close()
+    with open(path, 'ab') as f:
+        f.write(b'\xff')  # first byte of a varint, the rest was not written
+    assert pack_game(AutosaveJournal(path).load()) == pack_game(game)
+    assert AutosaveJournal(str(tmp_path / 'missing.bin')).load() is None
+
+
+def test_autosave_resume_keeps_the_undos_and_redos(tmp_path):
+    path: str = str(tmp_path / 'autosave.bin')
+    game: GameSolitaire = GameSolitaire(seed=5)
+    AutosaveJournal(path).start(game)
+    rng: random.Random = random.Random(5)
+    nb_undos: int = 0
+    # Each launch restores the game, plays a few moves and leaves undone moves to redo
+    for _ in range(3):
+        journal: AutosaveJournal = AutosaveJournal(path)
+        restored: GameSolitaire = journal.load()
+        assert pack_game(restored) == pack_game(game) and journal.nb_undos == nb_undos
+        assert restored.redo_journal == game.redo_journal
+        journal.resume()
+        for _ in range(10):
+            move: Move = rng.choice(game.legal_moves())
+            game.apply(move)
+            journal.append_move(move)
+        for _ in range(2):
+            game.undo()
+            journal.append_undo()
+            nb_undos += 1
+        journal.close()
+    assert [move for move, _ in AutosaveJournal(path).load().journal] == [move for move, _ in game.journal]
+
+
+def test_autosave_resume_removes_a_truncated_action(tmp_path):
+    path: str = str(tmp_path / 'autosave.bin')
+    game: GameSolitaire = play_random_game(6, 30)
+    AutosaveJournal(path).start(game)
+    with open(path, 'ab') as f:
+        f.write(b'\xff')
+    journal: AutosaveJournal = AutosaveJournal(path)
+    journal.load()
+    journal.resume()
+    move: Move = game.legal_moves()[0]
+    game.apply(move)
+    journal.append_move(move)
+    journal.close()
+    assert pack_game(AutosaveJournal(path).load()) == pack_game(game)
+
+
+def test_autosave_restores_the_time_played(tmp_path, monkeypatch):
+    clock: List[float] = [100.0]
+    monkeypatch.setattr('solitaire_game.savefile.time.monotonic', lambda: clock[0])
+    path: str = str(tmp_path / 'autosave.bin')
+    game: GameSolitaire = GameSolitaire(seed=7)
+    journal: AutosaveJournal = AutosaveJournal(path)
+    journal.start(game)
+    clock[0] = 105.5
+    journal.append_move(game.legal_moves()[0])
+    clock[0] = 107.2
+    journal.close()
+    journal.load()
+    assert journal.elapsed == 7
+    # The time between two launches is not played
+    clock[0] = 1000.0
+    journal.resume()
+    clock[0] = 1010.0
+    journal.append_undo()
+    journal.close()
+    journal.load()
+    assert journal.elapsed == 17
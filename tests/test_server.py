@@ -0,0 +1,131 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+import pytest
+from solitaire_game.game import GameSolitaire, Move, MOVE_FINAL_TO_INITIAL, SWITCH_DECK_MOVE
+from solitaire_game.server import GameServer, LocalClient, get_state
+
+
+def run(test: Callable[[GameServer, LocalClient], Awaitable[None]], **kwargs):
+    # Run a test coroutine with a server and its in-process client, the server is closed at the end
+    async def main():
+        server: GameServer = GameServer(**kwargs)
+        try:
+            await test(server, LocalClient(server))
+        finally:
+            await server.close()
+    asyncio.run(main())
+
+
+def test_deal():
+    async def test(server: GameServer, client: LocalClient):
+        session_id, seed = await client.deal(seed=42, draw_count=1, max_passes=3)
+        assert seed == 42
+        state: Dict = await client.state(session_id)
+        assert state == get_state(GameSolitaire(seed=42, draw_count=1, max_passes=3))
+        # Without seed, the server draws one
+        other_id, other_seed = await client.deal()
+        assert other_id != session_id and (await client.state(other_id))['seed'] == other_seed
+    run(test)
+
+
+def test_deal_invalid_options():
+    async def test(server: GameServer, client: LocalClient):
+        assert await server.execute('deal draw=2') == 'error invalid deal options'
+        assert await server.execute('deal seed=-1') == 'error invalid deal options'
+        assert await server.execute('deal max_passes=0') == 'error invalid deal options'
+        assert await server.execute('deal seed=abc') == 'error invalid arguments for deal'
+        assert await server.execute('deal seed') == 'error invalid arguments for deal'
+        assert not server.sessions
+    run(test)
+
+
+def test_moves_match_the_game():
+    async def test(server: GameServer, client: LocalClient):
+        session_id, _ = await client.deal(seed=7)
+        game: GameSolitaire = GameSolitaire(seed=7)
+        for _ in range(30):
+            move: Move = game.legal_moves()[-1]
+            await client.move(session_id, move)
+            game.play(move)
+        if game.is_legal(SWITCH_DECK_MOVE):
+            await client.switch(session_id)
+            game.play(SWITCH_DECK_MOVE)
+        assert await client.state(session_id) == get_state(game)
+    run(test)
+
+
+def test_illegal_and_malformed_moves():
+    async def test(server: GameServer, client: LocalClient):
+        session_id, _ = await client.deal(seed=3)
+        state: Dict = await client.state(session_id)
+        # The final stacks are empty at the start of a game
+        with pytest.raises(ValueError, match='illegal move'):
+            await client.move(session_id, Move(MOVE_FINAL_TO_INITIAL, 0, 0, 1))
+        assert await server.execute(f'move {session_id} 1 5') == 'error invalid move'
+        assert await server.execute(f'move {session_id} 4 0 1 2 3') == 'error invalid move'
+        assert await server.execute(f'move {session_id} 9 0 1') == 'error invalid move'
+        assert await server.execute(f'move {session_id} 4 -1 1') == 'error invalid move'
+        assert await server.execute(f'move {session_id} 1 0 0 2') == 'error invalid move'
+        assert await server.execute(f'move {session_id} a b c') == 'error invalid arguments for move'
+        assert await server.execute('move') == 'error invalid arguments for move'
+        # The quantity is optional
+        assert await server.execute(f'move {session_id} 0 0 0') == 'ok'
+        await client.undo(session_id)
+        assert await client.state(session_id) == state
+    run(test)
+
+
+def test_undo_redo():
+    async def test(server: GameServer, client: LocalClient):
+        session_id, _ = await client.deal(seed=11)
+        with pytest.raises(ValueError, match='nothing to undo'):
+            await client.undo(session_id)
+        initial_state: Dict = await client.state(session_id)
+        await client.switch(session_id)
+        state: Dict = await client.state(session_id)
+        await client.undo(session_id)
+        assert await client.state(session_id) == initial_state
+        await client.redo(session_id)
+        assert await client.state(session_id) == state
+        with pytest.raises(ValueError, match='nothing to redo'):
+            await client.redo(session_id)
+    run(test)
+
+
+def test_hint():
+    async def test(server: GameServer, client: LocalClient):
+        session_id, _ = await client.deal(seed=5)
+        move: Optional[Move] = await client.hint(session_id)
+        state: Dict = await client.state(session_id)
+        if move is not None:
+            assert list(move) in state['legal_moves']
+            await client.move(session_id, move)
+    run(test, hint_seconds=0.5, hint_workers=1)
+
+
+def test_sessions_and_commands():
+    async def test(server: GameServer, client: LocalClient):
+        session_id, _ = await client.deal(seed=1)
+        assert await server.execute('') == 'error empty command'
+        assert await server.execute('shuffle 1') == 'error unknown command shuffle'
+        assert await server.execute('state 999') == 'error unknown session 999'
+        assert await server.execute('state') == 'error invalid arguments for state'
+        await client.close_session(session_id)
+        assert await server.execute(f'state {session_id}') == f'error unknown session {session_id}'
+        # The game of the closed session is reused by the next deal
+        assert len(server.pool.games) == server.pool.size
+        await client.deal(seed=2)
+        assert len(server.pool.games) == server.pool.size - 1
+    run(test, pool_size=4)
+
+
+def test_idle_sessions_are_evicted():
+    async def test(server: GameServer, client: LocalClient):
+        session_id, _ = await client.deal(seed=1)
+        assert server.evict_idle_sessions() == 0
+        server.idle_timeout = 0
+        assert server.evict_idle_sessions() == 1
+        assert await server.execute(f'state {session_id}') == f'error unknown session {session_id}'
+    run(test)
@@ -0,0 +1,51 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import List
+import csv
+import json
+import pytest
+from solitaire_game.simulation import main, read_done_seeds
+
+
+def simulate(output: str, output_format: str, count: int, resume: bool = False):
+    main(['-n', str(count), '-w', '1', '-p', 'random', '--max-moves', '50', '-f', output_format, '-o', output] +
+         (['--resume'] if resume else []))
+
+
+def read_seeds(output: str, output_format: str) -> List[int]:
+    with open(output, newline='') as f:
+        if output_format == 'csv':
+            return [int(row['seed']) for row in csv.DictReader(f)]
+        return [json.loads(line)['seed'] for line in f]
+
+
+@pytest.mark.parametrize('output_format', ['jsonl', 'csv'])
+@pytest.mark.parametrize('cut', [1, 2, 10])
+def test_resume_replaces_the_truncated_last_result(tmp_path, output_format: str, cut: int):
+    output: str = str(tmp_path / f'results.{output_format}')
+    simulate(output, output_format, 6)
+    with open(output, 'rb') as f:
+        data: bytes = f.read()
+    # An interrupted run: the last result is partly written, e.g. "12" of "1234,..." for the CSV
+    last_start: int = data.rindex(b'\n', 0, len(data) - 1) + 1
+    with open(output, 'wb') as f:
+        f.write(data[:last_start + cut])
+    assert read_done_seeds(output, output_format) == set(range(5))
+    simulate(output, output_format, 6, resume=True)
+    assert read_seeds(output, output_format) == list(range(6))
+
+
+@pytest.mark.parametrize('output_format', ['jsonl', 'csv'])
+def test_resume_skips_the_done_seeds(tmp_path, output_format: str):
+    output: str = str(tmp_path / f'results.{output_format}')
+    simulate(output, output_format, 3)
+    simulate(output, output_format, 5, resume=True)
+    assert read_seeds(output, output_format) == list(range(5))
+
+
+def test_resume_rewrites_a_truncated_csv_header(tmp_path):
+    output: str = str(tmp_path / 'results.csv')
+    with open(output, 'w') as f:
+        f.write('seed,pol')
+    simulate(output, 'csv', 2, resume=True)
+    assert read_seeds(output, 'csv') == [0, 1]
@@ -0,0 +1,62 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import List
+import pytest
+from solitaire_game.game import GameSolitaire, Move
+from solitaire_game.solver import Solver, SolverResult, STATUS_SOLVED, STATUS_UNSOLVABLE
+from solitaire_game.state import pack_game
+
+SEEDS: List[int] = list(range(8))
+
+
+def replay(game: GameSolitaire, moves: List[Move]) -> GameSolitaire:
+    # Every move of the line must be legal
+    game = game.clone()
+    for move in moves:
+        assert game.play(move), move
+    return game
+
+
+@pytest.mark.parametrize('draw_count, max_passes', [(1, None), (3, None), (1, 2)])
+def test_solved_lines_replay_to_a_win(draw_count: int, max_passes):
+    nb_solved: int = 0
+    for seed in SEEDS:
+        game: GameSolitaire = GameSolitaire(seed=seed, draw_count=draw_count, max_passes=max_passes)
+        state: bytes = pack_game(game)
+        result: SolverResult = Solver(game, max_nodes=5000).solve()
+        # The game given to the solver is left untouched
+        assert pack_game(game) == state
+        if result.status == STATUS_SOLVED:
+            nb_solved += 1
+            assert replay(game, result.moves).is_game_won()
+        else:
+            assert result.moves == []
+    assert nb_solved > 0
+
+
+def test_solver_is_reusable():
+    game: GameSolitaire = GameSolitaire(seed=1)
+    solver: Solver = Solver(game, max_nodes=5000)
+    first: SolverResult = solver.solve()
+    second: SolverResult = solver.solve()
+    assert first.status == STATUS_SOLVED and replay(game, second.moves).is_game_won()
+
+
+def test_bounded_table_evicts_the_oldest_positions():
+    game: GameSolitaire = GameSolitaire(seed=1)
+    solver: Solver = Solver(game, max_nodes=5000, max_table_size=500)
+    result: SolverResult = solver.solve()
+    assert result.peak_table_size == 500 and len(solver.table) <= 500
+    if result.status == STATUS_SOLVED:
+        assert replay(game, result.moves).is_game_won()
+
+
+def test_unsolvable_deal_is_fully_searched():
+    # Draw 3 with 2 passes, a deal proven unsolvable before the node budget: no child position is solvable either
+    game: GameSolitaire = GameSolitaire(seed=8, draw_count=3, max_passes=2)
+    result: SolverResult = Solver(game, max_nodes=5000).solve()
+    assert result.status == STATUS_UNSOLVABLE and result.moves == [] and result.nodes < 5000
+    for move in game.legal_moves():
+        child: GameSolitaire = game.clone()
+        child.apply(move)
+        assert Solver(child, max_nodes=5000).solve().status == STATUS_UNSOLVABLE
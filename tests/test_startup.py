@@ -0,0 +1,48 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import List
+import os
+import subprocess
+import sys
+import pytest
+
+ROOT_DIR: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules of the terminal UI, never imported by the headless commands (see main.COMMANDS)
+UI_MODULES: List[str] = ['curses', '_curses', 'solitaire_game.game_ui', 'solitaire_game.layout',
+                         'solitaire_game.templates']
+
+# Run the command in a fresh interpreter, then print the UI modules it imported on the last line
+PROBE: str = '''
+import sys
+{}
+from solitaire_game.main import main
+try:
+    main(sys.argv[1:])
+except SystemExit:
+    pass
+print(sorted(name for name in {} if name in sys.modules))
+'''
+
+
+def get_imported_ui_modules(args: List[str], prelude: str = '') -> str:
+    probe: str = PROBE.format(prelude, UI_MODULES)
+    stdout: str = subprocess.run([sys.executable, '-c', probe] + args, cwd=ROOT_DIR, check=True,
+                                 stdout=subprocess.PIPE, text=True).stdout
+    return stdout.splitlines()[-1]
+
+
+@pytest.mark.parametrize('command', ['sim', 'solve', 'rate', 'server', 'stats', 'autoplay'])
+def test_headless_command_help_does_not_import_the_ui(command: str):
+    assert get_imported_ui_modules([command, '--help']) == '[]'
+
+
+def test_headless_commands_do_not_import_the_ui(tmp_path):
+    output: str = str(tmp_path / 'sim.jsonl')
+    assert get_imported_ui_modules(['sim', '-n', '2', '-w', '1', '-o', output]) == '[]'
+    assert get_imported_ui_modules(['solve', '0', '--max-nodes', '1000']) == '[]'
+
+
+def test_probe_sees_the_ui():
+    # The probe itself must detect the UI, else the tests above pass for nothing
+    assert get_imported_ui_modules(['sim', '--help'], 'import solitaire_game.game_ui') != '[]'
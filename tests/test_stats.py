@@ -0,0 +1,118 @@
+# Author: 4sushi
+from __future__ import annotations
+from typing import Dict, List, Tuple
+import json
+import random
+import pytest
+from solitaire_game.stats import GameStat, StatsStore, StatsSummary, StatsWriter, PERCENTILES, PLAYER_HUMAN, main
+
+
+def get_stat(player: str, won: bool, duration: float = 60.0) -> GameStat:
+    return GameStat(player, 1, 3, None, won, duration, 120, 0, 0.0)
+
+
+def get_streaks(results: List[bool]) -> Tuple[int, int]:
+    # Current and longest streaks, from the whole list of results
+    current: int = 0
+    longest: int = 0
+    for won in results:
+        current = current + 1 if won else 0
+        longest = max(longest, current)
+    return current, longest
+
+
+def test_streaks_across_batches_and_players():
+    rng: random.Random = random.Random(0)
+    store: StatsStore = StatsStore(':memory:')
+    results: Dict[str, List[bool]] = {PLAYER_HUMAN: [], 'greedy': []}
+    try:
+        for _ in range(30):
+            # Batches of any size, where the games of the players are interleaved
+            batch: List[GameStat] = []
+            for _ in range(rng.randrange(1, 10)):
+                player: str = rng.choice(list(results))
+                won: bool = rng.random() < 0.6
+                results[player].append(won)
+                batch.append(get_stat(player, won))
+            store.add_games(batch)
+            for player, player_results in results.items():
+                summary: StatsSummary = store.get_summary(player)
+                assert (summary.games, summary.wins) == (len(player_results), sum(player_results))
+                assert (summary.current_streak, summary.longest_streak) == get_streaks(player_results)
+        assert set(store.get_players()) == set(results)
+    finally:
+        store.close()
+
+
+@pytest.mark.parametrize('nb_wins', [1, 2, 7, 100])
+def test_duration_percentiles(nb_wins: int):
+    rng: random.Random = random.Random(nb_wins)
+    durations: List[float] = [rng.uniform(30, 900) for _ in range(nb_wins)]
+    store: StatsStore = StatsStore(':memory:')
+    try:
+        # The lost games and the other players are not counted
+        store.add_games([get_stat(PLAYER_HUMAN, True, duration) for duration in durations]
+                        + [get_stat(PLAYER_HUMAN, False, 1.0), get_stat('random', True, 2.0)])
+        summary: StatsSummary = store.get_summary()
+        durations.sort()
+        assert summary.durations == {percentile: durations[round(percentile / 100 * (nb_wins - 1))]
+                                     for percentile in PERCENTILES}
+        assert summary.durations[0] == durations[0]
+    finally:
+        store.close()
+
+
+def test_summary_without_games():
+    store: StatsStore = StatsStore(':memory:')
+    try:
+        store.add_games([get_stat(PLAYER_HUMAN, False)])
+        assert store.get_summary() == StatsSummary(PLAYER_HUMAN, 1, 0, 0, 0, {})
+        assert store.get_summary('nobody') == StatsSummary('nobody', 0, 0, 0, 0, {})
+        assert store.get_summary('nobody').get_win_rate() == 0.0
+    finally:
+        store.close()
+
+
+def test_writer_batches_the_games(tmp_path):
+    path: str = str(tmp_path / 'stats' / 'stats.sqlite3')
+    writer: StatsWriter = StatsWriter(path, batch_size=64)
+    results: List[bool] = [i % 3 != 0 for i in range(500)] + [True]
+    for won in results[:-1]:
+        writer.record(get_stat(PLAYER_HUMAN, won))
+    writer.flush()
+    store: StatsStore = StatsStore(path)
+    try:
+        assert store.get_summary().games == 500
+        writer.record(get_stat(PLAYER_HUMAN, True))
+        writer.close()
+        summary: StatsSummary = store.get_summary()
+        assert (summary.games, summary.wins) == (501, sum(results))
+        assert (summary.current_streak, summary.longest_streak) == get_streaks(results)
+        assert writer.error is None
+    finally:
+        store.close()
+
+
+def test_writer_error_does_not_block(tmp_path):
+    # The database can not be created, the games are dropped without blocking the game
+    path: str = str(tmp_path / 'file')
+    with open(path, 'w') as f:
+        f.write('not a directory')
+    writer: StatsWriter = StatsWriter(str(tmp_path / 'file' / 'stats.sqlite3'))
+    writer.record(get_stat(PLAYER_HUMAN, True))
+    writer.flush()
+    writer.close()
+    assert writer.error is not None
+
+
+def test_stats_command(tmp_path, capsys):
+    path: str = str(tmp_path / 'stats.sqlite3')
+    store: StatsStore = StatsStore(path)
+    store.add_games([get_stat(PLAYER_HUMAN, True, 75.0), get_stat(PLAYER_HUMAN, False), get_stat('greedy', True)])
+    store.close()
+    main(['--db', path, '--json', '--player', PLAYER_HUMAN])
+    line: Dict = json.loads(capsys.readouterr().out)
+    assert (line['games'], line['wins'], line['win_rate'], line['longest_streak']) == (2, 1, 0.5, 1)
+    main(['--db', path])
+    out: str = capsys.readouterr().out
+    assert '[human]' in out and '[greedy]' in out and 'best 1:15' in out